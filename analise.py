@@ -0,0 +1,452 @@
+"""Análise da carteira: contagens sobre os eventos de todos os laudos salvos.
+
+Os eventos da versão atual de cada laudo ficam em memória em colunas NumPy,
+uma linha por evento: os campos de uma opção só (prioridade, uso, causa e,
+vindos do laudo, tipo de empreendimento, contratante, ano e mês) como
+códigos inteiros, e os de várias opções (anomalias, consequências e
+recomendações) como máscaras de bits na ordem de ``OPCOES``. Um filtro é uma
+comparação vetorizada por coluna e uma tabela cruzada é um ``bincount`` dos
+pares de códigos (ou o produto das matrizes de bits, quando as duas
+dimensões têm várias opções).
+
+Como em ``sugestoes``, a atualização só lê do banco os laudos que mudaram de
+revisão (``BancoLaudos.revisao``): as linhas desses laudos saem das colunas
+e as novas entram no fim, reaproveitando os códigos dos eventos que não
+mudaram (pelo hash do blob) e decodificando só os demais. As colunas, com as
+revisões dos laudos que representam e os vocabulários, ficam gravadas num
+``.npz`` ao lado do banco: um processo novo parte delas e só lê do banco o
+que mudou desde então. O arquivo leva a identidade e o contador de revisões
+do banco e é descartado se não corresponder a ele (banco recriado ou
+restaurado de uma cópia).
+
+    python analise.py anomalias tipo_empreendimento -f prioridade="Prioridade 1" -f ano=2025
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from gerador import OPCOES, PRIORIDADES, USOS
+
+# Nome -> rótulo das dimensões disponíveis para linhas, colunas e filtros
+DIMENSOES = {
+    'tipo_empreendimento': "Tipo de empreendimento",
+    'contratante': "Contratante",
+    'ano': "Ano",
+    'mes': "Mês",
+    'prioridade': "Prioridade",
+    'uso': "Uso",
+    'causa': "Causa",
+    'anomalias': "Anomalia",
+    'consequencias': "Consequência",
+    'recomendacoes': "Recomendação",
+}
+
+# Dimensões de várias opções, guardadas como bits (até 64 opções) -> lista em ``OPCOES``
+MULTIPLAS = {'anomalias': 'anomalias', 'consequencias': 'consequencias', 'recomendacoes': 'recomendacoes'}
+
+# Dimensões de opções fixas -> lista de opções
+FIXAS = {'prioridade': PRIORIDADES, 'uso': USOS, 'causa': OPCOES['causas']}
+
+# Colunas e tipos; código -1 (ou ano/mês -1) quando o valor falta ou não é uma opção.
+# ``laudo`` é o id do laudo no banco
+COLUNAS = {
+    'laudo': 'int64',
+    'tipo_empreendimento': 'int32',
+    'contratante': 'int32',
+    'ano': 'int16',
+    'mes': 'int32',
+    'prioridade': 'int8',
+    'uso': 'int8',
+    'causa': 'int8',
+    'anomalias': 'uint64',
+    'consequencias': 'uint64',
+    'recomendacoes': 'uint64',
+}
+
+# Colunas que vêm do próprio evento (na ordem de ``codificar``)
+COLUNAS_EVENTO = ('prioridade', 'uso', 'causa', 'anomalias', 'consequencias', 'recomendacoes')
+
+# Campos de ``dados`` de que saem as colunas do laudo
+CAMPOS_LAUDO = ('tipo_empreendimento', 'contratante', 'data_laudo')
+
+# Intervalo mínimo entre consultas ao banco por laudos alterados (s)
+INTERVALO_ATUALIZACAO = 30.0
+
+# Formato do arquivo das colunas; mudar ao alterar as colunas ou a codificação
+VERSAO_ARQUIVO = 2
+
+
+_POSICOES = {nome: {opcao: i for i, opcao in enumerate(opcoes)} for nome, opcoes in FIXAS.items()}
+_BITS = {nome: {opcao: 1 << i for i, opcao in enumerate(OPCOES[opcoes])} for nome, opcoes in MULTIPLAS.items()}
+
+
+def codificar(evento):
+    """Códigos da prioridade, uso e causa e bits das anomalias, consequências e recomendações"""
+    codigos = [_POSICOES[nome].get(evento.get(nome), -1) for nome in FIXAS]
+    for nome in MULTIPLAS:
+        valores = evento.get(nome) or ()
+        if isinstance(valores, str):
+            valores = [valores]
+        bits = 0
+        for valor in valores:
+            bits |= _BITS[nome].get(valor, 0)
+        codigos.append(bits)
+    return tuple(codigos)
+
+
+def _ano_mes(data_laudo):
+    """``(ano, ano * 12 + mês - 1)`` de uma data ISO, ou ``(-1, -1)``"""
+    try:
+        ano, mes = int(data_laudo[:4]), int(data_laudo[5:7])
+    except (TypeError, ValueError):
+        return -1, -1
+    return ano, ano * 12 + mes - 1
+
+
+def _rotulo_mes(codigo):
+    return f"{codigo // 12}-{codigo % 12 + 1:02d}"
+
+
+class _Vocabulario:
+    """Códigos inteiros estáveis para valores de texto livre"""
+
+    def __init__(self, iniciais=()):
+        self.rotulos = []
+        self._codigos = {}
+        for rotulo in iniciais:
+            self.codigo(rotulo)
+
+    def codigo(self, rotulo):
+        if not isinstance(rotulo, str) or not rotulo.strip():
+            return -1
+        rotulo = rotulo.strip()
+        if rotulo not in self._codigos:
+            self._codigos[rotulo] = len(self.rotulos)
+            self.rotulos.append(rotulo)
+        return self._codigos[rotulo]
+
+
+class AnaliseCarteira:
+    """Colunas dos eventos de todos os laudos salvos e as agregações sobre elas.
+
+    Com ``arquivo``, as colunas são lidas dele na primeira atualização e
+    regravadas a cada atualização que muda alguma coisa.
+    """
+
+    def __init__(self, banco, intervalo=INTERVALO_ATUALIZACAO, arquivo=None):
+        self.banco = banco
+        self.intervalo = intervalo
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+        self._atualizado_em = None
+        self._vocabularios = {
+            'tipo_empreendimento': _Vocabulario(OPCOES['tipo_empreendimento']),
+            'contratante': _Vocabulario(),
+        }
+        # laudo_id -> revisão representada nas colunas, e o contador do banco nelas
+        self._revisoes = {}
+        self._revisao = None
+        # Hash do blob do evento de cada linha (``None`` até a primeira atualização)
+        self._hashes = None
+        # Colunas e rótulos dos vocabulários, trocados juntos a cada atualização
+        self._estado = None
+
+    def _codificar_laudo(self, campos, partes):
+        valor = lambda campo: partes.get(campos.get(campo))
+        return (self._vocabularios['tipo_empreendimento'].codigo(valor('tipo_empreendimento')),
+                self._vocabularios['contratante'].codigo(valor('contratante')),
+                *_ano_mes(valor('data_laudo')))
+
+    def _rotulos(self):
+        return {nome: list(vocabulario.rotulos) for nome, vocabulario in self._vocabularios.items()}
+
+    def _iniciar(self):
+        """Colunas do arquivo, se houver um válido, ou vazias (chamado com o lock)"""
+        import numpy as np
+
+        if self.arquivo:
+            try:
+                with np.load(self.arquivo) as dados:
+                    if (int(dados['versao']) == VERSAO_ARQUIVO
+                            and str(dados['banco']) == self.banco.identidade
+                            and int(dados['revisao']) <= self.banco.revisao()):
+                        colunas = {nome: dados[nome] for nome in COLUNAS}
+                        hashes = dados['hashes']
+                        revisoes = dict(zip(dados['laudos'].tolist(), dados['revisoes'].tolist()))
+                        rotulos = {nome: dados[f"rotulos_{nome}"].tolist() for nome in self._vocabularios}
+                        self._vocabularios = {nome: _Vocabulario(r) for nome, r in rotulos.items()}
+                        self._revisoes, self._hashes = revisoes, hashes
+                        self._revisao = int(dados['revisao'])
+                        self._estado = (colunas, self._rotulos(), len(revisoes))
+                        return
+            except (OSError, KeyError, ValueError):
+                # Ausente, incompleto ou de outro formato: as colunas são refeitas do banco
+                pass
+        self._hashes = np.zeros(0, dtype='S32')
+        self._estado = ({nome: np.zeros(0, dtype=tipo) for nome, tipo in COLUNAS.items()},
+                        self._rotulos(), 0)
+
+    def _gravar(self):
+        """Grava as colunas de forma atômica em ``arquivo`` (chamado com o lock)"""
+        import numpy as np
+
+        colunas, rotulos, _ = self._estado
+        diretorio = os.path.dirname(os.path.abspath(self.arquivo))
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix='.tmp', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, versao=VERSAO_ARQUIVO, banco=self.banco.identidade, revisao=self._revisao,
+                         hashes=self._hashes,
+                         laudos=np.array(list(self._revisoes), dtype=np.int64),
+                         revisoes=np.array(list(self._revisoes.values()), dtype=np.int64),
+                         **colunas,
+                         **{f"rotulos_{nome}": np.array(r, dtype=str) for nome, r in rotulos.items()})
+            os.replace(temporario, self.arquivo)
+        except OSError:
+            # Sem o arquivo, o próximo processo só refaz as colunas a partir do banco
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def atualizar(self, forcar=False):
+        """Troca nas colunas as linhas dos laudos salvos, alterados ou removidos desde a
+        última vez"""
+        import numpy as np
+
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self._atualizado_em is not None and agora - self._atualizado_em < self.intervalo:
+                return
+            self._atualizado_em = agora
+            if self._estado is None:
+                self._iniciar()
+
+            # Lido antes das revisões dos laudos: uma alteração entre as duas
+            # consultas é vista de novo na próxima atualização
+            revisao = self.banco.revisao()
+            if revisao == self._revisao:
+                return
+            revisoes = self.banco.revisoes_atuais()
+            removidos = [i for i in self._revisoes if i not in revisoes]
+            alterados = [i for i, r in revisoes.items() if self._revisoes.get(i) != r]
+            self._revisao = revisao
+            if not removidos and not alterados:
+                return
+            colunas = self._estado[0]
+
+            # Linhas que saem; os códigos dos eventos que continuam são reaproveitados
+            saem = np.isin(colunas['laudo'], np.array(removidos + alterados, dtype=np.int64))
+            indices = np.flatnonzero(saem)
+            antigos = np.column_stack([colunas[nome][indices].astype(np.int64) for nome in COLUNAS_EVENTO])
+            conhecidos = dict(zip(self._hashes[indices].tolist(), map(tuple, antigos.tolist())))
+
+            manifestos = self.banco.manifestos_atuais(alterados)
+            hashes = {campos[c] for campos, _ in manifestos.values() for c in CAMPOS_LAUDO if c in campos}
+            hashes.update(h for _, hashes_eventos in manifestos.values()
+                          for h in hashes_eventos if h.encode() not in conhecidos)
+            partes = self.banco.partes_por_hash(hashes)
+
+            linhas, hashes_linhas = [], []
+            for laudo_id, (campos, hashes_eventos) in manifestos.items():
+                codigos_laudo = self._codificar_laudo(campos, partes)
+                for h in hashes_eventos:
+                    codigos = conhecidos.get(h.encode())
+                    if codigos is None:
+                        if h not in partes:
+                            continue
+                        codigos = conhecidos[h.encode()] = codificar(partes[h])
+                    linhas.append((laudo_id, *codigos_laudo, *codigos))
+                    hashes_linhas.append(h)
+            novas = np.array(linhas, dtype=np.int64).reshape(len(linhas), len(COLUNAS))
+            fica = ~saem
+            colunas = {nome: np.concatenate([colunas[nome][fica], novas[:, i].astype(tipo)])
+                       for i, (nome, tipo) in enumerate(COLUNAS.items())}
+            self._hashes = np.concatenate([self._hashes[fica], np.array(hashes_linhas, dtype='S32')])
+
+            for laudo_id in removidos:
+                del self._revisoes[laudo_id]
+            for laudo_id in alterados:
+                # Removido entre as duas consultas: sai agora e não volta
+                if laudo_id in manifestos:
+                    self._revisoes[laudo_id] = revisoes[laudo_id]
+                else:
+                    self._revisoes.pop(laudo_id, None)
+            self._estado = (colunas, self._rotulos(), len(self._revisoes))
+            if self.arquivo:
+                self._gravar()
+
+    def _estado_atual(self):
+        if self._estado is None:
+            self.atualizar()
+        return self._estado
+
+    def _categorias(self, estado, dimensao):
+        """``(rótulos, códigos por evento)`` de uma dimensão de opção única"""
+        import numpy as np
+
+        colunas, rotulos, _ = estado
+        coluna = colunas[dimensao]
+        if dimensao in FIXAS:
+            return list(FIXAS[dimensao]), coluna
+        if dimensao in rotulos:
+            return rotulos[dimensao], coluna
+        # Ano e mês: só os presentes, em ordem
+        presentes = np.unique(coluna[coluna >= 0])
+        codigos = np.where(coluna >= 0, np.searchsorted(presentes, coluna), -1)
+        formatar = str if dimensao == 'ano' else _rotulo_mes
+        return [formatar(int(valor)) for valor in presentes], codigos
+
+    def _bits(self, estado, dimensao, selecionados):
+        """Matriz evento x opção (0/1) dos eventos ``selecionados`` numa dimensão de várias opções.
+
+        Em ``float64``, para o produto de matrizes usar BLAS; as contagens são exatas.
+        """
+        import numpy as np
+
+        n = len(OPCOES[MULTIPLAS[dimensao]])
+        bits = estado[0][dimensao][selecionados]
+        return ((bits[:, None] >> np.arange(n, dtype=np.uint64)) & np.uint64(1)).astype(np.float64)
+
+    def _mascara(self, estado, filtros):
+        import numpy as np
+
+        colunas = estado[0]
+        mascara = np.ones(len(colunas['laudo']), dtype=bool)
+        for dimensao, valores in (filtros or {}).items():
+            if dimensao not in DIMENSOES:
+                raise ValueError(f"Dimensão desconhecida: {dimensao}")
+            if not valores:
+                continue
+            if isinstance(valores, str):
+                valores = [valores]
+            valores = {str(valor) for valor in valores}
+            if dimensao in MULTIPLAS:
+                bits = sum(b for opcao, b in _BITS[dimensao].items() if opcao in valores)
+                mascara &= (colunas[dimensao] & np.uint64(bits)) != 0
+            else:
+                rotulos, codigos = self._categorias(estado, dimensao)
+                mascara &= np.isin(codigos, [i for i, rotulo in enumerate(rotulos) if rotulo in valores])
+        return mascara
+
+    def valores(self, dimensao):
+        """Valores presentes (ou possíveis, nas de opções fixas) de uma dimensão, para filtros"""
+        if dimensao in MULTIPLAS:
+            return list(OPCOES[MULTIPLAS[dimensao]])
+        return self._categorias(self._estado_atual(), dimensao)[0]
+
+    def totais(self, filtros=None):
+        """``(eventos, laudos)`` que passam pelos filtros"""
+        import numpy as np
+
+        estado = self._estado_atual()
+        mascara = self._mascara(estado, filtros)
+        return int(mascara.sum()), int(np.unique(estado[0]['laudo'][mascara]).size)
+
+    def contar(self, linhas, colunas=None, filtros=None):
+        """Eventos por ``linhas`` x ``colunas``, entre os que passam pelos ``filtros``.
+
+        ``filtros`` é ``{dimensão: [valores]}`` (qualquer dos valores; todas as
+        dimensões). Nas dimensões de várias opções o evento conta uma vez em
+        cada opção marcada. Devolve ``(rótulos das linhas, rótulos das colunas,
+        matriz)`` sem as linhas e colunas zeradas; sem ``colunas``, a matriz tem
+        uma coluna só, ``"Eventos"``.
+        """
+        import numpy as np
+
+        for dimensao in (linhas, colunas):
+            if dimensao is not None and dimensao not in DIMENSOES:
+                raise ValueError(f"Dimensão desconhecida: {dimensao}")
+        estado = self._estado_atual()
+        selecionados = np.flatnonzero(self._mascara(estado, filtros))
+
+        if linhas in MULTIPLAS:
+            rotulos_linhas = list(OPCOES[MULTIPLAS[linhas]])
+        else:
+            rotulos_linhas, codigos_linhas = self._categorias(estado, linhas)
+        if colunas is None:
+            rotulos_colunas = ["Eventos"]
+        elif colunas in MULTIPLAS:
+            rotulos_colunas = list(OPCOES[MULTIPLAS[colunas]])
+        else:
+            rotulos_colunas, codigos_colunas = self._categorias(estado, colunas)
+
+        if linhas in MULTIPLAS and colunas in MULTIPLAS:
+            matriz = (self._bits(estado, linhas, selecionados).T
+                      @ self._bits(estado, colunas, selecionados)).round().astype(np.int64)
+        else:
+            # Pares (código da linha, código da coluna), um por evento ou por opção marcada
+            if linhas in MULTIPLAS:
+                eventos, a = np.nonzero(self._bits(estado, linhas, selecionados))
+                eventos = selecionados[eventos]
+            else:
+                eventos, a = selecionados, codigos_linhas[selecionados]
+            if colunas is None:
+                b = np.zeros(len(eventos), dtype=np.int64)
+            elif colunas in MULTIPLAS:
+                pares, b = np.nonzero(self._bits(estado, colunas, eventos))
+                a = a[pares]
+            else:
+                b = codigos_colunas[eventos]
+            validos = (a >= 0) & (b >= 0)
+            n, m = len(rotulos_linhas), len(rotulos_colunas)
+            matriz = np.bincount(a[validos].astype(np.int64) * m + b[validos], minlength=n * m).reshape(n, m)
+
+        com_linhas = np.flatnonzero(matriz.sum(axis=1))
+        com_colunas = np.flatnonzero(matriz.sum(axis=0))
+        return ([rotulos_linhas[i] for i in com_linhas], [rotulos_colunas[j] for j in com_colunas],
+                matriz[np.ix_(com_linhas, com_colunas)])
+
+
+_analise = None
+_analise_lock = threading.Lock()
+
+
+def analise_padrao():
+    """Análise do processo, sobre ``banco_padrao()``, com as colunas em ``laudos.analise.npz``"""
+    global _analise
+    with _analise_lock:
+        if _analise is None:
+            from banco import banco_padrao
+
+            banco = banco_padrao()
+            _analise = AnaliseCarteira(banco, arquivo=os.path.splitext(banco.caminho)[0] + '.analise.npz')
+    return _analise
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Contagens de eventos dos laudos salvos")
+    parser.add_argument('linhas', choices=DIMENSOES)
+    parser.add_argument('colunas', nargs='?', choices=DIMENSOES)
+    parser.add_argument('-f', '--filtro', action='append', default=[], metavar='DIMENSAO=VALOR',
+                        help="Só os eventos com esse valor (repita para vários)")
+    args = parser.parse_args(argv)
+
+    filtros = {}
+    for filtro in args.filtro:
+        dimensao, _, valor = filtro.partition('=')
+        if dimensao not in DIMENSOES:
+            parser.error(f"dimensão desconhecida no filtro: {dimensao}")
+        filtros.setdefault(dimensao, []).append(valor)
+
+    analise = analise_padrao()
+    inicio = time.perf_counter()
+    analise.atualizar()
+    carga = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    rotulos_linhas, rotulos_colunas, matriz = analise.contar(args.linhas, args.colunas, filtros)
+    eventos, laudos = analise.totais(filtros)
+    consulta = time.perf_counter() - inicio
+
+    largura = max([len(DIMENSOES[args.linhas])] + [len(r) for r in rotulos_linhas])
+    print(DIMENSOES[args.linhas].ljust(largura), *rotulos_colunas, sep='\t')
+    for rotulo, linha in zip(rotulos_linhas, matriz):
+        print(rotulo.ljust(largura), *linha, sep='\t')
+    print(f"{eventos} eventos de {laudos} laudos; carga {carga * 1000:.0f} ms, consulta {consulta * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
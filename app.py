@@ -1,11 +1,23 @@
 import streamlit as st
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from contextlib import closing
 from datetime import datetime
-import io
 import json
 import os
+import time
+import uuid
+
+from analise import DIMENSOES, MULTIPLAS, analise_padrao
+from autosave import AutoSalvamento
+from banco import banco_padrao
+from deposito_imagens import deposito_padrao
+from fila import fila_padrao
+from gerador import OPCOES, DOCUMENTACOES, PRIORIDADES, USOS, nome_arquivo_laudo
+from ia import redigir_eventos, transmitir_conclusao
+from importacao_eventos import EXTENSOES, importar_eventos
+from importador import importar_laudo
+from metricas import imagens_bytes, metricas_padrao
+from pdf import CONVERTENDO, ERRO, PRONTO, chave_pdf, pool_padrao
+from sugestoes import ordenar, sugestoes_padrao
 
 # Configuração da página
 st.set_page_config(
@@ -31,420 +43,68 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Inicializar sessão
-if 'laudos_salvos' not in st.session_state:
-    st.session_state.laudos_salvos = {}
+if 'pagina_laudos' not in st.session_state:
+    st.session_state.pagina_laudos = 0
 if 'eventos' not in st.session_state:
     st.session_state.eventos = []
 if 'dados_laudo' not in st.session_state:
     st.session_state.dados_laudo = {}
+if 'refs_upload' not in st.session_state:
+    st.session_state.refs_upload = {}
+if 'laudo_atual' not in st.session_state:
+    st.session_state.laudo_atual = None
+if 'trabalhos_vistos' not in st.session_state:
+    st.session_state.trabalhos_vistos = set()
+
+# Salvamento automático: a chave da sessão fica na URL para sobreviver a recarregamentos
+if 'sessao' not in st.query_params:
+    st.query_params['sessao'] = uuid.uuid4().hex
+if 'autosave' not in st.session_state:
+    st.session_state.autosave = AutoSalvamento(banco_padrao(), st.query_params['sessao'])
+    # Alterações não salvas de uma sessão anterior: aguardar a decisão do usuário
+    st.session_state.autosave_recuperavel = banco_padrao().carregar_autosave(st.query_params['sessao'])
+
+# Sessão ativa e fotos que ela mantém, para as métricas da réplica
+metricas_padrao().registrar_sessao(st.query_params['sessao'], imagens_bytes(st.session_state.eventos))
+
+# Laudos por página na lista "Laudos Salvos" da barra lateral
+LAUDOS_POR_PAGINA = 10
+RESULTADOS_BUSCA = 10
 
-# Dicionários de opções
-OPCOES = {
-    "contratada": [
-        "Testcon Engenharia",
-        "E2E Consultoria e Gestão",
-        "Outra"
-    ],
-    "tipo_empreendimento": [
-        "Institucional de ensino superior privado",
-        "Comercial",
-        "Residencial multifamiliar",
-        "Industrial",
-        "Hospitalar",
-        "Outro"
-    ],
-    "anomalias": [
-        "Eflorescência",
-        "Pinturas em desconformidades",
-        "Pilares apresentam expansão de armadura",
-        "Marquises com rupturas e desplacamento",
-        "Corrosão",
-        "Mofo e bolor",
-        "Infiltrações",
-        "Fissuras",
-        "Trincas",
-        "Rachaduras",
-        "Desplacamento de revestimento",
-        "Vazamentos",
-        "Problemas estruturais",
-        "Deficiência de impermeabilização",
-        "Instalações elétricas inadequadas",
-        "Selantes inadequados",
-        "Pintura deteriorada",
-        "Desorganização",
-        "Fixação inadequada",
-        "Sem funcionamento",
-        "Base de fixação inadequada",
-        "Sistema inadequado",
-        "Manchas de umidade",
-        "Comprometimento de equipamentos",
-        "Deficiência de ventilação",
-        "Outra"
-    ],
-    "causas": [
-        "Endógena",
-        "Exógena", 
-        "Funcional",
-        "Endógena/Funcional",
-        "Funcional/Exógena",
-        "Outra"
-    ],
-    "consequencias": [
-        "Prejuízo estético",
-        "Iminência de infiltração",
-        "Risco à segurança dos usuários",
-        "Comprometimento estrutural",
-        "Insalubridade",
-        "Perda de funcionalidade",
-        "Comprometimento de equipamentos",
-        "Falta de acessibilidade",
-        "Prejuízo estético e risco à segurança dos usuários",
-        "Prejuízo estético, iminência de infiltração e risco à segurança dos usuários",
-        "Prejuízo estético, insalubridade e risco à segurança dos usuários",
-        "Outra"
-    ],
-    "recomendacoes": [
-        "Contratar empresa especializada para reabilitar as estruturas",
-        "Realizar pintura de toda área",
-        "Revisar estruturas e trocar selantes",
-        "Impermeabilizar áreas afetadas",
-        "Adequar instalações elétricas",
-        "Realizar limpeza e organização",
-        "Substituir elementos danificados",
-        "Realizar manutenção preventiva",
-        "Contratar empresa para verificação e adequação",
-        "Reabilitar pinturas das paredes e tetos",
-        "Fazer limpeza na área",
-        "Contratar empresa especializada para manutenção",
-        "Contratar empresa para adequar circulação do ar",
-        "Contratar empresa especializada para revisão de toda instalação elétrica",
-        "Outra"
-    ]
+# Laudos em geração na fila: a página se atualiza até terminarem
+acompanhar_fila = False
+INTERVALO_ACOMPANHAMENTO = 1.0
+ROTULOS_ETAPAS = {
+    'capa': "Capa e ressalvas",
+    'objetivo': "Objetivo e breve relato",
+    'descricao': "Descrição do objeto",
+    'documentacoes': "Documentações",
+    'anamnese': "Anamnese",
+    'imagens': "Processando fotos",
+    'eventos': "Montando evento",
+    'resumo': "Tabela de resumo",
+    'laudo_tecnico': "Laudo técnico",
+    'salvar': "Gravando o arquivo",
 }
 
-# Documentações padrão
-DOCUMENTACOES = [
-    "Certificado de Conclusão de Obra ou Habite-se",
-    "Alvará ou Licença de Funcionamento",
-    "Auto de Vistoria do Corpo de Bombeiros",
-    "Licença de operação da ETE",
-    "Licenças ambientais",
-    "Certificado de Acessibilidade",
-    "Licença de perfuração poços profundos",
-    "Documentos de formação da brigada de incêndio",
-    "Alvará de aprovação para instalação de equipamento",
-    "Declaração de prestação de serviços de Pronto Atendimento",
-    "Aprovação de paralelismo de Grupo Moto Gerador",
-    "Manual de Uso, Operação e Manutenção",
-    "Registros de manutenções",
-    "Projetos Arquitetônicos"
-]
+def novo_id_evento():
+    """Identificador estável do evento, usado nas chaves dos widgets"""
+    return uuid.uuid4().hex[:12]
 
-# Funções auxiliares para gerar o documento
-def gerar_documento_completo(dados, eventos, incluir_rodape=True, incluir_numeracao=True, versao=1):
-    """Gera o documento Word completo"""
-    doc = Document()
-    
-    # Configurar estilos básicos
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Arial'
-    font.size = Pt(11)
-    
-    # CAPA
-    # Título principal
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run("RELATÓRIO DE ENGENHARIA")
-    run.font.size = Pt(16)
-    run.font.bold = True
-    
-    # Subtítulo
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run("Laudo Técnico de Inspeção Predial")
-    run.font.size = Pt(14)
-    run.font.bold = True
-    
-    # Espaços
-    for _ in range(3):
-        doc.add_paragraph()
-    
-    # Informações do contratante
-    p = doc.add_paragraph()
-    p.add_run("Contratante: ").bold = True
-    p.add_run(dados.get('contratante', ''))
-    
-    p = doc.add_paragraph()
-    p.add_run("CNPJ: ").bold = True
-    p.add_run(dados.get('cnpj', ''))
-    
-    p = doc.add_paragraph()
-    p.add_run("Data: ").bold = True
-    p.add_run(dados.get('data_laudo').strftime('%d/%m/%Y') if dados.get('data_laudo') else '')
-    
-    # Espaços
-    for _ in range(5):
-        doc.add_paragraph()
-    
-    # Imóvel
-    p = doc.add_paragraph()
-    p.add_run("Imóvel motivo:").bold = True
-    
-    p = doc.add_paragraph()
-    p.add_run(dados.get('endereco', ''))
-    
-    # Espaços
-    for _ in range(3):
-        doc.add_paragraph()
-    
-    # Responsável técnico
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("Silvio Augusto Barbosa de Albuquerque Filho, Engenheiro Civil")
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("CREA/PE nº 054787D-PE")
-    
-    # Nova página para o sumário
-    doc.add_page_break()
-    
-    # SUMÁRIO
-    doc.add_heading('Sumário', level=1)
-    
-    # Lista de seções
-    secoes = [
-        ("1. RESSALVAS INICIAIS", "4"),
-        ("2. OBJETIVO", "5"),
-        ("3. DESCRIÇÃO DO OBJETO INSPECIONADO", "8"),
-        ("4. REFERÊNCIAS NORMATIVAS", "11"),
-        ("5. TERMINOLOGIA", "12"),
-        ("6. ABRANGÊNCIA DA ANÁLISE", "18"),
-        ("7. CLASSIFICAÇÃO DAS IRREGULARIDADES", "19"),
-        ("8. PATAMARES DE CRITICIDADE", "20"),
-        ("9. AVALIAÇÃO DE MANUTENÇÃO", "21"),
-        ("10. AVALIAÇÃO DE USO", "23"),
-        ("11. METODOLOGIA", "23"),
-        ("12. DOCUMENTAÇÕES SOLICITADAS E DISPONIBILIZADAS", "26"),
-        ("13. ANAMNESE", "27"),
-        ("14. LAUDO TÉCNICO", "48"),
-        ("15. DATA DO RELATÓRIO TÉCNICO", "53")
-    ]
-    
-    for titulo, pagina in secoes:
-        p = doc.add_paragraph()
-        p.add_run(titulo)
-        p.add_run(f" {'.'*50} {pagina}")
-    
-    # Nova página para o conteúdo
-    doc.add_page_break()
-    
-    # 1. RESSALVAS INICIAIS
-    doc.add_heading('RESSALVAS INICIAIS', level=1)
-    doc.add_paragraph("O presente relatório técnico obedeceu aos seguintes princípios e ressalvas:")
-    
-    ressalvas = [
-        "O vistoriador signatário inspecionou pessoalmente o objeto e o relatório técnico foi elaborado pelo próprio e ninguém, a não ser o mesmo, preparou as análises e as respectivas conclusões;",
-        "O Relatório técnico foi elaborado com estrita observância dos postulados constantes do Código de Ética Profissional;",
-        "Os honorários profissionais do signatário não estão, de qualquer forma, subordinados às conclusões deste relatório técnico;",
-        "O vistoriador signatário não tem nenhuma inclinação pessoal em relação à matéria envolvida neste relatório técnico no presente, nem contempla para o futuro, qualquer interesse no bem objeto deste relatório técnico."
-    ]
-    
-    for i, ressalva in enumerate(ressalvas, start=1):
-        p = doc.add_paragraph()
-        p.style = 'List Bullet'
-        p.add_run(f"{chr(96+i)}) {ressalva}")
-    
-    # 2. OBJETIVO
-    doc.add_page_break()
-    doc.add_heading('OBJETIVO', level=1)
-    
-    p = doc.add_paragraph()
-    p.add_run("O presente Laudo Técnico de Inspeção Predial foi solicitado pelo ")
-    p.add_run(dados.get('contratante', '')).bold = True
-    p.add_run(", CNPJ: ")
-    p.add_run(dados.get('cnpj', '')).bold = True
-    p.add_run(", elaborado pelo Engenheiro Civil, Silvio Augusto Barbosa de Albuquerque Filho, CREA-PE nº 054787D-PE")
-    
-    if dados.get('art_numero'):
-        p.add_run(f", com registro da ART nº{dados['art_numero']} do presente documento.")
-    else:
-        p.add_run(".")
-    
-    doc.add_paragraph("A inspeção irá registrar as anomalias e falhas prediais por meio de um check-up da edificação.")
-    
-    # Breve relato
-    if dados.get('breve_relato'):
-        doc.add_heading('BREVE RELATO', level=2)
-        p = doc.add_paragraph()
-        p.add_run(f"Entre os dias {dados.get('dias_vistoria', '')} foram realizadas vistorias pela empresa ")
-        p.add_run(dados.get('contratada', '')).bold = True
-        p.add_run(" a pedido do ")
-        p.add_run(dados.get('contratante', '')).bold = True
-        p.add_run(" no imóvel localizado ")
-        p.add_run(dados.get('endereco', '')).bold = True
-        p.add_run(", no qual afirma:")
-        
-        # Processar breve relato
-        doc.add_paragraph()
-        relato_linhas = dados['breve_relato'].split('\n')
-        for i, linha in enumerate(relato_linhas, start=1):
-            if linha.strip():
-                p = doc.add_paragraph()
-                p.style = 'List Number'
-                p.add_run(linha.strip())
-    
-    # 3. DESCRIÇÃO DO OBJETO
-    doc.add_page_break()
-    doc.add_heading('DESCRIÇÃO DO OBJETO INSPECIONADO', level=1)
-    
-    p = doc.add_paragraph()
-    p.add_run(f"Trata-se de um empreendimento do tipo {dados.get('tipo_empreendimento', '')}, ")
-    p.add_run(dados.get('info_localizacao', ''))
-    p.add_run(f". O edifício está {'ocupado' if dados.get('ocupado') == 'Sim' else 'desocupado'}.")
-    
-    # 12. DOCUMENTAÇÕES
-    doc.add_page_break()
-    doc.add_heading('DOCUMENTAÇÕES SOLICITADAS E DOCUMENTAÇÕES DISPONIBILIZADAS:', level=1)
-    
-    docs_disponibilizadas = dados.get('docs_disponibilizadas', [])
-    
-    for doc_nome in DOCUMENTACOES:
-        p = doc.add_paragraph()
-        p.style = 'List Bullet'
-        if doc_nome in docs_disponibilizadas:
-            p.add_run(f"{doc_nome} - ")
-            run = p.add_run("DISPONIBILIZADA")
-            run.bold = True
-        else:
-            p.add_run(f"{doc_nome} - ")
-            run = p.add_run("AUSENTE")
-            run.bold = True
-    
-    if dados.get('obs_docs'):
-        doc.add_paragraph()
-        p = doc.add_paragraph()
-        p.add_run("Obs: ").bold = True
-        p.add_run(dados['obs_docs'])
-    
-    # 13. ANAMNESE
-    doc.add_page_break()
-    doc.add_heading('ANAMNESE', level=1)
-    doc.add_paragraph(dados.get('anamnese', ''))
-    
-    doc.add_paragraph("A coordenação de dados se dá por meio de textos classificando as constatações de modo que as análises serão divididas de acordo com os arquivos anexos.")
-    
-    # Processar eventos
-    for evento in eventos:
-        doc.add_paragraph()
-        
-        # Título do evento
-        p = doc.add_paragraph()
-        run = p.add_run(f"EVENTO {evento['numero']:02d}: {evento['nome']}")
-        run.bold = True
-        run.font.size = Pt(12)
-        
-        # Informações do evento
-        p = doc.add_paragraph()
-        p.add_run("Localização: ").bold = True
-        p.add_run(evento.get('localizacao', ''))
-        
-        p = doc.add_paragraph()
-        p.add_run("Anomalia: ").bold = True
-        p.add_run(", ".join(evento.get('anomalias', [])))
-        
-        p = doc.add_paragraph()
-        p.add_run("Provável causa: ").bold = True
-        p.add_run(evento.get('causa', ''))
-        
-        p = doc.add_paragraph()
-        p.add_run("Consequência da anomalia: ").bold = True
-        p.add_run(", ".join(evento.get('consequencias', [])))
-        
-        p = doc.add_paragraph()
-        p.add_run("Patamar de urgência: ").bold = True
-        p.add_run(evento.get('prioridade', ''))
-        
-        p = doc.add_paragraph()
-        p.add_run("Uso: ").bold = True
-        p.add_run(evento.get('uso', ''))
-        
-        p = doc.add_paragraph()
-        p.add_run("Recomendação técnica: ").bold = True
-        p.add_run(", ".join(evento.get('recomendacoes', [])))
-    
-    # Tabela resumo
-    if eventos:
-        doc.add_page_break()
-        doc.add_heading('Resumo de Eventos por Prioridade', level=2)
-        
-        # Criar tabela
-        table = doc.add_table(rows=1, cols=3)
-        table.style = 'Light Grid Accent 1'
-        
-        # Cabeçalho
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'EVENTO'
-        hdr_cells[1].text = 'ANOMALIA'
-        hdr_cells[2].text = 'PRIORIDADE'
-        
-        # Ordenar eventos por prioridade
-        eventos_ordenados = sorted(eventos, key=lambda x: (x['prioridade'], x['numero']))
-        
-        # Adicionar linhas
-        for evento in eventos_ordenados:
-            row = table.add_row()
-            row.cells[0].text = f"EVENTO {evento['numero']:02d}"
-            row.cells[1].text = ", ".join(evento['anomalias'])
-            row.cells[2].text = evento['prioridade'].split()[-1]
-    
-    # 14. LAUDO TÉCNICO
-    doc.add_page_break()
-    doc.add_heading('LAUDO TÉCNICO', level=1)
-    
-    if dados.get('texto_laudo'):
-        doc.add_paragraph(dados['texto_laudo'])
-    else:
-        # Texto padrão
-        texto_padrao = """O presente laudo técnico de inspeção predial foi elaborado com base nas vistorias realizadas entre os dias {} na edificação localizada em {}, pertencente ao {}. O objetivo foi avaliar as condições gerais da edificação, com foco na integridade estrutural, funcionalidade dos sistemas construtivos, segurança dos usuários, e condições de habitabilidade, em conformidade com as diretrizes da ABNT NBR 16747:2020 e da NBR 13752:2024."""
-        
-        doc.add_paragraph(texto_padrao.format(
-            dados.get('dias_vistoria', ''),
-            dados.get('endereco', ''),
-            dados.get('contratante', '')
-        ))
-    
-    # 15. DATA DO RELATÓRIO
-    doc.add_page_break()
-    doc.add_heading('DATA DO RELATÓRIO TÉCNICO', level=1)
-    
-    p = doc.add_paragraph()
-    p.add_run(f"Em {dados.get('data_laudo').strftime('%d de %B de %Y')}, ")
-    p.add_run("com base nos trabalhos aqui representados encerramos o presente relatório técnico.")
-    
-    # Assinatura
-    for _ in range(3):
-        doc.add_paragraph()
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("_" * 50)
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("Eng. Responsável: Eng. Silvio Albuquerque Filho").bold = True
-    
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run("CREA: 054787D-PE").bold = True
-    
-    if dados.get('art_numero'):
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p.add_run(f"ART: {dados['art_numero']}").bold = True
-    
-    return doc
+def indice_opcao(opcoes, valor, padrao):
+    """Índice de ``valor`` em ``opcoes``, ou do ``padrao`` se o valor não existir"""
+    return opcoes.index(valor) if valor in opcoes else opcoes.index(padrao)
+
+def rotulo_sugerido(probabilidades):
+    """Rótulo das opções com a frequência com que foram usadas com as anomalias do evento"""
+    return lambda opcao: f"{opcao} ({probabilidades[opcao]:.0%})" if opcao in probabilidades else opcao
+
+def referencia_upload(arquivo):
+    """Grava o upload no depósito uma única vez e devolve a referência"""
+    if arquivo.file_id not in st.session_state.refs_upload:
+        st.session_state.refs_upload[arquivo.file_id] = deposito_padrao().guardar(
+            arquivo.getvalue(), arquivo.name)
+    return st.session_state.refs_upload[arquivo.file_id]
 
 # Interface principal
 st.title("🏢 Gerador de Laudos de Inspeção Predial")
@@ -454,35 +114,130 @@ with st.sidebar:
     st.title("📋 Menu")
     st.info("Sistema profissional para geração de laudos técnicos")
     
+    if st.session_state.autosave_recuperavel:
+        laudo_nome, atualizado_em = st.session_state.autosave_recuperavel[:2]
+        st.warning(f"Há alterações não salvas de {atualizado_em.replace('T', ' ')}"
+                   + (f" em {laudo_nome}" if laudo_nome else ""))
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("♻️ Recuperar"):
+                _, _, st.session_state.dados_laudo, st.session_state.eventos = st.session_state.autosave_recuperavel
+                laudo_id = banco_padrao().obter_id(laudo_nome) if laudo_nome else None
+                st.session_state.laudo_atual = {'id': laudo_id, 'nome': laudo_nome} if laudo_id else None
+                st.session_state.autosave.marcar_base(st.session_state.dados_laudo, st.session_state.eventos)
+                st.session_state.autosave_recuperavel = None
+                st.rerun()
+        with col2:
+            if st.button("🗑️ Descartar"):
+                banco_padrao().descartar_autosave(st.query_params['sessao'])
+                st.session_state.autosave_recuperavel = None
+                st.rerun()
+    
     if st.button("🆕 Novo Laudo"):
         st.session_state.dados_laudo = {}
         st.session_state.eventos = []
+        st.session_state.laudo_atual = None
     
     if st.button("💾 Salvar Rascunho"):
         if st.session_state.dados_laudo:
-            nome = f"Rascunho_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            st.session_state.laudos_salvos[nome] = {
-                'dados': st.session_state.dados_laudo.copy(),
-                'eventos': st.session_state.eventos.copy()
-            }
+            # Salvar de novo o mesmo laudo cria uma nova versão dele
+            nome = (st.session_state.laudo_atual or {}).get('nome') or \
+                f"Rascunho_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            laudo_id = banco_padrao().salvar(nome, st.session_state.dados_laudo, st.session_state.eventos)
+            st.session_state.laudo_atual = {'id': laudo_id, 'nome': nome}
             st.success(f"Salvo: {nome}")
     
-    if st.session_state.laudos_salvos:
+    # Laudo .docx já entregue, aberto de volta para edição (sem as fotos)
+    arquivo_docx = st.file_uploader("📤 Abrir laudo .docx", type=['docx'],
+                                    help="Laudo gerado por este sistema; as fotos não são importadas")
+    if arquivo_docx and st.button("📂 Importar para Edição"):
+        try:
+            dados_importados, eventos_importados = importar_laudo(arquivo_docx)
+        except Exception as e:
+            st.error(f"❌ Não foi possível ler o laudo: {str(e)}")
+        else:
+            for evento in eventos_importados:
+                evento['id'] = novo_id_evento()
+            st.session_state.dados_laudo = dados_importados
+            st.session_state.eventos = eventos_importados
+            st.session_state.laudo_atual = None
+            st.success(f"Importado: {arquivo_docx.name} ({len(eventos_importados)} eventos)")
+    
+    total_salvos = banco_padrao().contar()
+    if total_salvos:
         st.divider()
         st.subheader("📂 Laudos Salvos")
-        for nome in st.session_state.laudos_salvos:
-            if st.button(f"📄 {nome}", key=nome):
-                st.session_state.dados_laudo = st.session_state.laudos_salvos[nome]['dados']
-                st.session_state.eventos = st.session_state.laudos_salvos[nome]['eventos']
-                st.success(f"Carregado: {nome}")
+        consulta = st.text_input("🔎 Buscar nos laudos", key='busca_laudos',
+                                 placeholder="Ex: marquise desplacamento natal",
+                                 help="Procura no texto dos laudos e dos eventos, sem diferenciar acentos")
+        paginas = (total_salvos - 1) // LAUDOS_POR_PAGINA + 1
+        pagina = min(st.session_state.pagina_laudos, paginas - 1)
+        if consulta.strip():
+            resultados = banco_padrao().buscar(consulta, RESULTADOS_BUSCA)
+            if not resultados:
+                st.caption("Nenhum laudo encontrado")
+            for resultado in resultados:
+                rotulo = resultado['nome'] + (f" · {resultado['rotulo']}" if resultado['chave'] else "")
+                if st.button(f"📄 {rotulo}", key=f"busca_{resultado['laudo_id']}_{resultado['chave']}"):
+                    st.session_state.dados_laudo, st.session_state.eventos = banco_padrao().carregar(
+                        resultado['laudo_id'])
+                    st.session_state.laudo_atual = {'id': resultado['laudo_id'], 'nome': resultado['nome']}
+                    # Resultado num evento: ele já abre selecionado na aba Eventos
+                    if resultado['chave']:
+                        st.session_state.evento_selecionado = resultado['chave']
+                    st.success(f"Carregado: {resultado['nome']}")
+                st.caption(resultado['trecho'])
+        else:
+            for laudo in banco_padrao().listar(pagina, LAUDOS_POR_PAGINA):
+                if st.button(f"📄 {laudo['nome']}", key=f"laudo_{laudo['id']}",
+                             help=f"{laudo['contratante']} · {laudo['total_eventos']} eventos"):
+                    st.session_state.dados_laudo, st.session_state.eventos = banco_padrao().carregar(laudo['id'])
+                    st.session_state.laudo_atual = {'id': laudo['id'], 'nome': laudo['nome']}
+                    st.success(f"Carregado: {laudo['nome']}")
+        if paginas > 1 and not consulta.strip():
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("◀", disabled=pagina == 0):
+                    st.session_state.pagina_laudos = pagina - 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Página {pagina + 1} de {paginas}")
+            with col3:
+                if st.button("▶", disabled=pagina >= paginas - 1):
+                    st.session_state.pagina_laudos = pagina + 1
+                    st.rerun()
+    
+    # Histórico de versões do laudo aberto
+    if st.session_state.laudo_atual:
+        versoes = banco_padrao().versoes(st.session_state.laudo_atual['id'])
+        if len(versoes) > 1:
+            with st.expander(f"🕘 Versões de {st.session_state.laudo_atual['nome']}"):
+                numero = st.selectbox(
+                    "Versão",
+                    [v['numero'] for v in versoes],
+                    format_func=lambda n: f"v{n} - {next(v['criado_em'] for v in versoes if v['numero'] == n)}"
+                )
+                diferencas = banco_padrao().diff(st.session_state.laudo_atual['id'], numero, versoes[0]['numero'])
+                if any(diferencas.values()):
+                    st.caption(
+                        f"Até a versão atual: {len(diferencas['campos'])} campos alterados, "
+                        f"{len(diferencas['eventos_alterados'])} eventos alterados, "
+                        f"{len(diferencas['eventos_adicionados'])} adicionados, "
+                        f"{len(diferencas['eventos_removidos'])} removidos"
+                    )
+                if st.button("↩️ Restaurar versão"):
+                    st.session_state.dados_laudo, st.session_state.eventos = banco_padrao().carregar(
+                        st.session_state.laudo_atual['id'], numero)
+                    st.success(f"Versão v{numero} restaurada")
 
 # Tabs principais
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "📝 Dados Básicos",
     "📍 Localização",
     "📋 Documentação",
     "🔍 Eventos",
-    "📄 Gerar Laudo"
+    "📄 Gerar Laudo",
+    "📊 Carteira"
 ])
 
 # TAB 1 - DADOS BÁSICOS
@@ -660,6 +415,7 @@ with tab4:
     with col2:
         if st.button("➕ Adicionar Evento"):
             novo_evento = {
+                'id': novo_id_evento(),
                 'numero': len(st.session_state.eventos) + 1,
                 'nome': '',
                 'localizacao': 'Generalidades',
@@ -672,109 +428,216 @@ with tab4:
                 'imagens': []
             }
             st.session_state.eventos.append(novo_evento)
+            st.session_state.evento_selecionado = novo_evento['id']
             st.rerun()
     with col3:
         if st.button("🗑️ Limpar Todos"):
             st.session_state.eventos = []
             st.rerun()
     
-    # Exibir eventos
-    for idx, evento in enumerate(st.session_state.eventos):
-        with st.expander(f"📌 EVENTO {evento['numero']:02d}: {evento.get('nome', 'Sem nome')}", expanded=True):
-            col1, col2 = st.columns([3, 1])
+    # Eventos levantados em campo (planilha ou JSON-lines do tablet), de uma vez
+    with st.expander("📥 Importar eventos de planilha (CSV, XLSX ou JSON-lines)"):
+        arquivo_eventos = st.file_uploader(
+            "Arquivo exportado em campo",
+            type=[extensao.lstrip('.') for extensao in EXTENSOES],
+            key="arquivo_eventos"
+        )
+        st.caption("Colunas: nome, localizacao, anomalias, causa, consequencias, prioridade, uso, "
+                   "recomendacoes e, opcionalmente, descricao. Nas listas, separe os itens com ';'.")
+        if arquivo_eventos and st.button("📥 Importar Eventos"):
+            try:
+                eventos_importados, erros_importacao = importar_eventos(arquivo_eventos, arquivo_eventos.name)
+            except Exception as e:
+                st.error(f"❌ Não foi possível ler o arquivo: {str(e)}")
+            else:
+                if erros_importacao:
+                    st.error(f"❌ {len(erros_importacao)} problemas no arquivo; nenhum evento foi importado")
+                    st.dataframe(
+                        [{'Linha': linha, 'Coluna': coluna, 'Problema': mensagem}
+                         for linha, coluna, mensagem in erros_importacao],
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                else:
+                    for evento in eventos_importados:
+                        evento['id'] = novo_id_evento()
+                        evento['numero'] += len(st.session_state.eventos)
+                    st.session_state.eventos.extend(eventos_importados)
+                    st.success(f"✅ {len(eventos_importados)} eventos importados")
+    
+    # Eventos carregados de versões antigas não têm id estável
+    for evento in st.session_state.eventos:
+        if 'id' not in evento:
+            evento['id'] = novo_id_evento()
+    
+    if st.session_state.eventos:
+        # Descrições dos eventos pela IA (em paralelo; só os que ainda não têm)
+        if st.button("🤖 Descrever eventos com IA", help="Gera a descrição dos eventos que ainda não têm uma"):
+            sem_descricao = [e for e in st.session_state.eventos if not e.get('descricao')]
+            with st.spinner(f"Descrevendo {len(sem_descricao)} eventos..."):
+                try:
+                    for evento, descricao in zip(sem_descricao, redigir_eventos(sem_descricao)):
+                        evento['descricao'] = descricao
+                        st.session_state.pop(f"descricao_{evento['id']}", None)
+                except Exception as e:
+                    st.error(f"❌ Erro na geração com IA: {e}")
+        
+        # Resumo compacto de todos os eventos; só o evento selecionado tem widgets
+        st.dataframe(
+            [{
+                'Evento': f"{evento['numero']:02d}",
+                'Nome': evento.get('nome', ''),
+                'Localização': evento.get('localizacao', ''),
+                'Prioridade': evento.get('prioridade', ''),
+                'Anomalias': ", ".join(evento.get('anomalias', [])),
+                'Imagens': len(evento.get('imagens') or [])
+            } for evento in st.session_state.eventos],
+            hide_index=True,
+            use_container_width=True,
+            height=min(38 + 35 * len(st.session_state.eventos), 300)
+        )
+        
+        eventos_por_id = {evento['id']: evento for evento in st.session_state.eventos}
+        ids_eventos = list(eventos_por_id)
+        if st.session_state.get('evento_selecionado') not in eventos_por_id:
+            st.session_state.evento_selecionado = ids_eventos[0]
+        evento_id = st.selectbox(
+            "Evento em edição",
+            options=ids_eventos,
+            index=ids_eventos.index(st.session_state.evento_selecionado),
+            format_func=lambda i: f"EVENTO {eventos_por_id[i]['numero']:02d}: {eventos_por_id[i].get('nome') or 'Sem nome'}"
+        )
+        st.session_state.evento_selecionado = evento_id
+        evento = eventos_por_id[evento_id]
+        
+        # Editor do evento: as alterações só são aplicadas ao enviar o formulário
+        with st.form(key=f"form_{evento_id}"):
+            st.markdown(f"**📌 EVENTO {evento['numero']:02d}**")
+            nome = st.text_input("Nome do Evento", value=evento.get('nome', ''), key=f"nome_{evento_id}")
+            descricao = st.text_area("Descrição (opcional)", value=evento.get('descricao', ''),
+                                     key=f"descricao_{evento_id}", height=100)
             
-            with col1:
-                evento['nome'] = st.text_input(
-                    "Nome do Evento",
-                    value=evento.get('nome', ''),
-                    key=f"nome_{idx}"
+            # Localização
+            loc_col1, loc_col2 = st.columns(2)
+            with loc_col1:
+                generalidades = st.checkbox(
+                    "Generalidades",
+                    value=evento.get('localizacao') == 'Generalidades',
+                    key=f"gen_{evento_id}"
+                )
+            with loc_col2:
+                loc_custom = st.text_input(
+                    "Ou especifique:",
+                    value='' if evento.get('localizacao') == 'Generalidades' else evento.get('localizacao', ''),
+                    key=f"loc_{evento_id}"
                 )
             
-    with col2:
-        if st.button("❌ Remover", key=f"remove_{idx}"):
-            st.session_state.eventos.pop(idx)
+            # Anomalias
+            anomalias = st.multiselect(
+                "Anomalias",
+                options=OPCOES['anomalias'],
+                default=[a for a in evento.get('anomalias', []) if a in OPCOES['anomalias']],
+                key=f"anom_{evento_id}"
+            )
+            
+            # Causa, consequências e recomendações: primeiro as mais usadas em laudos
+            # anteriores com as anomalias do evento (o índice carrega em segundo plano)
+            sugestoes = sugestoes_padrao().sugerir(evento.get('anomalias', []))
+            if not sugestoes_padrao().pronto:
+                st.caption("💡 Carregando as sugestões a partir dos laudos salvos...")
+            opcoes_causas = ordenar(OPCOES['causas'], sugestoes['causa'])
+            causa = st.selectbox(
+                "Provável Causa",
+                options=opcoes_causas,
+                index=indice_opcao(opcoes_causas, evento.get('causa'), 'Funcional'),
+                format_func=rotulo_sugerido(dict(sugestoes['causa'])),
+                key=f"causa_{evento_id}"
+            )
+            
+            # Consequências
+            consequencias = st.multiselect(
+                "Consequências",
+                options=ordenar(OPCOES['consequencias'], sugestoes['consequencias']),
+                default=[c for c in evento.get('consequencias', []) if c in OPCOES['consequencias']],
+                format_func=rotulo_sugerido(dict(sugestoes['consequencias'])),
+                key=f"cons_{evento_id}"
+            )
+            
+            # Prioridade
+            prioridade = st.radio(
+                "Patamar de Urgência",
+                PRIORIDADES,
+                index=indice_opcao(PRIORIDADES, evento.get('prioridade'), 'Prioridade 2'),
+                key=f"prio_{evento_id}",
+                horizontal=True
+            )
+            
+            # Uso
+            uso = st.radio(
+                "Uso",
+                USOS,
+                index=indice_opcao(USOS, evento.get('uso'), 'Regular'),
+                key=f"uso_{evento_id}",
+                horizontal=True
+            )
+            
+            # Recomendações
+            recomendacoes = st.multiselect(
+                "Recomendações Técnicas",
+                options=ordenar(OPCOES['recomendacoes'], sugestoes['recomendacoes']),
+                default=[r for r in evento.get('recomendacoes', []) if r in OPCOES['recomendacoes']],
+                format_func=rotulo_sugerido(dict(sugestoes['recomendacoes'])),
+                key=f"rec_{evento_id}"
+            )
+            
+            # Upload de imagens
+            st.write("📷 Imagens do Evento (2-3 imagens)")
+            if evento.get('imagens'):
+                st.caption("Anexadas: " + ", ".join(img.get('nome') or img['hash'][:12] for img in evento['imagens']))
+            imgs = st.file_uploader(
+                "Selecione as imagens (substituem as anexadas)",
+                type=['png', 'jpg', 'jpeg'],
+                accept_multiple_files=True,
+                key=f"imgs_{evento_id}"
+            )
+            
+            col_aplicar, col_preencher = st.columns(2)
+            with col_aplicar:
+                aplicar = st.form_submit_button("💾 Aplicar alterações", use_container_width=True)
+            with col_preencher:
+                preencher = st.form_submit_button(
+                    "💡 Aplicar e preencher pelas anomalias", use_container_width=True,
+                    help="Causa mais provável e, se vazias, as consequências e recomendações "
+                         "mais usadas com essas anomalias nos laudos salvos"
+                )
+            if aplicar or preencher:
+                evento.update({
+                    'nome': nome,
+                    'descricao': descricao,
+                    'localizacao': loc_custom or ("Generalidades" if generalidades else evento.get('localizacao', '')),
+                    'anomalias': anomalias,
+                    'causa': causa,
+                    'consequencias': consequencias,
+                    'prioridade': prioridade,
+                    'uso': uso,
+                    'recomendacoes': recomendacoes
+                })
+                if preencher:
+                    sugestoes_padrao().preencher(evento)
+                if imgs:
+                    if len(imgs) > 3:
+                        st.warning("Máximo de 3 imagens. Usando apenas as 3 primeiras.")
+                        imgs = imgs[:3]
+                    # Na sessão ficam só as referências; o conteúdo vai para o depósito em disco
+                    evento['imagens'] = [referencia_upload(img) for img in imgs]
+                st.rerun()
+        
+        if st.button("❌ Remover evento", key=f"remove_{evento_id}"):
+            st.session_state.eventos = [e for e in st.session_state.eventos if e['id'] != evento_id]
             # Renumerar eventos
             for i, evt in enumerate(st.session_state.eventos):
                 evt['numero'] = i + 1
             st.rerun()
-    
-    # Localização
-    loc_col1, loc_col2 = st.columns(2)
-    with loc_col1:
-        if st.checkbox("Generalidades", 
-                        value=evento.get('localizacao') == 'Generalidades', 
-                        key=f"gen_{idx}"):
-            evento['localizacao'] = "Generalidades"
-    with loc_col2:
-        loc_custom = st.text_input("Ou especifique:", key=f"loc_{idx}")
-        if loc_custom:
-            evento['localizacao'] = loc_custom
-    
-    # Anomalias
-    evento['anomalias'] = st.multiselect(
-        "Anomalias",
-        options=OPCOES['anomalias'],
-        default=evento.get('anomalias', []),
-        key=f"anom_{idx}"
-    )
-    
-    # Causa
-    evento['causa'] = st.selectbox(
-        "Provável Causa",
-        options=OPCOES['causas'],
-        index=OPCOES['causas'].index(evento.get('causa', 'Funcional')),
-        key=f"causa_{idx}"
-    )
-    
-    # Consequências
-    evento['consequencias'] = st.multiselect(
-        "Consequências",
-        options=OPCOES['consequencias'],
-        default=evento.get('consequencias', []),
-        key=f"cons_{idx}"
-    )
-    
-    # Prioridade
-    evento['prioridade'] = st.radio(
-        "Patamar de Urgência",
-        ["Prioridade 1", "Prioridade 2", "Prioridade 3"],
-        index=["Prioridade 1", "Prioridade 2", "Prioridade 3"].index(
-            evento.get('prioridade', 'Prioridade 2')),
-        key=f"prio_{idx}",
-        horizontal=True
-    )
-    
-    # Uso
-    evento['uso'] = st.radio(
-        "Uso",
-        ["Regular", "Irregular"],
-        index=["Regular", "Irregular"].index(evento.get('uso', 'Regular')),
-        key=f"uso_{idx}",
-        horizontal=True
-    )
-    
-    # Recomendações
-    evento['recomendacoes'] = st.multiselect(
-        "Recomendações Técnicas",
-        options=OPCOES['recomendacoes'],
-        default=evento.get('recomendacoes', []),
-        key=f"rec_{idx}"
-    )
-    
-    # Upload de imagens
-    st.write("📷 Imagens do Evento (2-3 imagens)")
-    imgs = st.file_uploader(
-        "Selecione as imagens",
-        type=['png', 'jpg', 'jpeg'],
-        accept_multiple_files=True,
-        key=f"imgs_{idx}"
-    )
-    if imgs:
-        if len(imgs) > 3:
-            st.warning("Máximo de 3 imagens. Usando apenas as 3 primeiras.")
-            evento['imagens'] = imgs[:3]
-        else:
-            evento['imagens'] = imgs
 
 # TAB 5 - GERAR LAUDO
 with tab5:
@@ -783,7 +646,7 @@ with tab5:
    # Opções do texto
    opcao_texto = st.radio(
        "Como deseja gerar o texto do laudo?",
-       ["📝 Usar texto padrão", "✏️ Escrever manualmente"]
+       ["📝 Usar texto padrão", "✏️ Escrever manualmente", "🤖 Gerar com IA"]
    )
    
    texto_laudo = ""
@@ -801,6 +664,39 @@ Recomenda-se, com o devido grau de urgência e priorização, a execução das i
        # Preview
        st.text_area("Preview do texto padrão", texto_laudo, height=300, disabled=True)
        
+   elif opcao_texto == "🤖 Gerar com IA":
+       col1, col2 = st.columns(2)
+       with col1:
+           redigir = st.button("🤖 Redigir laudo técnico com IA")
+       with col2:
+           # Clicar interrompe a execução atual; o texto recebido até ali é mantido
+           st.button("⏹️ Cancelar", help="Interrompe a redação e mantém o texto já recebido")
+       if redigir:
+           # Texto exibido conforme chega, atualizado no máximo a cada 0,1 s
+           previa = st.empty()
+           st.session_state.dados_laudo['texto_laudo'] = ''
+           ultima_exibicao = 0.0
+           try:
+               with closing(transmitir_conclusao(st.session_state.dados_laudo, st.session_state.eventos)) as partes:
+                   for parte in partes:
+                       st.session_state.dados_laudo['texto_laudo'] += parte
+                       if time.monotonic() - ultima_exibicao > 0.1:
+                           previa.text_area("Redigindo...", st.session_state.dados_laudo['texto_laudo'] + " ▌",
+                                            height=400, disabled=True)
+                           ultima_exibicao = time.monotonic()
+           except Exception as e:
+               st.error(f"❌ Erro na geração com IA: {e}")
+           finally:
+               # Também quando "Cancelar" interrompe a execução: o texto parcial
+               # é guardado da mesma forma que o completo
+               st.session_state.dados_laudo['texto_laudo'] = st.session_state.dados_laudo['texto_laudo'].strip()
+           previa.empty()
+       texto_laudo = st.text_area(
+           "Texto redigido pela IA (revise antes de gerar)",
+           value=st.session_state.dados_laudo.get('texto_laudo', ''),
+           height=400
+       )
+       
    else:
        texto_laudo = st.text_area(
            "Digite o texto completo do laudo",
@@ -820,6 +716,8 @@ Recomenda-se, com o devido grau de urgência e priorização, a execução das i
        incluir_numeracao = st.checkbox("Incluir numeração de páginas", value=True)
    with col2:
        versao = st.number_input("Versão do documento", min_value=1, value=1)
+       medir_tempos = st.checkbox("Medir tempo por seção", value=False,
+                                  help="Mostra no resumo quanto tempo cada seção levou para ser gerada")
    
    # Validação
    campos_obrigatorios = ['contratante', 'cnpj', 'endereco', 'cidade_estado', 'dias_vistoria']
@@ -835,67 +733,170 @@ Recomenda-se, com o devido grau de urgência e priorização, a execução das i
        col1, col2, col3 = st.columns([1, 2, 1])
        with col2:
            if st.button("🚀 GERAR LAUDO COMPLETO", type="primary", use_container_width=True):
-               with st.spinner("Gerando documento... Por favor aguarde..."):
-                   try:
-                       # Gerar documento
-                       doc = gerar_documento_completo(
-                           st.session_state.dados_laudo,
-                           st.session_state.eventos,
-                           incluir_rodape,
-                           incluir_numeracao,
-                           versao
+               try:
+                   # Nome do arquivo
+                   nome_arquivo = nome_arquivo_laudo(st.session_state.dados_laudo, versao)
+                   
+                   # Geração em segundo plano: a sessão continua livre enquanto o laudo é montado
+                   fila_padrao().enviar(
+                       st.query_params['sessao'],
+                       nome_arquivo,
+                       st.session_state.dados_laudo,
+                       st.session_state.eventos,
+                       incluir_rodape,
+                       incluir_numeracao,
+                       versao,
+                       medir_tempos
+                   )
+                   
+                   # Salvar no banco (nova versão do laudo aberto, se houver)
+                   nome_salvo = (st.session_state.laudo_atual or {}).get('nome') or nome_arquivo
+                   laudo_id = banco_padrao().salvar(nome_salvo, st.session_state.dados_laudo, st.session_state.eventos)
+                   st.session_state.laudo_atual = {'id': laudo_id, 'nome': nome_salvo}
+               except Exception as e:
+                   st.error(f"❌ Erro ao gerar documento: {str(e)}")
+                   st.error("Por favor, verifique se todos os campos estão preenchidos corretamente.")
+   
+   # Laudos gerados nesta sessão (continuam disponíveis depois de recarregar a página)
+   trabalhos = fila_padrao().trabalhos(st.query_params['sessao'])
+   for posicao, trabalho in enumerate(trabalhos):
+       if trabalho['estado'] in ('pendente', 'executando'):
+           acompanhar_fila = True
+           etapa = ROTULOS_ETAPAS.get(trabalho['etapa'], "Na fila")
+           if trabalho['etapa'] in ('imagens', 'eventos') and trabalho['total']:
+               etapa += f" {trabalho['atual'] + (trabalho['etapa'] == 'eventos')} de {trabalho['total']}"
+           st.progress(trabalho['progresso'], text=f"⏳ {trabalho['nome_arquivo']}: {etapa}...")
+       elif trabalho['estado'] == 'erro':
+           st.error(f"❌ Erro ao gerar {trabalho['nome_arquivo']}: {trabalho['erro']}")
+       elif posicao == 0:
+           # Sucesso e download
+           st.success(f"✅ Laudo gerado com sucesso!")
+           if trabalho['do_cache']:
+               st.caption("⚡ Laudo idêntico já gerado anteriormente: recuperado do cache")
+           if trabalho['id'] not in st.session_state.trabalhos_vistos:
+               st.session_state.trabalhos_vistos.add(trabalho['id'])
+               st.balloons()
+           
+           # Botão de download
+           conteudo = fila_padrao().conteudo(trabalho['id']) or b''
+           col1, col2, col3 = st.columns([1, 2, 1])
+           with col2:
+               st.download_button(
+                   label="📥 BAIXAR LAUDO",
+                   data=conteudo,
+                   file_name=trabalho['nome_arquivo'],
+                   mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                   use_container_width=True,
+                   key=f"baixar_{trabalho['id']}"
+               )
+               
+               # PDF convertido pelo LibreOffice em segundo plano
+               estado_pdf, pdf = pool_padrao().estado(chave_pdf(conteudo))
+               if estado_pdf == PRONTO:
+                   st.download_button(
+                       label="📄 BAIXAR PDF",
+                       data=pdf,
+                       file_name=os.path.splitext(trabalho['nome_arquivo'])[0] + '.pdf',
+                       mime="application/pdf",
+                       use_container_width=True,
+                       key=f"baixar_pdf_{trabalho['id']}"
+                   )
+               elif estado_pdf == CONVERTENDO:
+                   acompanhar_fila = True
+                   st.caption("⏳ Convertendo para PDF...")
+               else:
+                   if estado_pdf == ERRO:
+                       st.error(f"❌ Erro na conversão para PDF: {pdf}")
+                   if st.button("📄 GERAR PDF", use_container_width=True, key=f"pdf_{trabalho['id']}"):
+                       try:
+                           pool_padrao().enviar(conteudo)
+                           st.rerun()
+                       except RuntimeError as e:
+                           st.error(f"❌ {e}")
+           
+           st.info(f"📁 Arquivo: {trabalho['nome_arquivo']}")
+           
+           # Informações do laudo
+           with st.expander("📊 Resumo do Laudo Gerado"):
+               col1, col2 = st.columns(2)
+               with col1:
+                   st.write("**Contratante:**", st.session_state.dados_laudo.get('contratante', ''))
+                   st.write("**CNPJ:**", st.session_state.dados_laudo.get('cnpj', ''))
+                   st.write("**Endereço:**", st.session_state.dados_laudo.get('endereco', ''))
+               with col2:
+                   st.write("**Total de Eventos:**", trabalho['total_eventos'])
+                   st.write("**Prioridade 1:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 1'))
+                   st.write("**Prioridade 2:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 2'))
+                   st.write("**Prioridade 3:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 3'))
+               
+               if trabalho['tempos'] is not None:
+                   st.write("**Tempo por seção:**")
+                   if trabalho['tempos']:
+                       st.dataframe(
+                           [{'Seção': nome, 'Tempo (ms)': round(segundos * 1000, 1),
+                             '%': round(100 * segundos / trabalho['segundos'], 1)}
+                            for nome, segundos in trabalho['tempos'].items()],
+                           hide_index=True,
+                           use_container_width=True
                        )
-                       
-                       # Salvar em buffer
-                       doc_buffer = io.BytesIO()
-                       doc.save(doc_buffer)
-                       doc_buffer.seek(0)
-                       
-                       # Nome do arquivo
-                       contratante_nome = st.session_state.dados_laudo['contratante'].replace(' ', '_')
-                       data_str = st.session_state.dados_laudo['data_laudo'].strftime('%Y%m%d')
-                       nome_arquivo = f"LAUDO_{contratante_nome}_{data_str}_v{versao}.docx"
-                       
-                       # Sucesso e download
-                       st.success(f"✅ Laudo gerado com sucesso!")
-                       st.balloons()
-                       
-                       # Botão de download
-                       col1, col2, col3 = st.columns([1, 2, 1])
-                       with col2:
-                           st.download_button(
-                               label="📥 BAIXAR LAUDO",
-                               data=doc_buffer,
-                               file_name=nome_arquivo,
-                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                               use_container_width=True
-                           )
-                       
-                       # Salvar na memória
-                       st.session_state.laudos_salvos[nome_arquivo] = {
-                           'dados': st.session_state.dados_laudo.copy(),
-                           'eventos': st.session_state.eventos.copy(),
-                           'data_criacao': datetime.now()
-                       }
-                       
-                       st.info(f"📁 Arquivo: {nome_arquivo}")
-                       
-                       # Informações do laudo
-                       with st.expander("📊 Resumo do Laudo Gerado"):
-                           col1, col2 = st.columns(2)
-                           with col1:
-                               st.write("**Contratante:**", st.session_state.dados_laudo['contratante'])
-                               st.write("**CNPJ:**", st.session_state.dados_laudo['cnpj'])
-                               st.write("**Endereço:**", st.session_state.dados_laudo['endereco'])
-                           with col2:
-                               st.write("**Total de Eventos:**", len(st.session_state.eventos))
-                               st.write("**Prioridade 1:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 1'))
-                               st.write("**Prioridade 2:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 2'))
-                               st.write("**Prioridade 3:**", sum(1 for e in st.session_state.eventos if e['prioridade'] == 'Prioridade 3'))
-                       
-                   except Exception as e:
-                       st.error(f"❌ Erro ao gerar documento: {str(e)}")
-                       st.error("Por favor, verifique se todos os campos estão preenchidos corretamente.")
+                   st.caption(f"Total: {trabalho['segundos'] * 1000:.0f} ms"
+                              + (" (recuperado do cache)" if trabalho['do_cache'] else ""))
+       else:
+           st.download_button(
+               label=f"📥 {trabalho['nome_arquivo']} ({trabalho['criado_em'][11:16]})",
+               data=fila_padrao().conteudo(trabalho['id']) or b'',
+               file_name=trabalho['nome_arquivo'],
+               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+               key=f"baixar_{trabalho['id']}"
+           )
+
+# TAB 6 - ANÁLISE DA CARTEIRA
+with tab6:
+    st.subheader("📊 Análise da Carteira")
+    # As abas rodam a cada execução: a carga do acervo só acontece com a análise ligada
+    if st.toggle("Analisar os eventos de todos os laudos salvos", key='analise_ativa',
+                 help="A primeira carga lê o acervo inteiro; depois, só os laudos alterados"):
+        analise = analise_padrao()
+        with st.spinner("Carregando os eventos dos laudos salvos..."):
+            analise.atualizar()
+        
+        dimensoes = list(DIMENSOES)
+        col1, col2 = st.columns(2)
+        with col1:
+            linhas = st.selectbox("Linhas", dimensoes, index=dimensoes.index('anomalias'),
+                                  format_func=DIMENSOES.get, key='analise_linhas')
+        with col2:
+            colunas = st.selectbox("Colunas", [None] + dimensoes, index=1 + dimensoes.index('tipo_empreendimento'),
+                                   format_func=lambda d: "—" if d is None else DIMENSOES[d], key='analise_colunas')
+        
+        with st.expander("🔽 Filtros", expanded=True):
+            filtros = {}
+            colunas_filtros = st.columns(3)
+            for i, dimensao in enumerate(dimensoes):
+                with colunas_filtros[i % 3]:
+                    filtros[dimensao] = st.multiselect(DIMENSOES[dimensao], analise.valores(dimensao),
+                                                       key=f"analise_filtro_{dimensao}")
+        
+        rotulos_linhas, rotulos_colunas, matriz = analise.contar(linhas, colunas, filtros)
+        total_eventos, total_laudos = analise.totais(filtros)
+        st.caption(f"{total_eventos} eventos de {total_laudos} laudos"
+                   + (" · eventos com várias opções contam uma vez em cada"
+                      if linhas in MULTIPLAS or colunas in MULTIPLAS else ""))
+        if rotulos_linhas:
+            tabela = {DIMENSOES[linhas]: rotulos_linhas,
+                      **{rotulo: matriz[:, j] for j, rotulo in enumerate(rotulos_colunas)}}
+            st.bar_chart(tabela, x=DIMENSOES[linhas], y=rotulos_colunas)
+            st.dataframe(tabela, hide_index=True, use_container_width=True)
+        else:
+            st.info("Nenhum evento com esses filtros.")
+
+# Salvamento automático das alterações desta execução
+if not st.session_state.autosave_recuperavel:
+    st.session_state.autosave.verificar(
+        st.session_state.dados_laudo,
+        st.session_state.eventos,
+        (st.session_state.laudo_atual or {}).get('nome')
+    )
 
 # Footer
 st.divider()
@@ -904,4 +905,9 @@ st.markdown("""
    <p>Sistema de Geração de Laudos de Inspeção Predial v1.0</p>
    <p>Desenvolvido para facilitar a criação de laudos técnicos profissionais</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Andamento dos laudos na fila
+if acompanhar_fila:
+    time.sleep(INTERVALO_ACOMPANHAMENTO)
+    st.rerun()
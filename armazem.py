@@ -0,0 +1,127 @@
+"""Armazenamento em disco com chave, limite de tamanho e descarte LRU.
+
+Base do depósito de imagens e do cache de documentos: cada item é um
+arquivo ``diretorio/<chave[:2]>/<chave>``, gravado de forma atômica; a data
+de modificação marca o último uso e, passado o limite, os itens usados há
+mais tempo são removidos. Vários processos podem compartilhar o diretório.
+
+O diretório é percorrido uma única vez, na abertura; depois disso um índice
+em memória (em ordem de uso) acompanha as leituras e gravações, e o descarte
+só consulta o disco para os itens que vai remover.
+"""
+from collections import OrderedDict
+import os
+import tempfile
+import threading
+import time
+
+# Após passar do limite, o descarte libera espaço até esta fração dele, para
+# que as próximas gravações não precisem descartar de novo
+FRACAO_APOS_DESCARTE = 0.9
+
+
+class ArmazemDisco:
+    """Itens ``chave -> bytes`` em disco, com limite de tamanho e descarte LRU.
+
+    ``fixados``, se dado, é chamado no descarte e devolve as chaves que não
+    podem ser removidas (ainda referenciadas em outro lugar).
+    """
+
+    def __init__(self, diretorio, limite_bytes, fixados=None):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self.fixados = fixados
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        # chave -> [tamanho, último uso conhecido], do usado há mais tempo para o mais recente
+        self._itens = OrderedDict(
+            (nome, [tamanho, uso])
+            for nome, uso, tamanho in sorted(self._arquivos(), key=lambda item: item[1])
+        )
+        self._total = sum(tamanho for tamanho, _ in self._itens.values())
+
+    def caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave)
+
+    def _usar(self, chave, tamanho):
+        """Marca o item como o mais recente no índice (chamado com o lock)"""
+        item = self._itens.get(chave)
+        if item is None:
+            self._itens[chave] = [tamanho, time.time()]
+            self._total += tamanho
+        else:
+            item[1] = time.time()
+            self._itens.move_to_end(chave)
+
+    def ler(self, chave):
+        """Conteúdo do item, ou ``None`` se não existir; marca o item como usado"""
+        caminho = self.caminho(chave)
+        try:
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._usar(chave, len(conteudo))
+        return conteudo
+
+    def gravar(self, chave, conteudo):
+        """Grava o item se ainda não existir (senão só marca o uso)"""
+        caminho = self.caminho(chave)
+        with self._lock:
+            if os.path.exists(caminho):
+                os.utime(caminho)
+                self._usar(chave, len(conteudo))
+                return
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+            self._usar(chave, len(conteudo))
+            if self._total > self.limite_bytes:
+                self._despejar(manter=chave)
+
+    def existe(self, chave):
+        return os.path.exists(self.caminho(chave))
+
+    @property
+    def tamanho_total(self):
+        return self._total
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.startswith('.tmp'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(raiz, nome))
+                except FileNotFoundError:
+                    continue
+                yield nome, st.st_mtime, st.st_size
+
+    def _despejar(self, manter=None):
+        """Remove os itens menos usados até caber no limite (chamado com o lock)"""
+        fixados = set(self.fixados()) if self.fixados else set()
+        alvo = self.limite_bytes * FRACAO_APOS_DESCARTE
+        for chave in list(self._itens):
+            if self._total <= alvo:
+                break
+            if chave == manter or chave in fixados:
+                continue
+            tamanho, uso = self._itens[chave]
+            caminho = self.caminho(chave)
+            try:
+                # Outras réplicas do app podem compartilhar o diretório: um item
+                # usado por elas depois do que este índice sabe não é descartado
+                modificado = os.stat(caminho).st_mtime
+                if modificado > uso + 1:
+                    self._itens[chave][1] = modificado
+                    self._itens.move_to_end(chave)
+                    continue
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            del self._itens[chave]
+            self._total -= tamanho
@@ -0,0 +1,67 @@
+"""Salvamento automático incremental da sessão de edição.
+
+A cada rerun do Streamlit, ``AutoSalvamento.verificar`` compara os hashes
+de cada campo de ``dados_laudo`` e de cada evento com o último ponto de
+controle e grava no banco apenas as partes que mudaram. Gravações ficam
+espaçadas por ``intervalo`` segundos: a primeira alteração é gravada na
+hora e as seguintes, dentro do intervalo, ficam pendentes até o próximo
+rerun depois dele, de modo que digitar não vira uma gravação por tecla.
+"""
+import time
+
+from banco import partes_laudo
+
+INTERVALO_AUTOSAVE = 5.0
+
+
+class AutoSalvamento:
+    """Ponto de controle do salvamento automático de uma sessão"""
+
+    def __init__(self, banco, sessao, intervalo=INTERVALO_AUTOSAVE):
+        self.banco = banco
+        self.sessao = sessao
+        self.intervalo = intervalo
+        self.ultima_gravacao = 0.0
+        self.pendente = False
+        self._campos = {}
+        self._eventos = {}
+
+    def marcar_base(self, dados, eventos):
+        """Define o estado atual como ponto de controle, sem gravar"""
+        campos, lista_eventos, _ = partes_laudo(dados, eventos)
+        self._campos = campos
+        self._eventos = {chave: (posicao, h) for posicao, (chave, h) in enumerate(lista_eventos)}
+        self.pendente = False
+
+    def verificar(self, dados, eventos, laudo_nome=None, forcar=False):
+        """Grava as alterações desde o último ponto de controle, respeitando o intervalo.
+
+        Devolve o número de partes gravadas (0 se nada mudou ou se ficou pendente).
+        """
+        campos, lista_eventos, blobs = partes_laudo(dados, eventos)
+        eventos_atual = {chave: (posicao, h) for posicao, (chave, h) in enumerate(lista_eventos)}
+
+        campos_alterados = {c: h for c, h in campos.items() if self._campos.get(c) != h}
+        eventos_alterados = {k: v for k, v in eventos_atual.items() if self._eventos.get(k) != v}
+        removidos = [('campo', c) for c in self._campos if c not in campos]
+        removidos += [('evento', k) for k in self._eventos if k not in eventos_atual]
+        if not (campos_alterados or eventos_alterados or removidos):
+            self.pendente = False
+            return 0
+
+        agora = time.monotonic()
+        if not forcar and agora - self.ultima_gravacao < self.intervalo:
+            self.pendente = True
+            return 0
+
+        hashes = set(campos_alterados.values()) | {h for _, h in eventos_alterados.values()}
+        self.banco.gravar_autosave(
+            self.sessao, laudo_nome, campos_alterados, eventos_alterados, removidos,
+            {h: texto for h, texto in blobs.items() if h in hashes},
+        )
+        self._campos = campos
+        self._eventos = eventos_atual
+        self.ultima_gravacao = agora
+        self.pendente = False
+        return len(campos_alterados) + len(eventos_alterados) + len(removidos)
+
@@ -0,0 +1,561 @@
+"""Armazenamento persistente dos laudos em SQLite.
+
+Substitui o antigo ``st.session_state.laudos_salvos``: os laudos ficam em
+disco (modo WAL, para leituras concorrentes entre sessões e réplicas), a
+listagem lê apenas as colunas de resumo, paginada, e carregar um rascunho
+desserializa somente aquele laudo.
+
+Cada salvamento cria uma versão. O conteúdo é guardado por partes (cada
+campo de ``dados`` e cada evento) na tabela ``blobs``, endereçada pelo hash
+do JSON canônico; a versão guarda apenas o manifesto ``campo -> hash`` e a
+lista ``[chave do evento, hash]``. Partes inalteradas são compartilhadas
+entre versões, então salvar com frequência grava só o que mudou.
+
+O índice da busca textual (``busca``) fica no mesmo banco e é atualizado na
+mesma transação de cada salvamento.
+
+Cada salvamento (e cada remoção) incrementa um contador de revisões do banco,
+e a versão atual de cada laudo guarda a revisão em que foi gravada. Ao
+contrário do id, que o SQLite reaproveita depois de uma remoção, o par
+``(id, revisão)`` nunca se repete; junto com a ``identidade`` aleatória do
+banco, é o que os índices derivados (sugestões, análise) usam para saber o
+que mudou.
+"""
+from datetime import date, datetime, timedelta
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import busca
+from config import DIRETORIO_DADOS
+from gerador import normalizar_dados
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS laudos (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL UNIQUE,
+    contratante TEXT NOT NULL DEFAULT '',
+    cnpj TEXT NOT NULL DEFAULT '',
+    data_laudo TEXT,
+    criado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    total_eventos INTEGER NOT NULL DEFAULT 0,
+    versao_atual INTEGER NOT NULL DEFAULT 0,
+    revisao INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_laudos_contratante ON laudos (contratante);
+CREATE INDEX IF NOT EXISTS idx_laudos_cnpj ON laudos (cnpj);
+CREATE INDEX IF NOT EXISTS idx_laudos_data_laudo ON laudos (data_laudo);
+CREATE INDEX IF NOT EXISTS idx_laudos_criado_em ON laudos (criado_em);
+
+-- Identidade do banco e contador de revisões (uma linha só)
+CREATE TABLE IF NOT EXISTS banco_info (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    identidade TEXT NOT NULL,
+    revisao INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS versoes (
+    laudo_id INTEGER NOT NULL REFERENCES laudos (id) ON DELETE CASCADE,
+    numero INTEGER NOT NULL,
+    criado_em TEXT NOT NULL,
+    campos TEXT NOT NULL,
+    eventos TEXT NOT NULL,
+    PRIMARY KEY (laudo_id, numero)
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    conteudo TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Fotos do depósito referenciadas por cada blob de evento (ver ``imagens_referenciadas``)
+CREATE TABLE IF NOT EXISTS imagens_blobs (
+    imagem TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    PRIMARY KEY (imagem, blob)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS autosave_sessoes (
+    sessao TEXT PRIMARY KEY,
+    laudo_nome TEXT,
+    atualizado_em TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS autosave (
+    sessao TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    posicao INTEGER NOT NULL DEFAULT 0,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (sessao, tipo, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_autosave_hash ON autosave (hash);
+
+-- Blobs criados pelo salvamento automático que nenhuma versão usou ainda: são
+-- apagados assim que nenhuma sessão os referencia (ver ``_coletar_autosave``)
+CREATE TABLE IF NOT EXISTS blobs_autosave (
+    hash TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+# Salvamentos automáticos de sessões abandonadas há mais que isso são apagados
+DIAS_AUTOSAVE = 30
+# Intervalo da manutenção periódica (``manutencao``) do banco padrão
+INTERVALO_MANUTENCAO = 3600.0
+
+COLUNAS_RESUMO = "id, nome, contratante, cnpj, data_laudo, criado_em, atualizado_em, total_eventos, versao_atual"
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Valor não serializável: {type(valor).__name__}")
+
+
+def para_json(valor):
+    """JSON canônico (chaves ordenadas), base do hash das partes"""
+    return json.dumps(valor, ensure_ascii=False, default=_json_padrao, separators=(',', ':'),
+                      sort_keys=True)
+
+
+def hash_json(texto):
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def chave_evento(evento, indice):
+    """Identidade do evento entre versões: o ``id`` estável ou a posição"""
+    return evento.get('id', indice)
+
+
+def partes_laudo(dados, eventos):
+    """Manifestos ``campo -> hash`` e ``[[chave, hash], ...]`` e os blobs ``hash -> json``"""
+    blobs = {}
+    campos = {}
+    for campo, valor in dados.items():
+        texto = para_json(valor)
+        campos[campo] = hash_json(texto)
+        blobs[campos[campo]] = texto
+    lista_eventos = []
+    for indice, evento in enumerate(eventos):
+        texto = para_json(evento)
+        h = hash_json(texto)
+        blobs[h] = texto
+        lista_eventos.append([chave_evento(evento, indice), h])
+    return campos, lista_eventos, blobs
+
+
+def imagens_blobs(blobs):
+    """Pares ``(hash da foto, hash do blob)`` dos eventos com fotos do depósito em ``blobs``"""
+    pares = []
+    for h, texto in blobs.items():
+        # JSON canônico: só eventos com fotos têm este trecho
+        if '"imagens":[{' not in texto:
+            continue
+        for imagem in json.loads(texto).get('imagens') or []:
+            if isinstance(imagem, dict) and imagem.get('hash'):
+                pares.append((imagem['hash'], h))
+    return pares
+
+
+class BancoLaudos:
+    """Laudos salvos em SQLite, com uma conexão por thread"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as con:
+            sem_imagens_blobs = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'imagens_blobs'"
+            ).fetchone() is None
+            con.executescript(ESQUEMA)
+            con.executescript(busca.ESQUEMA_BUSCA)
+        with self._conexao() as con:
+            con.execute("BEGIN IMMEDIATE")
+            if 'revisao' not in {linha['name'] for linha in con.execute("PRAGMA table_info(laudos)")}:
+                # Banco anterior às revisões: o id, único até aqui, serve de primeira revisão
+                con.execute("ALTER TABLE laudos ADD COLUMN revisao INTEGER NOT NULL DEFAULT 0")
+                con.execute("UPDATE laudos SET revisao = id")
+            con.execute(
+                "INSERT OR IGNORE INTO banco_info (id, identidade, revisao) "
+                "SELECT 1, ?, COALESCE(MAX(revisao), 0) FROM laudos",
+                (uuid.uuid4().hex,),
+            )
+        if sem_imagens_blobs:
+            # Banco anterior à tabela: as fotos dos blobs já gravados também ficam presas
+            with self._conexao() as con:
+                con.executemany("INSERT OR IGNORE INTO imagens_blobs (imagem, blob) VALUES (?, ?)",
+                                imagens_blobs(dict(con.execute(
+                                    "SELECT hash, conteudo FROM blobs WHERE conteudo LIKE '%\"imagens\":[{%'"))))
+        if busca.versao_indice(self._conexao()) != busca.VERSAO_INDICE:
+            # Banco anterior ao índice, ou tokenização alterada
+            self.reindexar()
+
+    def _conexao(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=30)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def salvar(self, nome, dados, eventos):
+        """Grava uma nova versão do laudo ``nome`` (criando-o se preciso); devolve o id.
+
+        Só os blobs que ainda não existem são inseridos; se nada mudou desde a
+        versão atual, nada é gravado.
+        """
+        agora = datetime.now().isoformat(timespec='seconds')
+        data_laudo = normalizar_dados(dados).get('data_laudo')
+        campos, lista_eventos, blobs = partes_laudo(dados, eventos)
+        manifesto_campos, manifesto_eventos = para_json(campos), para_json(lista_eventos)
+
+        con = self._conexao()
+        # Sem mudanças, o laudo nem é tocado: ``atualizado_em`` continua o mesmo
+        atual = con.execute(
+            """SELECT l.id, v.campos, v.eventos FROM laudos l JOIN versoes v
+               ON v.laudo_id = l.id AND v.numero = l.versao_atual WHERE l.nome = ?""",
+            (nome,),
+        ).fetchone()
+        if atual is not None and (atual['campos'], atual['eventos']) == (manifesto_campos, manifesto_eventos):
+            return atual['id']
+
+        with con:
+            laudo_id = con.execute(
+                """INSERT INTO laudos (nome, contratante, cnpj, data_laudo, criado_em,
+                                       atualizado_em, total_eventos)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (nome) DO UPDATE SET
+                       contratante = excluded.contratante, cnpj = excluded.cnpj,
+                       data_laudo = excluded.data_laudo, atualizado_em = excluded.atualizado_em,
+                       total_eventos = excluded.total_eventos
+                   RETURNING id""",
+                (nome, dados.get('contratante', ''), dados.get('cnpj', ''),
+                 data_laudo.isoformat() if data_laudo else None, agora, agora, len(eventos)),
+            ).fetchone()[0]
+
+            atual = con.execute(
+                """SELECT v.numero, v.campos, v.eventos FROM versoes v JOIN laudos l
+                   ON l.id = v.laudo_id AND v.numero = l.versao_atual WHERE l.id = ?""",
+                (laudo_id,),
+            ).fetchone()
+            if atual is not None and (atual['campos'], atual['eventos']) == (manifesto_campos, manifesto_eventos):
+                return laudo_id
+
+            # Partes já presentes na versão atual não precisam nem ser consultadas
+            if atual is not None:
+                existentes = set(json.loads(atual['campos']).values())
+                existentes.update(h for _, h in json.loads(atual['eventos']))
+                blobs = {h: texto for h, texto in blobs.items() if h not in existentes}
+            con.executemany("INSERT OR IGNORE INTO blobs (hash, conteudo) VALUES (?, ?)", blobs.items())
+            con.executemany("INSERT OR IGNORE INTO imagens_blobs (imagem, blob) VALUES (?, ?)",
+                            imagens_blobs(blobs))
+            # Partes gravadas antes pelo salvamento automático passam a ser da versão
+            con.executemany("DELETE FROM blobs_autosave WHERE hash = ?", [(h,) for h in blobs])
+
+            numero = (atual['numero'] if atual is not None else 0) + 1
+            con.execute(
+                "INSERT INTO versoes (laudo_id, numero, criado_em, campos, eventos) VALUES (?, ?, ?, ?, ?)",
+                (laudo_id, numero, agora, manifesto_campos, manifesto_eventos),
+            )
+            con.execute("UPDATE laudos SET versao_atual = ?, revisao = ? WHERE id = ?",
+                        (numero, self._nova_revisao(con), laudo_id))
+            busca.indexar(con, laudo_id, busca.documentos(dados, eventos, [k for k, _ in lista_eventos]))
+        return laudo_id
+
+    def _nova_revisao(self, con):
+        return con.execute("UPDATE banco_info SET revisao = revisao + 1 RETURNING revisao").fetchone()[0]
+
+    @property
+    def identidade(self):
+        """Identificador aleatório do banco, criado junto com ele"""
+        return self._conexao().execute("SELECT identidade FROM banco_info").fetchone()[0]
+
+    def revisao(self):
+        """Contador de revisões: muda a cada laudo salvo com alterações ou removido"""
+        return self._conexao().execute("SELECT revisao FROM banco_info").fetchone()[0]
+
+    def buscar(self, consulta, limite=20):
+        """Laudos e eventos mais relevantes para ``consulta`` (ver ``busca.buscar``)"""
+        return busca.buscar(self._conexao(), consulta, limite)
+
+    def reindexar(self):
+        """Reconstrói o índice da busca a partir das versões atuais; devolve quantos laudos"""
+        con = self._conexao()
+        ids = [i for (i,) in con.execute("SELECT id FROM laudos WHERE versao_atual > 0")]
+        with con:
+            busca.limpar(con)
+            for laudo_id in ids:
+                lista_eventos = self._manifesto(laudo_id)[1]
+                dados, eventos = self.carregar(laudo_id)
+                busca.indexar(con, laudo_id, busca.documentos(dados, eventos, [k for k, _ in lista_eventos]))
+            busca.marcar_versao(con)
+        return len(ids)
+
+    def listar(self, pagina=0, por_pagina=20, contratante=None):
+        """Resumo dos laudos, do mais recente para o mais antigo, sem desserializar conteúdo"""
+        sql = f"SELECT {COLUNAS_RESUMO} FROM laudos"
+        parametros = []
+        if contratante:
+            sql += " WHERE contratante LIKE ?"
+            parametros.append(f"%{contratante}%")
+        sql += " ORDER BY criado_em DESC, id DESC LIMIT ? OFFSET ?"
+        parametros += [por_pagina, pagina * por_pagina]
+        return [dict(linha) for linha in self._conexao().execute(sql, parametros)]
+
+    def obter_id(self, nome):
+        """Id do laudo ``nome``, ou ``None`` se não existir"""
+        linha = self._conexao().execute("SELECT id FROM laudos WHERE nome = ?", (nome,)).fetchone()
+        return linha[0] if linha else None
+
+    def contar(self, contratante=None):
+        if contratante:
+            linha = self._conexao().execute(
+                "SELECT COUNT(*) FROM laudos WHERE contratante LIKE ?", (f"%{contratante}%",)
+            ).fetchone()
+        else:
+            linha = self._conexao().execute("SELECT COUNT(*) FROM laudos").fetchone()
+        return linha[0]
+
+    def _manifesto(self, laudo_id, versao=None):
+        if versao is None:
+            linha = self._conexao().execute(
+                """SELECT v.campos, v.eventos FROM versoes v JOIN laudos l
+                   ON l.id = v.laudo_id AND v.numero = l.versao_atual WHERE l.id = ?""",
+                (laudo_id,),
+            ).fetchone()
+        else:
+            linha = self._conexao().execute(
+                "SELECT campos, eventos FROM versoes WHERE laudo_id = ? AND numero = ?",
+                (laudo_id, versao),
+            ).fetchone()
+        if linha is None:
+            raise KeyError((laudo_id, versao))
+        return json.loads(linha['campos']), json.loads(linha['eventos'])
+
+    def _blobs(self, hashes):
+        hashes = list(set(hashes))
+        blobs = {}
+        # Limite de parâmetros por consulta do SQLite
+        for inicio in range(0, len(hashes), 500):
+            lote = hashes[inicio:inicio + 500]
+            marcadores = ','.join('?' * len(lote))
+            for linha in self._conexao().execute(
+                    f"SELECT hash, conteudo FROM blobs WHERE hash IN ({marcadores})", lote):
+                blobs[linha['hash']] = linha['conteudo']
+        return blobs
+
+    def carregar(self, laudo_id, versao=None):
+        """Devolve ``(dados, eventos)`` de um único laudo, na versão atual ou em ``versao``"""
+        campos, lista_eventos = self._manifesto(laudo_id, versao)
+        blobs = self._blobs(list(campos.values()) + [h for _, h in lista_eventos])
+        dados = {campo: json.loads(blobs[h]) for campo, h in campos.items()}
+        eventos = [json.loads(blobs[h]) for _, h in lista_eventos]
+        return normalizar_dados(dados), eventos
+
+    def revisoes_atuais(self):
+        """``{laudo_id: revisão da versão atual}`` de todos os laudos (ver ``revisao``)"""
+        return dict(self._conexao().execute("SELECT id, revisao FROM laudos WHERE versao_atual > 0"))
+
+    def hashes_eventos(self, laudo_id):
+        """Hashes dos eventos da versão atual, na ordem (``KeyError`` se o laudo não existe)"""
+        return [h for _, h in self._manifesto(laudo_id)[1]]
+
+    def manifestos_atuais(self, ids):
+        """``{laudo_id: (campo -> hash, [hashes dos eventos])}`` da versão atual dos laudos ``ids``"""
+        ids = list(ids)
+        manifestos = {}
+        for inicio in range(0, len(ids), 500):
+            lote = ids[inicio:inicio + 500]
+            marcadores = ','.join('?' * len(lote))
+            for linha in self._conexao().execute(
+                    f"""SELECT l.id, v.campos, v.eventos FROM versoes v JOIN laudos l
+                        ON l.id = v.laudo_id AND v.numero = l.versao_atual WHERE l.id IN ({marcadores})""",
+                    lote):
+                manifestos[linha['id']] = (json.loads(linha['campos']),
+                                           [h for _, h in json.loads(linha['eventos'])])
+        return manifestos
+
+    def partes_por_hash(self, hashes):
+        """``{hash: valor}`` dos blobs (eventos ou campos de ``dados``)"""
+        return {h: json.loads(texto) for h, texto in self._blobs(hashes).items()}
+
+    def versoes(self, laudo_id):
+        """Números e datas das versões de um laudo, da mais recente para a mais antiga"""
+        return [dict(linha) for linha in self._conexao().execute(
+            "SELECT numero, criado_em FROM versoes WHERE laudo_id = ? ORDER BY numero DESC",
+            (laudo_id,),
+        )]
+
+    def diff(self, laudo_id, versao_a, versao_b):
+        """Diferenças entre duas versões, comparando apenas os manifestos.
+
+        Devolve ``{'campos': [...], 'eventos_adicionados': [...],
+        'eventos_removidos': [...], 'eventos_alterados': [...]}``, com os nomes
+        dos campos e as chaves dos eventos.
+        """
+        campos_a, eventos_a = self._manifesto(laudo_id, versao_a)
+        campos_b, eventos_b = self._manifesto(laudo_id, versao_b)
+        eventos_a, eventos_b = dict(map(tuple, eventos_a)), dict(map(tuple, eventos_b))
+        return {
+            'campos': sorted(c for c in campos_a.keys() | campos_b.keys()
+                             if campos_a.get(c) != campos_b.get(c)),
+            'eventos_adicionados': [k for k in eventos_b if k not in eventos_a],
+            'eventos_removidos': [k for k in eventos_a if k not in eventos_b],
+            'eventos_alterados': [k for k in eventos_b if k in eventos_a and eventos_a[k] != eventos_b[k]],
+        }
+
+    def gravar_autosave(self, sessao, laudo_nome, campos, eventos, removidos, blobs):
+        """Grava apenas as partes alteradas do salvamento automático de ``sessao``.
+
+        ``campos`` é ``{campo: hash}``, ``eventos`` é ``{chave: (posicao, hash)}``,
+        ``removidos`` é uma lista de ``(tipo, chave)`` e ``blobs`` é ``{hash: json}``.
+        As partes substituídas que só o salvamento automático usava são apagadas.
+        """
+        agora = datetime.now().isoformat(timespec='seconds')
+        with self._conexao() as con:
+            con.executemany(
+                "INSERT OR IGNORE INTO blobs_autosave (hash) SELECT ? WHERE NOT EXISTS "
+                "(SELECT 1 FROM blobs WHERE hash = ?)",
+                [(h, h) for h in blobs],
+            )
+            con.executemany("INSERT OR IGNORE INTO blobs (hash, conteudo) VALUES (?, ?)", blobs.items())
+            con.executemany("INSERT OR IGNORE INTO imagens_blobs (imagem, blob) VALUES (?, ?)",
+                            imagens_blobs(blobs))
+            chaves = ([('campo', campo) for campo in campos] + [('evento', chave) for chave in eventos]
+                      + list(removidos))
+            substituidos = [linha[0] for tipo, chave in chaves for linha in con.execute(
+                "SELECT hash FROM autosave WHERE sessao = ? AND tipo = ? AND chave = ?",
+                (sessao, tipo, str(chave)),
+            )]
+            con.executemany(
+                "INSERT OR REPLACE INTO autosave (sessao, tipo, chave, posicao, hash) VALUES (?, ?, ?, ?, ?)",
+                [(sessao, 'campo', campo, 0, h) for campo, h in campos.items()]
+                + [(sessao, 'evento', str(chave), posicao, h) for chave, (posicao, h) in eventos.items()],
+            )
+            con.executemany(
+                "DELETE FROM autosave WHERE sessao = ? AND tipo = ? AND chave = ?",
+                [(sessao, tipo, str(chave)) for tipo, chave in removidos],
+            )
+            con.execute(
+                "INSERT OR REPLACE INTO autosave_sessoes (sessao, laudo_nome, atualizado_em) VALUES (?, ?, ?)",
+                (sessao, laudo_nome, agora),
+            )
+            self._coletar_autosave(con, substituidos)
+
+    def carregar_autosave(self, sessao):
+        """Devolve ``(laudo_nome, atualizado_em, dados, eventos)`` ou ``None``"""
+        con = self._conexao()
+        sessao_linha = con.execute(
+            "SELECT laudo_nome, atualizado_em FROM autosave_sessoes WHERE sessao = ?", (sessao,)
+        ).fetchone()
+        if sessao_linha is None:
+            return None
+        linhas = con.execute(
+            "SELECT tipo, chave, hash FROM autosave WHERE sessao = ? ORDER BY tipo, posicao", (sessao,)
+        ).fetchall()
+        blobs = self._blobs([linha['hash'] for linha in linhas])
+        dados = {l['chave']: json.loads(blobs[l['hash']]) for l in linhas if l['tipo'] == 'campo'}
+        eventos = [json.loads(blobs[l['hash']]) for l in linhas if l['tipo'] == 'evento']
+        return sessao_linha['laudo_nome'], sessao_linha['atualizado_em'], normalizar_dados(dados), eventos
+
+    def descartar_autosave(self, sessao):
+        with self._conexao() as con:
+            hashes = [h for (h,) in con.execute("DELETE FROM autosave WHERE sessao = ? RETURNING hash",
+                                                (sessao,)).fetchall()]
+            con.execute("DELETE FROM autosave_sessoes WHERE sessao = ?", (sessao,))
+            self._coletar_autosave(con, hashes)
+
+    def _coletar_autosave(self, con, hashes):
+        """Apaga, dentre ``hashes``, os blobs que só o salvamento automático usava e
+        que nenhuma sessão referencia mais (chamado dentro da transação)"""
+        orfaos = [(h,) for h in set(hashes) if con.execute(
+            "SELECT 1 FROM blobs_autosave WHERE hash = ? AND NOT EXISTS "
+            "(SELECT 1 FROM autosave WHERE hash = ?)", (h, h),
+        ).fetchone()]
+        con.executemany("DELETE FROM blobs WHERE hash = ?", orfaos)
+        con.executemany("DELETE FROM imagens_blobs WHERE blob = ?", orfaos)
+        con.executemany("DELETE FROM blobs_autosave WHERE hash = ?", orfaos)
+
+    def expirar_autosaves(self, dias=DIAS_AUTOSAVE):
+        """Descarta os salvamentos automáticos sem alterações há mais de ``dias`` dias"""
+        limite = (datetime.now() - timedelta(days=dias)).isoformat(timespec='seconds')
+        sessoes = [s for (s,) in self._conexao().execute(
+            "SELECT sessao FROM autosave_sessoes WHERE atualizado_em < ?", (limite,)
+        )]
+        for sessao in sessoes:
+            self.descartar_autosave(sessao)
+        return len(sessoes)
+
+    def remover(self, laudo_id):
+        with self._conexao() as con:
+            con.execute("DELETE FROM versoes WHERE laudo_id = ?", (laudo_id,))
+            con.execute("DELETE FROM laudos WHERE id = ?", (laudo_id,))
+            busca.remover(con, laudo_id)
+            self._nova_revisao(con)
+        # As fotos do laudo deixam de ficar presas no depósito
+        self.limpar_blobs_orfaos()
+
+    def limpar_blobs_orfaos(self):
+        """Remove blobs que nenhuma versão ou salvamento automático referencia; devolve quantos"""
+        con = self._conexao()
+        with con:
+            # Trava de escrita desde a leitura das referências: um salvamento
+            # concorrente não pode passar a usar um blob prestes a ser apagado
+            con.execute("BEGIN IMMEDIATE")
+            usados = set()
+            for linha in con.execute("SELECT campos, eventos FROM versoes"):
+                usados.update(json.loads(linha['campos']).values())
+                usados.update(h for _, h in json.loads(linha['eventos']))
+            usados.update(h for (h,) in con.execute("SELECT hash FROM autosave"))
+            orfaos = [(h,) for (h,) in con.execute("SELECT hash FROM blobs") if h not in usados]
+            con.executemany("DELETE FROM blobs WHERE hash = ?", orfaos)
+            con.executemany("DELETE FROM imagens_blobs WHERE blob = ?", orfaos)
+            con.executemany("DELETE FROM blobs_autosave WHERE hash = ?", orfaos)
+        return len(orfaos)
+
+    def manutencao(self):
+        """Expira salvamentos automáticos abandonados e remove os blobs órfãos"""
+        self.expirar_autosaves()
+        self.limpar_blobs_orfaos()
+
+    def imagens_referenciadas(self):
+        """Hashes das fotos do depósito usadas por alguma versão ou salvamento automático.
+
+        Conta os blobs ainda gravados: os substituídos no salvamento automático
+        são apagados na hora, os de laudos removidos em ``remover`` e as sobras
+        (salvamentos abandonados, bancos antigos) na ``manutencao`` periódica.
+        """
+        return {h for (h,) in self._conexao().execute("SELECT DISTINCT imagem FROM imagens_blobs")}
+
+
+_banco = None
+
+
+def banco_padrao():
+    """Banco compartilhado do processo, em ``DIRETORIO_DADOS/laudos.db``"""
+    global _banco
+    if _banco is None:
+        os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+        _banco = BancoLaudos(os.path.join(DIRETORIO_DADOS, 'laudos.db'))
+        iniciar_manutencao(_banco)
+    return _banco
+
+
+def iniciar_manutencao(banco, intervalo=INTERVALO_MANUTENCAO):
+    """Executa ``banco.manutencao()`` a cada ``intervalo`` segundos, numa thread"""
+    def manter():
+        while True:
+            time.sleep(intervalo)
+            try:
+                banco.manutencao()
+            except sqlite3.Error:
+                pass  # banco ocupado por muito tempo: tenta de novo no próximo intervalo
+
+    threading.Thread(target=manter, daemon=True, name='banco-manutencao').start()
@@ -0,0 +1,230 @@
+"""Benchmark da geração de laudos.
+
+Mede tempo de parede, pico de memória (tracemalloc) e tamanho do .docx para
+laudos sintéticos com 1 a 5000 eventos, com e sem fotos e com breve relato
+longo, além da tabela de resumo isolada. Os resultados são gravados em JSON
+para comparação entre versões.
+
+Uso:
+    python benchmark.py -o resultados.json
+    python benchmark.py --eventos 1 10 100 --repeticoes 5
+    python benchmark.py -o novo.json --comparar resultados.json
+"""
+from datetime import date
+import argparse
+import copy
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import gerador
+import imagens
+from gerador import OPCOES
+
+TAMANHOS_PADRAO = [1, 10, 100, 1000, 5000]
+
+# Variação aceita (fração) antes de apontar uma regressão na comparação
+TOLERANCIA_REGRESSAO = 0.20
+
+
+def dados_sinteticos(linhas_relato=5):
+    """``dados_laudo`` completo, com ``linhas_relato`` linhas de breve relato"""
+    return {
+        'contratante': 'Ser Educacional S.A - Centro Universitário',
+        'cnpj': '12.345.678/0001-90',
+        'data_laudo': date(2025, 7, 11),
+        'contratada': OPCOES['contratada'][0],
+        'dias_vistoria': '08 a 11/07/2025',
+        'art_numero': 'PE20250123456',
+        'cidade_estado': 'Natal-RN',
+        'ocupado': 'Sim',
+        'endereco': 'Av. Senador Salgado Filho, 1610 - Lagoa Nova, Natal-RN, 59056-000',
+        'tipo_empreendimento': OPCOES['tipo_empreendimento'][0],
+        'info_localizacao': 'encontra-se em área urbanizada, perto de comércio',
+        'docs_disponibilizadas': gerador.DOCUMENTACOES[::3],
+        'obs_docs': 'Das documentações solicitadas apenas os projetos arquitetônicos foram entregues.',
+        'breve_relato': '\n'.join(
+            f"Relato {i}: os usuários informam infiltrações recorrentes no bloco {i % 7} "
+            f"após chuvas intensas, com manchas e desplacamento de revestimento." for i in range(linhas_relato)
+        ),
+        'anamnese': 'Os usuários da edificação pontuam deterioração natural dos materiais.',
+        'texto_laudo': '',
+    }
+
+
+def fotos_sinteticas(quantidade=6, largura=3000, altura=2000, semente=0):
+    """Fotos JPEG distintas do tamanho de fotos de celular"""
+    from PIL import Image
+
+    aleatorio = random.Random(semente)
+    fotos = []
+    for _ in range(quantidade):
+        img = Image.effect_noise((largura // 8, altura // 8), 64).convert('RGB')
+        img = img.resize((largura, altura))
+        cor = Image.new('RGB', img.size, tuple(aleatorio.randrange(256) for _ in range(3)))
+        img = Image.blend(img, cor, 0.5)
+        saida = io.BytesIO()
+        img.save(saida, 'JPEG', quality=92)
+        fotos.append(saida.getvalue())
+    return fotos
+
+
+def eventos_sinteticos(quantidade, fotos=None, semente=0):
+    """Eventos com opções sorteadas de ``OPCOES``; até 3 fotos de ``fotos`` por evento"""
+    aleatorio = random.Random(semente)
+    eventos = []
+    for i in range(quantidade):
+        eventos.append({
+            'id': f"ev{i}",
+            'numero': i + 1,
+            'nome': f"{aleatorio.choice(OPCOES['anomalias'])} no pavimento {i % 12}",
+            'localizacao': aleatorio.choice(['Generalidades', f"Bloco {i % 9}, sala {i % 40}"]),
+            'anomalias': aleatorio.sample(OPCOES['anomalias'], aleatorio.randint(1, 3)),
+            'causa': aleatorio.choice(OPCOES['causas']),
+            'consequencias': aleatorio.sample(OPCOES['consequencias'], aleatorio.randint(1, 2)),
+            'prioridade': aleatorio.choice(["Prioridade 1", "Prioridade 2", "Prioridade 3"]),
+            'uso': aleatorio.choice(["Regular", "Irregular"]),
+            'recomendacoes': aleatorio.sample(OPCOES['recomendacoes'], aleatorio.randint(1, 2)),
+            'imagens': aleatorio.sample(fotos, min(3, len(fotos))) if fotos else [],
+        })
+    return eventos
+
+
+def _limpar_caches():
+    imagens.limpar_cache()
+    gerador.limpar_cache_secoes()
+
+
+def _medir(funcao, repeticoes):
+    """Mediana do tempo (caches limpos a cada repetição) e pico de memória de uma execução"""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        _limpar_caches()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    # Memória medida numa execução à parte: o tracemalloc distorce o tempo
+    _limpar_caches()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos), pico, resultado
+
+
+def cenarios(tamanhos, com_fotos=True):
+    """Lista de ``(nome, parâmetros, função)`` a medir"""
+    fotos = fotos_sinteticas() if com_fotos else None
+    dados = dados_sinteticos()
+    dados_relato_longo = dados_sinteticos(linhas_relato=500)
+
+    lista = []
+    for n in tamanhos:
+        eventos = eventos_sinteticos(n)
+        lista.append(('laudo', {'eventos': n, 'fotos': False, 'relato_longo': False},
+                      lambda e=eventos: gerador.gerar_bytes(dados, e)))
+        lista.append(('laudo', {'eventos': n, 'fotos': False, 'relato_longo': True},
+                      lambda e=eventos: gerador.gerar_bytes(dados_relato_longo, e)))
+        if fotos:
+            eventos_fotos = eventos_sinteticos(n, fotos)
+            lista.append(('laudo', {'eventos': n, 'fotos': True, 'relato_longo': False},
+                          lambda e=eventos_fotos: gerador.gerar_bytes(dados, e)))
+        lista.append(('tabela_resumo', {'eventos': n}, lambda e=eventos: _tabela_resumo(e)))
+    return lista
+
+
+def _tabela_resumo(eventos):
+    """Só a tabela de resumo, sobre uma cópia do documento base"""
+    modelo = gerador._modelo_base()[0]
+    doc = copy.deepcopy(modelo).part.document
+    gerador._secao_resumo(doc, eventos)
+    saida = io.BytesIO()
+    doc.save(saida)
+    return saida.getvalue()
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(tamanhos, repeticoes=3, com_fotos=True):
+    """Executa todos os cenários e devolve o relatório (dicionário serializável)"""
+    # Carrega o modelo base antes: o primeiro cenário não deve pagar por isso
+    gerador._modelo_base()
+    resultados = []
+    for nome, parametros, funcao in cenarios(tamanhos, com_fotos):
+        segundos, pico, conteudo = _medir(funcao, repeticoes)
+        resultado = dict(cenario=nome, **parametros, segundos=round(segundos, 4),
+                         pico_memoria_bytes=pico, tamanho_bytes=len(conteudo))
+        resultados.append(resultado)
+        descricao = ' '.join(f"{k}={v}" for k, v in parametros.items())
+        print(f"{nome:14} {descricao:45} {segundos * 1000:10.1f} ms "
+              f"{pico / 1e6:8.1f} MB pico {len(conteudo) / 1e3:10.1f} kB")
+    return {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _commit_atual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticoes': repeticoes,
+        'resultados': resultados,
+    }
+
+
+def _chave_resultado(resultado):
+    return tuple(sorted((k, v) for k, v in resultado.items()
+                        if k not in ('segundos', 'pico_memoria_bytes', 'tamanho_bytes')))
+
+
+def comparar(anterior, atual, tolerancia=TOLERANCIA_REGRESSAO):
+    """Lista de regressões (tempo ou memória acima da tolerância) entre dois relatórios"""
+    base = {_chave_resultado(r): r for r in anterior['resultados']}
+    regressoes = []
+    for resultado in atual['resultados']:
+        antes = base.get(_chave_resultado(resultado))
+        if antes is None:
+            continue
+        for metrica in ('segundos', 'pico_memoria_bytes'):
+            if antes[metrica] and resultado[metrica] > antes[metrica] * (1 + tolerancia):
+                regressoes.append((resultado, metrica, antes[metrica], resultado[metrica]))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da geração de laudos")
+    parser.add_argument('--eventos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="Quantidades de eventos (padrão: 1 10 100 1000 5000)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-fotos', action='store_true', help="Não medir cenários com fotos")
+    parser.add_argument('-o', '--saida', help="Arquivo JSON para gravar os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para detectar regressões")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.eventos, args.repeticoes, not args.sem_fotos)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regressoes = comparar(json.load(f), relatorio)
+        for resultado, metrica, antes, depois in regressoes:
+            print(f"⚠️ Regressão em {resultado['cenario']} ({resultado['eventos']} eventos): "
+                  f"{metrica} {antes} -> {depois}")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""Busca textual nos laudos salvos.
+
+Índice invertido em tabelas do próprio banco dos laudos, com um documento
+para os campos de texto de cada laudo e um para cada evento. Os eventos
+levam também o contratante e o endereço do laudo, então "marquise
+desplacamento natal" encontra o evento certo.
+
+Tokenização: minúsculas, sem acentos, sem palavras vazias e com singular e
+plural reduzidos ao mesmo termo ("Infiltrações" e "infiltracao", "marquise"
+e "marquises").
+
+Cada ocorrência guarda o peso BM25 do termo no documento já calculado
+(``impacto``, de 1 a 255, com mais peso para o título), e as ocorrências de
+cada termo ficam ordenadas por esse peso. A consulta percorre os termos do
+maior peso para o menor e para assim que nenhum documento ainda não visto
+pode entrar entre os primeiros: o custo depende mais do número de resultados
+pedidos que do tamanho do acervo.
+
+``BancoLaudos.salvar`` atualiza o índice na mesma transação e reindexa só os
+documentos cujo conteúdo mudou.
+
+Uso:
+    python busca.py "marquise desplacamento natal"
+    python busca.py --reindexar
+"""
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+import hashlib
+import heapq
+import math
+import re
+import sys
+import unicodedata
+
+# Mudanças na tokenização ou nos pesos devem incrementar a versão para reconstruir o índice
+VERSAO_INDICE = 1
+
+ESQUEMA_BUSCA = """
+CREATE TABLE IF NOT EXISTS busca_docs (
+    id INTEGER PRIMARY KEY,
+    laudo_id INTEGER NOT NULL,
+    chave TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    termos BLOB NOT NULL,
+    rotulo TEXT NOT NULL,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_busca_docs_laudo ON busca_docs (laudo_id);
+
+CREATE TABLE IF NOT EXISTS busca_termos (
+    id INTEGER PRIMARY KEY,
+    termo TEXT NOT NULL UNIQUE,
+    docs INTEGER NOT NULL DEFAULT 0,
+    maximo INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS busca_ocorrencias (
+    termo_id INTEGER NOT NULL,
+    impacto INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    PRIMARY KEY (termo_id, impacto, doc_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS busca_meta (
+    chave TEXT PRIMARY KEY,
+    valor NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Pesos de título, texto e contexto na frequência dos termos
+PESOS = (4.0, 1.0, 0.5)
+
+# Parâmetros do BM25; o tamanho médio é fixo para o peso de um documento não
+# depender dos outros (e o índice poder ser atualizado documento a documento)
+K1 = 1.2
+B = 0.75
+TAMANHO_MEDIO = 60.0
+
+# Ocorrências lidas por vez de cada grupo de termos da consulta
+LOTE = 256
+
+# Termos considerados no prefixo da última palavra da consulta
+MAXIMO_EXPANSOES = 64
+
+# Campos de ``dados_laudo`` indexados no documento do laudo e no contexto dos eventos
+CAMPOS_TEXTO = ('cnpj', 'contratada', 'dias_vistoria', 'tipo_empreendimento', 'info_localizacao',
+                'breve_relato', 'anamnese', 'obs_docs', 'texto_laudo')
+CAMPOS_CONTEXTO = ('contratante', 'endereco', 'cidade_estado')
+CAMPOS_EVENTO = ('localizacao', 'anomalias', 'causa', 'consequencias', 'prioridade', 'uso',
+                 'recomendacoes', 'descricao')
+
+_PALAVRAS_VAZIAS = frozenset("""
+    a o as os um uma uns umas de da do das dos e ou em na no nas nos ao aos
+    com por pela pelo pelas pelos para pra que se sem sob sobre entre ate
+    como mais menos muito ja nao sim foi sao ser esta este estes estas isso
+    isto sua seu suas seus lhe lhes ha tem""".split())
+
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+# Plurais (já sem acentos) e o que fica no lugar. O "e" final também cai, para
+# singular e plural terem o mesmo termo ("marquise"/"marquises", "pilar"/"pilares")
+_TERMINACOES = (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+                ('ns', 'm'), ('es', ''), ('s', ''), ('e', ''))
+
+# Letras acentuadas do latim -> a mesma letra sem acento (uma por uma, para as posições
+# do texto normalizado valerem no original); o resto passa pela decomposição do unicodedata
+_SEM_ACENTOS = {}
+for _codigo in range(0xC0, 0x180):
+    _base = ''.join(c for c in unicodedata.normalize('NFKD', chr(_codigo)) if not unicodedata.combining(c))
+    if _base != chr(_codigo) and len(_base) == 1:
+        _SEM_ACENTOS[_codigo] = _base
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos"""
+    texto = texto.lower().translate(_SEM_ACENTOS)
+    if texto.isascii():
+        return texto
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=1 << 16)
+def radical(palavra):
+    """Forma reduzida de uma palavra normalizada, comum ao singular e ao plural"""
+    if len(palavra) > 3:
+        for terminacao, troca in _TERMINACOES:
+            if palavra.endswith(terminacao):
+                return palavra[:-len(terminacao)] + troca
+    return palavra
+
+
+def termos(texto):
+    """Termos indexados de um texto, na ordem"""
+    return [radical(p) for p in _PALAVRA.findall(normalizar(texto)) if p not in _PALAVRAS_VAZIAS]
+
+
+def _texto(valor):
+    if isinstance(valor, (list, tuple)):
+        return ', '.join(str(v) for v in valor)
+    return '' if valor is None else str(valor)
+
+
+def documentos(dados, eventos, chaves):
+    """``{chave: (rotulo, titulo, texto, contexto)}`` do laudo e de cada evento.
+
+    O documento dos campos do laudo tem a chave ``''``; os eventos usam as
+    chaves do manifesto da versão.
+    """
+    contexto = '\n'.join(_texto(dados.get(campo)) for campo in CAMPOS_CONTEXTO)
+    docs = {'': (dados.get('contratante') or '', dados.get('contratante') or '',
+                 '\n'.join(_texto(dados.get(campo)) for campo in CAMPOS_TEXTO),
+                 '\n'.join(_texto(dados.get(campo)) for campo in CAMPOS_CONTEXTO[1:]))}
+    for chave, evento in zip(chaves, eventos):
+        rotulo = f"EVENTO {evento.get('numero', 0):02d}: {evento.get('nome', '')}"
+        docs[str(chave)] = (rotulo, evento.get('nome') or '',
+                            '\n'.join(_texto(evento.get(campo)) for campo in CAMPOS_EVENTO), contexto)
+    return docs
+
+
+def impactos(titulo, texto, contexto):
+    """``{termo: impacto}`` de um documento: o peso BM25 de cada termo, de 1 a 255"""
+    frequencias = Counter()
+    tamanho = 0.0
+    for peso, parte in zip(PESOS, (titulo, texto, contexto)):
+        lista = termos(parte)
+        tamanho += peso * len(lista)
+        for termo in lista:
+            frequencias[termo] += peso
+    norma = K1 * (1 - B + B * tamanho / TAMANHO_MEDIO)
+    # tf * (K1 + 1) / (tf + norma), dividido pelo máximo (K1 + 1)
+    return {termo: max(1, round(255 * tf / (tf + norma))) for termo, tf in frequencias.items()}
+
+
+def _hash(doc):
+    return hashlib.blake2b('\x00'.join(doc).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _ids_termos(con, lista):
+    """``{termo: id}``, criando os termos novos no vocabulário"""
+    con.executemany("INSERT OR IGNORE INTO busca_termos (termo) VALUES (?)", [(t,) for t in lista])
+    ids = {}
+    # Limite de parâmetros por consulta do SQLite
+    for inicio in range(0, len(lista), 500):
+        lote = lista[inicio:inicio + 500]
+        ids.update(con.execute(
+            f"SELECT termo, id FROM busca_termos WHERE termo IN ({','.join('?' * len(lote))})", lote))
+    return ids
+
+
+def _contar_documentos(con, variacao):
+    con.execute("INSERT INTO busca_meta (chave, valor) VALUES ('documentos', ?) "
+                "ON CONFLICT (chave) DO UPDATE SET valor = valor + excluded.valor", (variacao,))
+
+
+def indexar(con, laudo_id, docs):
+    """Atualiza o índice do laudo: troca só os documentos que mudaram"""
+    atuais = {chave: (doc_id, h) for doc_id, chave, h in con.execute(
+        "SELECT id, chave, hash FROM busca_docs WHERE laudo_id = ?", (laudo_id,))}
+    remover = [doc_id for chave, (doc_id, _) in atuais.items() if chave not in docs]
+    novos = []
+    for chave, doc in docs.items():
+        h = _hash(doc)
+        if chave in atuais:
+            doc_id, h_atual = atuais[chave]
+            if h == h_atual:
+                continue
+            remover.append(doc_id)
+        novos.append((chave, h, doc, impactos(*doc[1:])))
+    _remover_docs(con, remover)
+    if not novos:
+        return
+
+    ids = _ids_termos(con, list({termo for *_, pesos in novos for termo in pesos}))
+    ocorrencias = []
+    for chave, h, (rotulo, _, texto, _), pesos in novos:
+        pares = [(ids[termo], impacto) for termo, impacto in pesos.items()]
+        doc_id = con.execute(
+            "INSERT INTO busca_docs (laudo_id, chave, hash, termos, rotulo, texto) VALUES (?, ?, ?, ?, ?, ?)",
+            (laudo_id, chave, h, _codificar(pares), rotulo, texto),
+        ).lastrowid
+        ocorrencias += [(termo_id, impacto, doc_id) for termo_id, impacto in pares]
+    con.executemany("INSERT INTO busca_ocorrencias (termo_id, impacto, doc_id) VALUES (?, ?, ?)",
+                    ocorrencias)
+    docs, maximos = Counter(), {}
+    for termo_id, impacto, _ in ocorrencias:
+        docs[termo_id] += 1
+        maximos[termo_id] = max(impacto, maximos.get(termo_id, 0))
+    con.executemany("UPDATE busca_termos SET docs = docs + ?, maximo = max(maximo, ?) WHERE id = ?",
+                    [(n, maximos[termo_id], termo_id) for termo_id, n in docs.items()])
+    _contar_documentos(con, len(novos))
+
+
+def _codificar(pares):
+    """Coluna ``termos`` de ``busca_docs``: os ids e depois os impactos, em uint32 little-endian"""
+    numeros = array('I', [termo_id for termo_id, _ in pares] + [impacto for _, impacto in pares])
+    if sys.byteorder == 'big':
+        numeros.byteswap()
+    return numeros.tobytes()
+
+
+def _pares(termos_doc):
+    """``{termo_id: impacto}`` da coluna ``termos`` de ``busca_docs``"""
+    numeros = array('I')
+    numeros.frombytes(termos_doc)
+    if sys.byteorder == 'big':
+        numeros.byteswap()
+    metade = len(numeros) // 2
+    return dict(zip(numeros[:metade], numeros[metade:]))
+
+
+def _remover_docs(con, doc_ids):
+    ocorrencias = []
+    for doc_id in doc_ids:
+        (termos_doc,) = con.execute("SELECT termos FROM busca_docs WHERE id = ?", (doc_id,)).fetchone()
+        ocorrencias += [(termo_id, impacto, doc_id) for termo_id, impacto in _pares(termos_doc).items()]
+    con.executemany("DELETE FROM busca_ocorrencias WHERE termo_id = ? AND impacto = ? AND doc_id = ?",
+                    ocorrencias)
+    # O máximo de cada termo não diminui: continua um limite válido para a consulta
+    docs = Counter(termo_id for termo_id, _, _ in ocorrencias)
+    con.executemany("UPDATE busca_termos SET docs = docs - ? WHERE id = ?",
+                    [(n, termo_id) for termo_id, n in docs.items()])
+    con.executemany("DELETE FROM busca_docs WHERE id = ?", [(i,) for i in doc_ids])
+    if doc_ids:
+        _contar_documentos(con, -len(doc_ids))
+
+
+def remover(con, laudo_id):
+    """Tira o laudo do índice"""
+    _remover_docs(con, [i for (i,) in con.execute(
+        "SELECT id FROM busca_docs WHERE laudo_id = ?", (laudo_id,))])
+
+
+def versao_indice(con):
+    linha = con.execute("SELECT valor FROM busca_meta WHERE chave = 'versao'").fetchone()
+    return linha[0] if linha else None
+
+
+def marcar_versao(con):
+    con.execute("INSERT OR REPLACE INTO busca_meta (chave, valor) VALUES ('versao', ?)", (VERSAO_INDICE,))
+
+
+def limpar(con):
+    for tabela in ('busca_ocorrencias', 'busca_docs', 'busca_termos', 'busca_meta'):
+        con.execute(f"DELETE FROM {tabela}")
+
+
+def _grupos(con, consulta):
+    """Para cada termo da consulta, ``[(termo_id, docs, maximo)]`` dos termos do índice
+    que o satisfazem (vários na última palavra, tomada como prefixo enquanto se digita).
+    ``None`` se algum termo não existe no índice.
+    """
+    lista = list(dict.fromkeys(termos(consulta)))
+    grupos = []
+    for i, termo in enumerate(lista):
+        if i == len(lista) - 1 and consulta[-1:].isalnum():
+            linhas = con.execute(
+                """SELECT id, docs, maximo FROM busca_termos WHERE termo >= ? AND termo < ? AND docs > 0
+                   ORDER BY docs DESC LIMIT ?""",
+                (termo, termo + '{', MAXIMO_EXPANSOES),  # '{' vem logo depois de 'z'
+            ).fetchall()
+        else:
+            linhas = con.execute("SELECT id, docs, maximo FROM busca_termos WHERE termo = ? AND docs > 0",
+                                 (termo,)).fetchall()
+        if not linhas:
+            return None
+        grupos.append(linhas)
+    return grupos
+
+
+def _fluxo(con, termo_id, idf):
+    """``(idf * impacto, doc_id)`` das ocorrências do termo, da maior para a menor"""
+    for impacto, doc_id in con.execute(
+            "SELECT impacto, doc_id FROM busca_ocorrencias WHERE termo_id = ? ORDER BY impacto DESC",
+            (termo_id,)):
+        yield idf * impacto, doc_id
+
+
+def _melhores(con, grupos, limite):
+    """``[(pontuacao, doc_id)]`` dos documentos com todos os grupos, do mais relevante ao menos.
+
+    Algoritmo de limiar: lê as ocorrências de todos os grupos em paralelo, da
+    maior contribuição para a menor, e pontua pelos termos dele cada documento
+    novo que ainda pode entrar entre os ``limite`` melhores. Um documento ainda
+    não visto soma no máximo a última contribuição lida de cada grupo; quando
+    isso não supera o pior dos melhores, a resposta está pronta. Como todo resultado tem todos os grupos, acabar as
+    ocorrências de um grupo também encerra a busca.
+    """
+    linha = con.execute("SELECT valor FROM busca_meta WHERE chave = 'documentos'").fetchone()
+    total = max(linha[0] if linha else 0, 1)
+    idf = {termo_id: math.log(1 + (total - docs + 0.5) / (docs + 0.5))
+           for grupo in grupos for termo_id, docs, _ in grupo}
+    ids_grupos = [[termo_id for termo_id, _, _ in grupo] for grupo in grupos]
+    fluxos = [heapq.merge(*(_fluxo(con, termo_id, idf[termo_id]) for termo_id in ids), reverse=True)
+              for ids in ids_grupos]
+    limites = [max(idf[termo_id] * maximo for termo_id, _, maximo in grupo) for grupo in grupos]
+
+    melhores = []  # heap com os ``limite`` maiores
+    vistos = set()
+    while True:
+        # Documentos novos desta rodada -> {grupo: contribuição lida}
+        conhecidas = {}
+        esgotado = False
+        for i, fluxo in enumerate(fluxos):
+            lote = list(islice(fluxo, LOTE))
+            esgotado = esgotado or len(lote) < LOTE
+            if lote:
+                limites[i] = lote[-1][0]
+            for valor, doc_id in lote:
+                if doc_id not in vistos:
+                    conhecidas.setdefault(doc_id, {}).setdefault(i, valor)
+        vistos.update(conhecidas)
+        novos = list(conhecidas)
+        for inicio in range(0, len(novos), 500):
+            # Só vale ler os termos de quem ainda pode entrar entre os melhores
+            minimo = melhores[0][0] if len(melhores) == limite else -1.0
+            soma_limites = sum(limites)
+            lote = [doc_id for doc_id in novos[inicio:inicio + 500]
+                    if soma_limites + sum(v - limites[i] for i, v in conhecidas[doc_id].items()) > minimo]
+            if not lote:
+                continue
+            for doc_id, termos_doc in con.execute(
+                    f"SELECT id, termos FROM busca_docs WHERE id IN ({','.join('?' * len(lote))})", lote):
+                pares = _pares(termos_doc)
+                pontuacao = 0.0
+                for ids in ids_grupos:
+                    presentes = [idf[termo_id] * pares[termo_id] for termo_id in ids if termo_id in pares]
+                    if not presentes:
+                        break
+                    pontuacao += max(presentes)
+                else:
+                    if len(melhores) < limite:
+                        heapq.heappush(melhores, (pontuacao, doc_id))
+                    elif pontuacao > melhores[0][0]:
+                        heapq.heapreplace(melhores, (pontuacao, doc_id))
+        if esgotado or (len(melhores) == limite and melhores[0][0] >= sum(limites)):
+            break
+    return sorted(melhores, reverse=True)
+
+
+def trecho(texto, consulta, largura=80):
+    """Trecho do texto em volta do primeiro termo encontrado"""
+    procurados = set(termos(consulta))
+    for palavra in _PALAVRA.finditer(normalizar(texto)):
+        termo = radical(palavra.group())
+        if termo in procurados or any(termo.startswith(p) for p in procurados):
+            inicio = max(0, palavra.start() - largura // 2)
+            fim = min(len(texto), inicio + largura)
+            return ('…' if inicio else '') + ' '.join(texto[inicio:fim].split()) + ('…' if fim < len(texto) else '')
+    return ' '.join(texto[:largura].split())
+
+
+def buscar(con, consulta, limite=20):
+    """Documentos mais relevantes para a consulta (todos os termos), com o nome do laudo e um trecho"""
+    grupos = _grupos(con, consulta)
+    if not grupos:
+        return []
+    melhores = _melhores(con, grupos, limite)
+    if not melhores:
+        return []
+    linhas = {linha[0]: linha[1:] for linha in con.execute(
+        f"""SELECT d.id, d.laudo_id, l.nome, d.chave, d.rotulo, d.texto
+            FROM busca_docs d JOIN laudos l ON l.id = d.laudo_id
+            WHERE d.id IN ({','.join('?' * len(melhores))})""",
+        [doc_id for _, doc_id in melhores],
+    )}
+    resultados = []
+    for pontuacao, doc_id in melhores:
+        laudo_id, nome, chave, rotulo, texto = linhas[doc_id]
+        resultados.append({
+            'laudo_id': laudo_id,
+            'nome': nome,
+            'chave': chave,
+            'rotulo': rotulo,
+            'trecho': trecho(texto, consulta),
+            'pontuacao': pontuacao / 255,
+        })
+    return resultados
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Busca nos laudos salvos")
+    parser.add_argument('consulta', nargs='?', default='')
+    parser.add_argument('-n', '--limite', type=int, default=20, help="Número de resultados (padrão 20)")
+    parser.add_argument('--reindexar', action='store_true', help="Reconstruir o índice de todos os laudos")
+    args = parser.parse_args(argv)
+
+    from banco import banco_padrao
+
+    if args.reindexar:
+        inicio = time.perf_counter()
+        total = banco_padrao().reindexar()
+        print(f"{total} laudos indexados em {time.perf_counter() - inicio:.1f} s")
+    if args.consulta:
+        inicio = time.perf_counter()
+        resultados = banco_padrao().buscar(args.consulta, args.limite)
+        milissegundos = (time.perf_counter() - inicio) * 1000
+        for resultado in resultados:
+            print(f"{resultado['pontuacao']:6.2f}  {resultado['nome']}"
+                  + (f" · {resultado['rotulo']}" if resultado['chave'] else "") + f"\n        {resultado['trecho']}")
+        print(f"{len(resultados)} resultados em {milissegundos:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Cache em disco dos .docx gerados, compartilhado entre sessões.
+
+A chave é o hash do JSON canônico das entradas (``dados``, ``eventos`` com
+as imagens trocadas pelo hash do conteúdo, opções de geração e a versão do
+motor). Como ``gerador.gerar_bytes`` é reprodutível, o mesmo laudo pedido de
+novo, por qualquer pessoa, é servido direto do disco.
+"""
+import hashlib
+import os
+
+from armazem import ArmazemDisco
+from banco import para_json
+from config import DIRETORIO_DADOS
+from gerador import DPI_IMAGENS, gerar_bytes
+from imagens import conteudo_imagem
+
+# Mudanças no layout do documento devem incrementar a versão para invalidar o cache
+VERSAO_MOTOR = 1
+
+LIMITE_CACHE_DOCX_BYTES = 1024 * 1024 * 1024
+
+
+def _hash_imagem(imagem):
+    if isinstance(imagem, dict):
+        return imagem['hash']
+    return hashlib.sha256(conteudo_imagem(imagem)).hexdigest()
+
+
+def chave_laudo(dados, eventos, incluir_rodape=True, incluir_numeracao=True, versao=1,
+                dpi_imagens=DPI_IMAGENS):
+    """Hash canônico de tudo que determina os bytes do laudo"""
+    # O id do evento só identifica o evento no editor; não altera o documento
+    eventos_chave = [
+        {campo: valor for campo, valor in evento.items() if campo != 'id'}
+        | {'imagens': [_hash_imagem(img) for img in evento.get('imagens') or []]}
+        for evento in eventos
+    ]
+    entradas = {
+        'motor': VERSAO_MOTOR,
+        'dados': dados,
+        'eventos': eventos_chave,
+        'opcoes': [incluir_rodape, incluir_numeracao, versao, dpi_imagens],
+    }
+    return hashlib.sha256(para_json(entradas).encode('utf-8')).hexdigest()
+
+
+_cache = None
+
+
+def cache_padrao():
+    """Cache compartilhado do processo, em ``DIRETORIO_DADOS/docx``"""
+    global _cache
+    if _cache is None:
+        _cache = ArmazemDisco(os.path.join(DIRETORIO_DADOS, 'docx'), LIMITE_CACHE_DOCX_BYTES)
+    return _cache
+
+
+def gerar_bytes_cache(dados, eventos, incluir_rodape=True, incluir_numeracao=True, versao=1,
+                      dpi_imagens=DPI_IMAGENS, cache=None, progresso=None):
+    """Como ``gerar_bytes``, mas consultando o cache; devolve ``(conteudo, veio_do_cache)``"""
+    cache = cache or cache_padrao()
+    chave = chave_laudo(dados, eventos, incluir_rodape, incluir_numeracao, versao, dpi_imagens)
+    conteudo = cache.ler(chave)
+    if conteudo is not None:
+        return conteudo, True
+    conteudo = gerar_bytes(dados, eventos, incluir_rodape, incluir_numeracao, versao, dpi_imagens,
+                           progresso)
+    cache.gravar(chave, conteudo)
+    return conteudo, False
@@ -0,0 +1,8 @@
+"""Configurações compartilhadas entre o app e os módulos de apoio."""
+import os
+
+# Diretório dos dados persistentes (imagens, banco, caches)
+DIRETORIO_DADOS = os.environ.get(
+    'LAUDOS_DADOS',
+    os.path.join(os.path.expanduser('~'), '.gerador-laudos')
+)
@@ -0,0 +1,59 @@
+"""Depósito de imagens endereçado por conteúdo.
+
+As fotos enviadas são gravadas uma única vez em disco, com o SHA-256 do
+conteúdo como nome, e a sessão guarda apenas uma referência pequena
+(``{'hash', 'nome', 'tamanho'}``). Uploads repetidos não ocupam espaço de
+novo. O depósito tem um limite de tamanho e descarta primeiro as imagens
+usadas há mais tempo, exceto as referenciadas por laudos salvos (ou por
+salvamentos automáticos), que só guardam a referência.
+"""
+import hashlib
+import os
+
+from armazem import ArmazemDisco
+from config import DIRETORIO_DADOS
+
+LIMITE_DEPOSITO_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class DepositoImagens(ArmazemDisco):
+    """Armazena imagens em ``diretorio/<hash[:2]>/<hash>`` com limite LRU"""
+
+    def __init__(self, diretorio, limite_bytes=LIMITE_DEPOSITO_BYTES, fixados=None):
+        super().__init__(diretorio, limite_bytes, fixados)
+
+    def guardar(self, conteudo, nome=''):
+        """Grava o conteúdo (se ainda não existir) e devolve a referência"""
+        hash_hex = hashlib.sha256(conteudo).hexdigest()
+        self.gravar(hash_hex, conteudo)
+        return {'hash': hash_hex, 'nome': nome, 'tamanho': len(conteudo)}
+
+    def ler(self, referencia):
+        """Bytes da imagem referenciada; marca a imagem como usada"""
+        hash_hex = referencia['hash'] if isinstance(referencia, dict) else referencia
+        conteudo = super().ler(hash_hex)
+        if conteudo is None:
+            raise FileNotFoundError(
+                f"Imagem {hash_hex[:12]} não está mais no depósito (removida pelo limite de espaço)"
+            )
+        return conteudo
+
+    def existe(self, referencia):
+        return super().existe(referencia['hash'] if isinstance(referencia, dict) else referencia)
+
+
+_deposito = None
+
+
+def deposito_padrao():
+    """Depósito compartilhado do processo, em ``DIRETORIO_DADOS/imagens``, sem descartar as
+    fotos referenciadas em ``banco_padrao()``"""
+    global _deposito
+    if _deposito is None:
+        def fixados():
+            from banco import banco_padrao
+
+            return banco_padrao().imagens_referenciadas()
+
+        _deposito = DepositoImagens(os.path.join(DIRETORIO_DADOS, 'imagens'), fixados=fixados)
+    return _deposito
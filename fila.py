@@ -0,0 +1,353 @@
+"""Fila local de geração de laudos em processos separados.
+
+O app grava o trabalho (dados, eventos e opções em JSON) numa tabela SQLite
+e volta imediatamente. Processos trabalhadores (``python fila.py
+--trabalhar``), iniciados pelo próprio app quando necessário, retiram os
+trabalhos pendentes, geram o .docx e registram o andamento (etapa de
+``ETAPAS_GERACAO`` e evento atual) na mesma tabela.
+
+O arquivo pronto fica em ``DIRETORIO_DADOS/trabalhos``, associado à chave da
+sessão que está na URL, então continua disponível para download depois de um
+recarregamento ou reconexão do navegador. Trabalhos pendentes sobrevivem a
+uma reinicialização do app.
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from config import DIRETORIO_DADOS
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id TEXT PRIMARY KEY,
+    sessao TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    entrada TEXT,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    etapa TEXT,
+    atual INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    progresso REAL NOT NULL DEFAULT 0,
+    total_eventos INTEGER NOT NULL DEFAULT 0,
+    do_cache INTEGER,
+    tamanho INTEGER,
+    segundos REAL,
+    tempos TEXT,
+    erro TEXT,
+    dono TEXT,
+    metricas_registradas INTEGER NOT NULL DEFAULT 0,
+    criado_em TEXT NOT NULL,
+    concluido_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trabalhos_sessao ON trabalhos (sessao, criado_em);
+CREATE INDEX IF NOT EXISTS idx_trabalhos_estado ON trabalhos (estado, criado_em);
+"""
+
+# Estados de um trabalho
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO = 'pendente', 'executando', 'concluido', 'erro'
+
+# Processos trabalhadores iniciados pelo app (0: trabalhadores externos)
+PROCESSOS_FILA = int(os.environ.get('LAUDOS_PROCESSOS_FILA', 2))
+
+# Intervalo mínimo entre gravações de andamento dentro da mesma etapa
+INTERVALO_PROGRESSO = 0.25
+
+# Espera entre consultas de um trabalhador ocioso, e ociosidade até encerrar um
+# trabalhador iniciado pelo app (os iniciados à parte não encerram sozinhos)
+INTERVALO_ESPERA = 0.2
+TEMPO_OCIOSO = 300.0
+
+# Trabalhos (e arquivos) mais antigos que isso são apagados
+DIAS_RETENCAO = 7
+
+
+def _dono():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _agora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class FilaLaudos:
+    """Trabalhos de geração registrados em SQLite e executados por processos trabalhadores"""
+
+    def __init__(self, caminho, diretorio, processos=PROCESSOS_FILA):
+        self.caminho = caminho
+        self.diretorio = diretorio
+        self.processos = processos
+        self._local = threading.local()
+        self._trabalhadores = []
+        self._trabalhadores_lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        with self._conexao() as con:
+            con.executescript(ESQUEMA)
+
+    def _conexao(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=30)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _atualizar(self, trabalho_id, **campos):
+        atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+        with self._conexao() as con:
+            con.execute(f"UPDATE trabalhos SET {atribuicoes} WHERE id = ?",
+                        [*campos.values(), trabalho_id])
+
+    def caminho_arquivo(self, trabalho_id):
+        return os.path.join(self.diretorio, f"{trabalho_id}.docx")
+
+    def enviar(self, sessao, nome_arquivo, dados, eventos, incluir_rodape=True,
+               incluir_numeracao=True, versao=1, medir_tempos=False):
+        """Coloca um laudo na fila; devolve o id do trabalho"""
+        from banco import para_json
+
+        trabalho_id = uuid.uuid4().hex
+        entrada = para_json({
+            'dados': dados,
+            'eventos': eventos,
+            'opcoes': [incluir_rodape, incluir_numeracao, versao],
+            'medir_tempos': medir_tempos,
+        })
+        with self._conexao() as con:
+            con.execute(
+                """INSERT INTO trabalhos (id, sessao, nome_arquivo, entrada, total_eventos, criado_em)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (trabalho_id, sessao, nome_arquivo, entrada, len(eventos), _agora()),
+            )
+        self.garantir_trabalhadores()
+        return trabalho_id
+
+    def _podar_trabalhadores(self):
+        # poll() também recolhe os processos encerrados, que senão seguem "vivos" como zumbis
+        self._trabalhadores = [p for p in self._trabalhadores if p.poll() is None]
+
+    def garantir_trabalhadores(self):
+        """Inicia processos trabalhadores até completar ``processos`` ativos"""
+        with self._trabalhadores_lock:
+            self._podar_trabalhadores()
+            while len(self._trabalhadores) < self.processos:
+                self._trabalhadores.append(subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), '--trabalhar',
+                     '--banco', self.caminho, '--diretorio', self.diretorio,
+                     '--tempo-ocioso', str(TEMPO_OCIOSO), '--pai', str(os.getpid())],
+                    stdin=subprocess.DEVNULL,
+                ))
+
+    def _retirar(self):
+        """Marca o trabalho pendente mais antigo como em execução; devolve ``(id, entrada)``"""
+        with self._conexao() as con:
+            return con.execute(
+                """UPDATE trabalhos SET estado = ?, dono = ?
+                   WHERE id = (SELECT id FROM trabalhos WHERE estado = ?
+                               ORDER BY criado_em, rowid LIMIT 1)
+                   RETURNING id, entrada""",
+                (EXECUTANDO, _dono(), PENDENTE),
+            ).fetchone()
+
+    def trabalhos(self, sessao, limite=5):
+        """Trabalhos mais recentes da sessão"""
+        linhas = self._conexao().execute(
+            """SELECT id, sessao, nome_arquivo, estado, etapa, atual, total, progresso,
+                      total_eventos, do_cache, tamanho, segundos, tempos, erro, dono,
+                      metricas_registradas, criado_em, concluido_em
+               FROM trabalhos WHERE sessao = ? ORDER BY criado_em DESC, rowid DESC LIMIT ?""",
+            (sessao, limite),
+        ).fetchall()
+        trabalhos = [dict(linha) for linha in linhas]
+        if any(t['estado'] == EXECUTANDO for t in trabalhos) and self.recuperar_interrompidos():
+            return self.trabalhos(sessao, limite)
+        if any(t['estado'] == PENDENTE for t in trabalhos):
+            # Trabalhadores encerram por ociosidade; garantir que alguém vai atender
+            self.garantir_trabalhadores()
+        for trabalho in trabalhos:
+            trabalho['tempos'] = json.loads(trabalho['tempos']) if trabalho['tempos'] else None
+            if trabalho['estado'] in (CONCLUIDO, ERRO) and not trabalho['metricas_registradas']:
+                self._registrar_metricas(trabalho)
+        return trabalhos
+
+    def _registrar_metricas(self, trabalho):
+        """Conta o trabalho finalizado nas métricas deste processo, uma única vez"""
+        from metricas import metricas_padrao
+
+        with self._conexao() as con:
+            marcado = con.execute(
+                "UPDATE trabalhos SET metricas_registradas = 1 WHERE id = ? AND metricas_registradas = 0",
+                (trabalho['id'],),
+            ).rowcount
+        if not marcado:
+            return
+        if trabalho['estado'] == CONCLUIDO:
+            metricas_padrao().registrar_geracao(trabalho['segundos'], trabalho['tamanho'],
+                                                trabalho['total_eventos'], bool(trabalho['do_cache']))
+        else:
+            metricas_padrao().registrar_falha()
+
+    def conteudo(self, trabalho_id):
+        """Bytes do .docx de um trabalho concluído, ou ``None``"""
+        try:
+            with open(self.caminho_arquivo(trabalho_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def recuperar_interrompidos(self):
+        """Marca como erro os trabalhos cujo trabalhador morreu; devolve quantos"""
+        with self._trabalhadores_lock:
+            self._podar_trabalhadores()
+        host = socket.gethostname()
+        interrompidos = 0
+        with self._conexao() as con:
+            linhas = con.execute(
+                "SELECT id, dono FROM trabalhos WHERE estado = ?", (EXECUTANDO,)
+            ).fetchall()
+            for linha in linhas:
+                maquina, _, pid = (linha['dono'] or '').rpartition(':')
+                if maquina == host and not _processo_vivo(int(pid)):
+                    con.execute(
+                        "UPDATE trabalhos SET estado = ?, erro = ?, entrada = NULL, concluido_em = ? WHERE id = ?",
+                        (ERRO, "Processo de geração interrompido", _agora(), linha['id']),
+                    )
+                    interrompidos += 1
+        return interrompidos
+
+    def limpar_antigos(self, dias=DIAS_RETENCAO):
+        """Apaga trabalhos e arquivos com mais de ``dias`` dias"""
+        limite = (datetime.now() - timedelta(days=dias)).isoformat(timespec='seconds')
+        with self._conexao() as con:
+            antigos = [linha[0] for linha in con.execute(
+                "SELECT id FROM trabalhos WHERE criado_em < ?", (limite,)
+            )]
+            con.execute("DELETE FROM trabalhos WHERE criado_em < ?", (limite,))
+        for trabalho_id in antigos:
+            try:
+                os.remove(self.caminho_arquivo(trabalho_id))
+            except FileNotFoundError:
+                pass
+
+    def executar(self, trabalho_id, entrada):
+        """Gera o laudo de um trabalho já retirado da fila e grava o arquivo e o estado final"""
+        from contextlib import nullcontext
+
+        from cache_docx import gerar_bytes_cache
+        from instrumentacao import medicao
+
+        entrada = json.loads(entrada)
+        inicio = time.perf_counter()
+        try:
+            with (medicao('laudo') if entrada['medir_tempos'] else nullcontext()) as tempos:
+                conteudo, do_cache = gerar_bytes_cache(
+                    entrada['dados'], entrada['eventos'], *entrada['opcoes'],
+                    progresso=_Progresso(self, trabalho_id)
+                )
+            caminho = self.caminho_arquivo(trabalho_id)
+            with open(caminho + '.tmp', 'wb') as f:
+                f.write(conteudo)
+            os.replace(caminho + '.tmp', caminho)
+        except Exception as e:
+            self._atualizar(trabalho_id, estado=ERRO, erro=str(e), entrada=None,
+                            concluido_em=_agora())
+            return
+        self._atualizar(
+            trabalho_id, estado=CONCLUIDO, progresso=1.0, do_cache=int(do_cache),
+            tamanho=len(conteudo), segundos=time.perf_counter() - inicio, entrada=None,
+            tempos=json.dumps(tempos.resumo()) if tempos is not None else None,
+            concluido_em=_agora(),
+        )
+
+    def trabalhar(self, tempo_ocioso=None, pai=None):
+        """Laço do processo trabalhador: executa trabalhos indefinidamente.
+
+        Com ``tempo_ocioso`` (s), encerra depois desse tempo sem trabalho; com
+        ``pai``, encerra quando esse processo (o app que o iniciou) termina.
+        """
+        ocioso_desde = time.monotonic()
+        while ((pai is None or os.getppid() == pai)
+               and (tempo_ocioso is None or time.monotonic() - ocioso_desde < tempo_ocioso)):
+            trabalho = self._retirar()
+            if trabalho is None:
+                time.sleep(INTERVALO_ESPERA)
+                continue
+            self.executar(trabalho['id'], trabalho['entrada'])
+            ocioso_desde = time.monotonic()
+
+
+class _Progresso:
+    """Grava o andamento do trabalho, no máximo a cada ``INTERVALO_PROGRESSO`` por etapa"""
+
+    def __init__(self, fila, trabalho_id):
+        self.fila = fila
+        self.trabalho_id = trabalho_id
+        self.etapa = None
+        self.ultimo = 0.0
+
+    def __call__(self, etapa, atual=0, total=1):
+        from gerador import ETAPAS_GERACAO
+
+        agora = time.monotonic()
+        if etapa == self.etapa and agora - self.ultimo < INTERVALO_PROGRESSO:
+            return
+        self.etapa, self.ultimo = etapa, agora
+        fracao = atual / total if total else 0.0
+        progresso = (ETAPAS_GERACAO.index(etapa) + fracao) / len(ETAPAS_GERACAO)
+        self.fila._atualizar(self.trabalho_id, etapa=etapa, atual=atual, total=total,
+                             progresso=progresso)
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def fila_padrao():
+    """Fila compartilhada do processo, em ``DIRETORIO_DADOS/fila.db``"""
+    global _fila
+    with _fila_lock:
+        if _fila is None:
+            os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+            _fila = FilaLaudos(os.path.join(DIRETORIO_DADOS, 'fila.db'),
+                               os.path.join(DIRETORIO_DADOS, 'trabalhos'))
+            _fila.recuperar_interrompidos()
+            _fila.limpar_antigos()
+    return _fila
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Processo trabalhador da fila de laudos")
+    parser.add_argument('--trabalhar', action='store_true', required=True)
+    parser.add_argument('--banco', default=os.path.join(DIRETORIO_DADOS, 'fila.db'))
+    parser.add_argument('--diretorio', default=os.path.join(DIRETORIO_DADOS, 'trabalhos'))
+    parser.add_argument('--tempo-ocioso', type=float, default=None,
+                        help="Segundos sem trabalho até encerrar (padrão: não encerra)")
+    parser.add_argument('--pai', type=int, default=None,
+                        help="PID do processo que iniciou o trabalhador; encerra junto com ele")
+    args = parser.parse_args(argv)
+    FilaLaudos(args.banco, args.diretorio).trabalhar(args.tempo_ocioso, args.pai)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,787 @@
+"""Motor de geração de laudos de inspeção predial.
+
+Não depende do Streamlit: recebe ``dados``/``eventos`` como dicionários e
+listas simples e devolve o documento, os bytes do .docx ou grava em disco.
+O python-docx só é importado quando um documento é de fato gerado, para que
+``OPCOES`` e ``DOCUMENTACOES`` possam ser importados sem custo.
+"""
+from collections import OrderedDict
+from datetime import date, datetime
+import copy
+import functools
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+
+from imagens import DPI_IMAGENS, preparar_imagens_eventos
+from instrumentacao import trecho
+
+# Dicionários de opções
+OPCOES = {
+    "contratada": [
+        "Testcon Engenharia",
+        "E2E Consultoria e Gestão",
+        "Outra"
+    ],
+    "tipo_empreendimento": [
+        "Institucional de ensino superior privado",
+        "Comercial",
+        "Residencial multifamiliar",
+        "Industrial",
+        "Hospitalar",
+        "Outro"
+    ],
+    "anomalias": [
+        "Eflorescência",
+        "Pinturas em desconformidades",
+        "Pilares apresentam expansão de armadura",
+        "Marquises com rupturas e desplacamento",
+        "Corrosão",
+        "Mofo e bolor",
+        "Infiltrações",
+        "Fissuras",
+        "Trincas",
+        "Rachaduras",
+        "Desplacamento de revestimento",
+        "Vazamentos",
+        "Problemas estruturais",
+        "Deficiência de impermeabilização",
+        "Instalações elétricas inadequadas",
+        "Selantes inadequados",
+        "Pintura deteriorada",
+        "Desorganização",
+        "Fixação inadequada",
+        "Sem funcionamento",
+        "Base de fixação inadequada",
+        "Sistema inadequado",
+        "Manchas de umidade",
+        "Comprometimento de equipamentos",
+        "Deficiência de ventilação",
+        "Outra"
+    ],
+    "causas": [
+        "Endógena",
+        "Exógena", 
+        "Funcional",
+        "Endógena/Funcional",
+        "Funcional/Exógena",
+        "Outra"
+    ],
+    "consequencias": [
+        "Prejuízo estético",
+        "Iminência de infiltração",
+        "Risco à segurança dos usuários",
+        "Comprometimento estrutural",
+        "Insalubridade",
+        "Perda de funcionalidade",
+        "Comprometimento de equipamentos",
+        "Falta de acessibilidade",
+        "Prejuízo estético e risco à segurança dos usuários",
+        "Prejuízo estético, iminência de infiltração e risco à segurança dos usuários",
+        "Prejuízo estético, insalubridade e risco à segurança dos usuários",
+        "Outra"
+    ],
+    "recomendacoes": [
+        "Contratar empresa especializada para reabilitar as estruturas",
+        "Realizar pintura de toda área",
+        "Revisar estruturas e trocar selantes",
+        "Impermeabilizar áreas afetadas",
+        "Adequar instalações elétricas",
+        "Realizar limpeza e organização",
+        "Substituir elementos danificados",
+        "Realizar manutenção preventiva",
+        "Contratar empresa para verificação e adequação",
+        "Reabilitar pinturas das paredes e tetos",
+        "Fazer limpeza na área",
+        "Contratar empresa especializada para manutenção",
+        "Contratar empresa para adequar circulação do ar",
+        "Contratar empresa especializada para revisão de toda instalação elétrica",
+        "Outra"
+    ]
+}
+
+# Documentações padrão
+DOCUMENTACOES = [
+    "Certificado de Conclusão de Obra ou Habite-se",
+    "Alvará ou Licença de Funcionamento",
+    "Auto de Vistoria do Corpo de Bombeiros",
+    "Licença de operação da ETE",
+    "Licenças ambientais",
+    "Certificado de Acessibilidade",
+    "Licença de perfuração poços profundos",
+    "Documentos de formação da brigada de incêndio",
+    "Alvará de aprovação para instalação de equipamento",
+    "Declaração de prestação de serviços de Pronto Atendimento",
+    "Aprovação de paralelismo de Grupo Moto Gerador",
+    "Manual de Uso, Operação e Manutenção",
+    "Registros de manutenções",
+    "Projetos Arquitetônicos"
+]
+
+# Opções fixas dos eventos
+PRIORIDADES = ["Prioridade 1", "Prioridade 2", "Prioridade 3"]
+USOS = ["Regular", "Irregular"]
+
+# Datas fixas para saída reprodutível: membros do zip e laudos sem data
+_DATA_ZIP = (1980, 1, 1, 0, 0, 0)
+_DATA_PADRAO = datetime(2000, 1, 1)
+
+# Funções auxiliares para gerar o documento
+@functools.lru_cache(maxsize=None)
+def _modelo_base():
+    """Monta uma vez por processo as seções estáticas do laudo.
+
+    Devolve ``(documento, campos_capa, documentacoes)``: o documento com capa,
+    sumário e ressalvas (campos variáveis da capa vazios), os índices dos
+    parágrafos da capa a preencher e os parágrafos prontos de cada item de
+    ``DOCUMENTACOES``, indexados por ``(nome, disponibilizada)``.
+    """
+    from docx import Document
+    from docx.shared import Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    doc = Document()
+    
+    # Configurar estilos básicos
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Arial'
+    font.size = Pt(11)
+    
+    # CAPA
+    # Título principal
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("RELATÓRIO DE ENGENHARIA")
+    run.font.size = Pt(16)
+    run.font.bold = True
+    
+    # Subtítulo
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("Laudo Técnico de Inspeção Predial")
+    run.font.size = Pt(14)
+    run.font.bold = True
+    
+    # Espaços
+    for _ in range(3):
+        doc.add_paragraph()
+    
+    # Informações do contratante
+    campos_capa = []
+    p = doc.add_paragraph()
+    p.add_run("Contratante: ").bold = True
+    p.add_run()
+    campos_capa.append(len(doc.paragraphs) - 1)
+    
+    p = doc.add_paragraph()
+    p.add_run("CNPJ: ").bold = True
+    p.add_run()
+    campos_capa.append(len(doc.paragraphs) - 1)
+    
+    p = doc.add_paragraph()
+    p.add_run("Data: ").bold = True
+    p.add_run()
+    campos_capa.append(len(doc.paragraphs) - 1)
+    
+    # Espaços
+    for _ in range(5):
+        doc.add_paragraph()
+    
+    # Imóvel
+    p = doc.add_paragraph()
+    p.add_run("Imóvel motivo:").bold = True
+    
+    p = doc.add_paragraph()
+    p.add_run()
+    campos_capa.append(len(doc.paragraphs) - 1)
+    
+    # Espaços
+    for _ in range(3):
+        doc.add_paragraph()
+    
+    # Responsável técnico
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run("Silvio Augusto Barbosa de Albuquerque Filho, Engenheiro Civil")
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run("CREA/PE nº 054787D-PE")
+    
+    # Nova página para o sumário
+    doc.add_page_break()
+    
+    # SUMÁRIO
+    doc.add_heading('Sumário', level=1)
+    
+    # Lista de seções
+    secoes = [
+        ("1. RESSALVAS INICIAIS", "4"),
+        ("2. OBJETIVO", "5"),
+        ("3. DESCRIÇÃO DO OBJETO INSPECIONADO", "8"),
+        ("4. REFERÊNCIAS NORMATIVAS", "11"),
+        ("5. TERMINOLOGIA", "12"),
+        ("6. ABRANGÊNCIA DA ANÁLISE", "18"),
+        ("7. CLASSIFICAÇÃO DAS IRREGULARIDADES", "19"),
+        ("8. PATAMARES DE CRITICIDADE", "20"),
+        ("9. AVALIAÇÃO DE MANUTENÇÃO", "21"),
+        ("10. AVALIAÇÃO DE USO", "23"),
+        ("11. METODOLOGIA", "23"),
+        ("12. DOCUMENTAÇÕES SOLICITADAS E DISPONIBILIZADAS", "26"),
+        ("13. ANAMNESE", "27"),
+        ("14. LAUDO TÉCNICO", "48"),
+        ("15. DATA DO RELATÓRIO TÉCNICO", "53")
+    ]
+    
+    for titulo, pagina in secoes:
+        p = doc.add_paragraph()
+        p.add_run(titulo)
+        p.add_run(f" {'.'*50} {pagina}")
+    
+    # Nova página para o conteúdo
+    doc.add_page_break()
+    
+    # 1. RESSALVAS INICIAIS
+    doc.add_heading('RESSALVAS INICIAIS', level=1)
+    doc.add_paragraph("O presente relatório técnico obedeceu aos seguintes princípios e ressalvas:")
+    
+    ressalvas = [
+        "O vistoriador signatário inspecionou pessoalmente o objeto e o relatório técnico foi elaborado pelo próprio e ninguém, a não ser o mesmo, preparou as análises e as respectivas conclusões;",
+        "O Relatório técnico foi elaborado com estrita observância dos postulados constantes do Código de Ética Profissional;",
+        "Os honorários profissionais do signatário não estão, de qualquer forma, subordinados às conclusões deste relatório técnico;",
+        "O vistoriador signatário não tem nenhuma inclinação pessoal em relação à matéria envolvida neste relatório técnico no presente, nem contempla para o futuro, qualquer interesse no bem objeto deste relatório técnico."
+    ]
+    
+    for i, ressalva in enumerate(ressalvas, start=1):
+        p = doc.add_paragraph()
+        p.style = 'List Bullet'
+        p.add_run(f"{chr(96+i)}) {ressalva}")
+    
+    # Itens de documentação prontos para clonar
+    rascunho = Document()
+    documentacoes = {}
+    for doc_nome in DOCUMENTACOES:
+        for disponivel in (True, False):
+            p = rascunho.add_paragraph()
+            p.style = 'List Bullet'
+            p.add_run(f"{doc_nome} - ")
+            run = p.add_run("DISPONIBILIZADA" if disponivel else "AUSENTE")
+            run.bold = True
+            documentacoes[(doc_nome, disponivel)] = p._p
+    
+    return doc, tuple(campos_capa), documentacoes
+
+
+def _anexar(doc, *elementos):
+    """Anexa elementos ao corpo do documento, antes do ``sectPr`` final"""
+    body = doc.element.body
+    # body.sectPr percorre os filhos do corpo: buscar uma vez só, não a cada elemento
+    sect_pr = body.sectPr
+    for elemento in elementos:
+        if sect_pr is not None:
+            sect_pr.addprevious(elemento)
+        else:
+            body.append(elemento)
+
+
+# Fragmentos OOXML montados como texto e anexados de uma vez, em vez de
+# dezenas de chamadas add_paragraph/add_run por evento. Reproduzem
+# exatamente o XML que o python-docx geraria para o mesmo conteúdo.
+_NS_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+_ROTULOS_EVENTO = [
+    ("Localização: ", lambda e: e.get('localizacao', '')),
+    ("Anomalia: ", lambda e: ", ".join(e.get('anomalias', []))),
+    ("Provável causa: ", lambda e: e.get('causa', '')),
+    ("Consequência da anomalia: ", lambda e: ", ".join(e.get('consequencias', []))),
+    ("Patamar de urgência: ", lambda e: e.get('prioridade', '')),
+    ("Uso: ", lambda e: e.get('uso', '')),
+    ("Recomendação técnica: ", lambda e: ", ".join(e.get('recomendacoes', []))),
+]
+
+
+def _escapar(texto):
+    """Como ``xml.sax.saxutils.escape``, sem importar o urllib junto"""
+    return texto.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _xml_t(texto):
+    """``<w:t>`` com ``xml:space`` quando há espaços nas pontas"""
+    if len(texto.strip()) < len(texto):
+        return f'<w:t xml:space="preserve">{_escapar(texto)}</w:t>'
+    return f'<w:t>{_escapar(texto)}</w:t>'
+
+
+def _xml_run(texto, rpr=''):
+    """``<w:r>`` equivalente a ``run.text = texto`` (tabulações e quebras viram elementos)"""
+    partes = []
+    buffer = []
+    for char in texto or '':
+        if char == '\t' or char in '\r\n':
+            if buffer:
+                partes.append(_xml_t(''.join(buffer)))
+                buffer.clear()
+            partes.append('<w:tab/>' if char == '\t' else '<w:br/>')
+        else:
+            buffer.append(char)
+    if buffer:
+        partes.append(_xml_t(''.join(buffer)))
+    if not partes and not rpr:
+        return '<w:r/>'
+    return f'<w:r>{rpr}{"".join(partes)}</w:r>'
+
+
+def _xml_evento(evento):
+    """Bloco de parágrafos de um EVENTO"""
+    partes = [
+        '<w:p/>',
+        '<w:p>' + _xml_run(f"EVENTO {evento['numero']:02d}: {evento['nome']}",
+                           '<w:rPr><w:b/><w:sz w:val="24"/></w:rPr>') + '</w:p>',
+    ]
+    if evento.get('descricao'):
+        partes.append('<w:p>' + _xml_run("Descrição: ", '<w:rPr><w:b/></w:rPr>')
+                      + _xml_run(evento['descricao']) + '</w:p>')
+    for rotulo, valor in _ROTULOS_EVENTO:
+        partes.append('<w:p>' + _xml_run(rotulo, '<w:rPr><w:b/></w:rPr>')
+                      + _xml_run(valor(evento)) + '</w:p>')
+    return ''.join(partes)
+
+
+def _xml_evento_cache(evento):
+    """``_xml_evento`` com cache; fotos e id não entram no texto do bloco"""
+    entradas = {campo: valor for campo, valor in evento.items() if campo not in ('imagens', 'id')}
+    chave = _chave_secao('evento', entradas)
+    xml = _ler_cache_secao(chave)
+    if xml is None:
+        xml = _xml_evento(evento)
+        _gravar_cache_secao(chave, xml)
+    return xml
+
+
+def _xml_fotos(parte, fotos, proximo_id):
+    """Parágrafo centralizado com as fotos de um evento; devolve ``(xml, proximo_id)``"""
+    from docx.oxml.shape import CT_Inline
+    from docx.shared import Inches
+    from lxml import etree
+
+    runs = []
+    for jpeg, largura_pol in fotos:
+        rId, imagem = parte.get_or_add_image(io.BytesIO(jpeg))
+        cx, cy = imagem.scaled_dimensions(Inches(largura_pol), None)
+        inline = CT_Inline.new_pic_inline(proximo_id, rId, imagem.filename, cx, cy)
+        proximo_id += 1
+        if runs:
+            runs.append(_xml_run(' '))
+        runs.append(f'<w:r><w:drawing>{etree.tostring(inline, encoding="unicode")}</w:drawing></w:r>')
+    return f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr>{"".join(runs)}</w:p>', proximo_id
+
+
+def _xml_linha_tabela(textos, larguras):
+    """``<w:tr>`` equivalente a ``table.add_row()`` seguido de ``cell.text = ...``"""
+    celulas = ''.join(
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{largura}"/></w:tcPr>'
+        f'<w:p>{_xml_run(texto)}</w:p></w:tc>'
+        for texto, largura in zip(textos, larguras)
+    )
+    return f'<w:tr>{celulas}</w:tr>'
+
+
+def _parse_fragmentos(fragmentos):
+    """Converte fragmentos OOXML em elementos, num único parse"""
+    from docx.oxml import parse_xml
+
+    return list(parse_xml(f'<w:body xmlns:w="{_NS_W}">{"".join(fragmentos)}</w:body>'))
+
+
+# Cache de seções renderizadas: ao regenerar um laudo, só as seções cujas
+# entradas mudaram são montadas de novo; as demais vêm do cache como XML.
+LIMITE_CACHE_SECOES = 4096
+
+_cache_secoes = OrderedDict()
+_cache_secoes_lock = threading.Lock()
+
+
+def _chave_secao(nome, entradas):
+    texto = json.dumps(entradas, ensure_ascii=False, sort_keys=True, default=str)
+    return nome, hashlib.blake2b(texto.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _ler_cache_secao(chave):
+    with _cache_secoes_lock:
+        xml = _cache_secoes.get(chave)
+        if xml is not None:
+            _cache_secoes.move_to_end(chave)
+        return xml
+
+
+def _gravar_cache_secao(chave, xml):
+    with _cache_secoes_lock:
+        _cache_secoes[chave] = xml
+        _cache_secoes.move_to_end(chave)
+        while len(_cache_secoes) > LIMITE_CACHE_SECOES:
+            _cache_secoes.popitem(last=False)
+
+
+def limpar_cache_secoes():
+    """Esvazia o cache de seções renderizadas"""
+    with _cache_secoes_lock:
+        _cache_secoes.clear()
+
+
+def _renderizar_secao(doc, nome, entradas, renderizar, *args):
+    """Anexa a seção ``nome`` ao documento, do cache ou chamando ``renderizar(doc, *args)``"""
+    chave = _chave_secao(nome, entradas)
+    xml = _ler_cache_secao(chave)
+    if xml is not None:
+        with trecho(f"{nome} (cache)"):
+            _anexar(doc, *_parse_fragmentos([xml]))
+        return
+
+    with trecho(nome):
+        _renderizar_secao_nova(doc, chave, renderizar, *args)
+
+
+def _renderizar_secao_nova(doc, chave, renderizar, *args):
+    """Renderiza a seção no documento e guarda o XML gerado no cache"""
+    from docx.oxml.ns import qn
+    from lxml import etree
+
+    body = doc.element.body
+    inicio = len(body) - (1 if body.sectPr is not None else 0)
+    renderizar(doc, *args)
+    fim = len(body) - (1 if body.sectPr is not None else 0)
+
+    # Serializa sob um w:body com os namespaces do documento, para não
+    # repetir declarações em cada elemento ao remontar a partir do cache
+    envoltorio = etree.Element(qn('w:body'), nsmap=doc.element.nsmap)
+    for elemento in body[inicio:fim]:
+        envoltorio.append(copy.deepcopy(elemento))
+    xml = etree.tostring(envoltorio, encoding='unicode')
+    xml = xml[xml.index('>') + 1:xml.rindex('<')] if len(envoltorio) else ''
+    _gravar_cache_secao(chave, xml)
+
+
+def _secao_objetivo(doc, dados):
+    """Seções 2 (objetivo) e breve relato"""
+    # 2. OBJETIVO
+    doc.add_page_break()
+    doc.add_heading('OBJETIVO', level=1)
+    
+    p = doc.add_paragraph()
+    p.add_run("O presente Laudo Técnico de Inspeção Predial foi solicitado pelo ")
+    p.add_run(dados.get('contratante', '')).bold = True
+    p.add_run(", CNPJ: ")
+    p.add_run(dados.get('cnpj', '')).bold = True
+    p.add_run(", elaborado pelo Engenheiro Civil, Silvio Augusto Barbosa de Albuquerque Filho, CREA-PE nº 054787D-PE")
+    
+    if dados.get('art_numero'):
+        p.add_run(f", com registro da ART nº{dados['art_numero']} do presente documento.")
+    else:
+        p.add_run(".")
+    
+    doc.add_paragraph("A inspeção irá registrar as anomalias e falhas prediais por meio de um check-up da edificação.")
+    
+    # Breve relato
+    if dados.get('breve_relato'):
+        doc.add_heading('BREVE RELATO', level=2)
+        p = doc.add_paragraph()
+        p.add_run(f"Entre os dias {dados.get('dias_vistoria', '')} foram realizadas vistorias pela empresa ")
+        p.add_run(dados.get('contratada', '')).bold = True
+        p.add_run(" a pedido do ")
+        p.add_run(dados.get('contratante', '')).bold = True
+        p.add_run(" no imóvel localizado ")
+        p.add_run(dados.get('endereco', '')).bold = True
+        p.add_run(", no qual afirma:")
+        
+        # Processar breve relato
+        doc.add_paragraph()
+        relato_linhas = dados['breve_relato'].split('\n')
+        for i, linha in enumerate(relato_linhas, start=1):
+            if linha.strip():
+                p = doc.add_paragraph()
+                p.style = 'List Number'
+                p.add_run(linha.strip())
+
+
+def _secao_descricao(doc, dados):
+    """Seção 3: descrição do objeto inspecionado"""
+    # 3. DESCRIÇÃO DO OBJETO
+    doc.add_page_break()
+    doc.add_heading('DESCRIÇÃO DO OBJETO INSPECIONADO', level=1)
+    
+    p = doc.add_paragraph()
+    p.add_run(f"Trata-se de um empreendimento do tipo {dados.get('tipo_empreendimento', '')}, ")
+    p.add_run(dados.get('info_localizacao', ''))
+    p.add_run(f". O edifício está {'ocupado' if dados.get('ocupado') == 'Sim' else 'desocupado'}.")
+
+
+def _secao_documentacoes(doc, dados, documentacoes):
+    """Seção 12: documentações solicitadas e disponibilizadas"""
+    # 12. DOCUMENTAÇÕES
+    doc.add_page_break()
+    doc.add_heading('DOCUMENTAÇÕES SOLICITADAS E DOCUMENTAÇÕES DISPONIBILIZADAS:', level=1)
+    
+    docs_disponibilizadas = dados.get('docs_disponibilizadas', [])
+    
+    for doc_nome in DOCUMENTACOES:
+        disponivel = doc_nome in docs_disponibilizadas
+        _anexar(doc, copy.deepcopy(documentacoes[(doc_nome, disponivel)]))
+    
+    if dados.get('obs_docs'):
+        doc.add_paragraph()
+        p = doc.add_paragraph()
+        p.add_run("Obs: ").bold = True
+        p.add_run(dados['obs_docs'])
+
+
+def _secao_anamnese(doc, dados):
+    """Seção 13: anamnese"""
+    # 13. ANAMNESE
+    doc.add_page_break()
+    doc.add_heading('ANAMNESE', level=1)
+    doc.add_paragraph(dados.get('anamnese', ''))
+    
+    doc.add_paragraph("A coordenação de dados se dá por meio de textos classificando as constatações de modo que as análises serão divididas de acordo com os arquivos anexos.")
+
+
+def _secao_resumo(doc, eventos):
+    """Tabela de resumo dos eventos por prioridade"""
+    doc.add_page_break()
+    doc.add_heading('Resumo de Eventos por Prioridade', level=2)
+    
+    # Criar tabela
+    table = doc.add_table(rows=1, cols=3)
+    table.style = 'Light Grid Accent 1'
+    
+    # Cabeçalho
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'EVENTO'
+    hdr_cells[1].text = 'ANOMALIA'
+    hdr_cells[2].text = 'PRIORIDADE'
+    
+    # Ordenar eventos por prioridade
+    eventos_ordenados = sorted(eventos, key=lambda x: (x['prioridade'], x['numero']))
+    
+    # Adicionar linhas
+    larguras = table._tbl.tr_lst[0].xpath('./w:tc/w:tcPr/w:tcW/@w:w')
+    linhas = _parse_fragmentos(
+        _xml_linha_tabela([
+            f"EVENTO {evento['numero']:02d}",
+            ", ".join(evento['anomalias']),
+            evento['prioridade'].split()[-1],
+        ], larguras)
+        for evento in eventos_ordenados
+    )
+    table._tbl.extend(linhas)
+
+
+# Texto do LAUDO TÉCNICO quando não há texto próprio: dias de vistoria, endereço e contratante
+TEXTO_LAUDO_PADRAO = """O presente laudo técnico de inspeção predial foi elaborado com base nas vistorias realizadas entre os dias {} na edificação localizada em {}, pertencente ao {}. O objetivo foi avaliar as condições gerais da edificação, com foco na integridade estrutural, funcionalidade dos sistemas construtivos, segurança dos usuários, e condições de habitabilidade, em conformidade com as diretrizes da ABNT NBR 16747:2020 e da NBR 13752:2024."""
+
+
+def _secao_laudo_tecnico(doc, dados):
+    """Seções 14 (laudo técnico) e 15 (data do relatório), com assinatura"""
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    # 14. LAUDO TÉCNICO
+    doc.add_page_break()
+    doc.add_heading('LAUDO TÉCNICO', level=1)
+    
+    if dados.get('texto_laudo'):
+        doc.add_paragraph(dados['texto_laudo'])
+    else:
+        # Texto padrão
+        doc.add_paragraph(TEXTO_LAUDO_PADRAO.format(
+            dados.get('dias_vistoria', ''),
+            dados.get('endereco', ''),
+            dados.get('contratante', '')
+        ))
+    
+    # 15. DATA DO RELATÓRIO
+    doc.add_page_break()
+    doc.add_heading('DATA DO RELATÓRIO TÉCNICO', level=1)
+    
+    p = doc.add_paragraph()
+    p.add_run(f"Em {dados.get('data_laudo').strftime('%d de %B de %Y')}, ")
+    p.add_run("com base nos trabalhos aqui representados encerramos o presente relatório técnico.")
+    
+    # Assinatura
+    for _ in range(3):
+        doc.add_paragraph()
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run("_" * 50)
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run("Eng. Responsável: Eng. Silvio Albuquerque Filho").bold = True
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run("CREA: 054787D-PE").bold = True
+    
+    if dados.get('art_numero'):
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p.add_run(f"ART: {dados['art_numero']}").bold = True
+
+
+# Etapas informadas a ``progresso(etapa, atual, total)`` durante a geração, em ordem
+ETAPAS_GERACAO = ('capa', 'objetivo', 'descricao', 'documentacoes', 'anamnese', 'imagens',
+                  'eventos', 'resumo', 'laudo_tecnico', 'salvar')
+
+
+def _sem_progresso(etapa, atual=0, total=1):
+    pass
+
+
+def gerar_documento_completo(dados, eventos, incluir_rodape=True, incluir_numeracao=True, versao=1,
+                             dpi_imagens=DPI_IMAGENS, progresso=None):
+    """Gera o documento Word completo"""
+    dados = normalizar_dados(dados)
+    avisar = progresso or _sem_progresso
+    
+    # CAPA, SUMÁRIO e 1. RESSALVAS INICIAIS: clonados do modelo base
+    avisar('capa')
+    with trecho('capa'):
+        modelo, campos_capa, documentacoes = _modelo_base()
+        # O lxml não preserva identidade no deepcopy: usar o documento da parte copiada
+        doc = copy.deepcopy(modelo).part.document
+        
+        valores_capa = [
+            dados.get('contratante', ''),
+            dados.get('cnpj', ''),
+            dados.get('data_laudo').strftime('%d/%m/%Y') if dados.get('data_laudo') else '',
+            dados.get('endereco', ''),
+        ]
+        paragrafos = doc.paragraphs
+        for indice, valor in zip(campos_capa, valores_capa):
+            if valor:
+                paragrafos[indice].runs[-1].text = valor
+    
+    # Demais seções, cada uma com as entradas de que depende como chave do cache
+    campos = lambda *nomes: [dados.get(nome) for nome in nomes]
+    
+    # 2. OBJETIVO e BREVE RELATO
+    avisar('objetivo')
+    _renderizar_secao(doc, 'objetivo', campos('contratante', 'cnpj', 'art_numero', 'breve_relato',
+                                              'dias_vistoria', 'contratada', 'endereco'),
+                      _secao_objetivo, dados)
+    
+    # 3. DESCRIÇÃO DO OBJETO
+    avisar('descricao')
+    _renderizar_secao(doc, 'descricao', campos('tipo_empreendimento', 'info_localizacao', 'ocupado'),
+                      _secao_descricao, dados)
+    
+    # 12. DOCUMENTAÇÕES
+    avisar('documentacoes')
+    _renderizar_secao(doc, 'documentacoes', campos('docs_disponibilizadas', 'obs_docs'),
+                      _secao_documentacoes, dados, documentacoes)
+    
+    # 13. ANAMNESE
+    avisar('anamnese')
+    _renderizar_secao(doc, 'anamnese', campos('anamnese'), _secao_anamnese, dados)
+    
+    # Processar eventos (fotos processadas em paralelo antes de montar os blocos)
+    avisar('imagens')
+    with trecho('imagens'):
+        fotos_eventos = preparar_imagens_eventos(
+            eventos, dpi_imagens, progresso=lambda feitas, total: avisar('imagens', feitas, total)
+        )
+    with trecho('eventos'):
+        proximo_id = doc.part.next_id
+        fragmentos = []
+        for i, (evento, fotos) in enumerate(zip(eventos, fotos_eventos)):
+            avisar('eventos', i, len(eventos))
+            fragmentos.append(_xml_evento_cache(evento))
+            if fotos:
+                xml_fotos, proximo_id = _xml_fotos(doc.part, fotos, proximo_id)
+                fragmentos.append(xml_fotos)
+        _anexar(doc, *_parse_fragmentos(fragmentos))
+    
+    # Tabela resumo
+    if eventos:
+        avisar('resumo')
+        linhas = [(e['numero'], e['anomalias'], e['prioridade']) for e in eventos]
+        _renderizar_secao(doc, 'resumo', linhas, _secao_resumo, eventos)
+    
+    # 14. LAUDO TÉCNICO e 15. DATA DO RELATÓRIO
+    avisar('laudo_tecnico')
+    _renderizar_secao(doc, 'laudo_tecnico', campos('texto_laudo', 'dias_vistoria', 'endereco',
+                                                   'contratante', 'data_laudo', 'art_numero'),
+                      _secao_laudo_tecnico, dados)
+    
+    return doc
+
+
+def normalizar_dados(dados):
+    """Converte ``data_laudo`` em texto ISO (vindo de JSON) para ``date``"""
+    data_laudo = dados.get('data_laudo')
+    if isinstance(data_laudo, str):
+        dados = dict(dados)
+        dados['data_laudo'] = date.fromisoformat(data_laudo[:10]) if data_laudo else None
+    return dados
+
+
+def nome_arquivo_laudo(dados, versao=1):
+    """Nome padrão do arquivo: LAUDO_<contratante>_<data>_v<versao>.docx"""
+    dados = normalizar_dados(dados)
+    contratante_nome = dados['contratante'].replace(' ', '_')
+    data_str = dados['data_laudo'].strftime('%Y%m%d')
+    return f"LAUDO_{contratante_nome}_{data_str}_v{versao}.docx"
+
+
+def gerar_bytes(dados, eventos, incluir_rodape=True, incluir_numeracao=True, versao=1,
+                dpi_imagens=DPI_IMAGENS, progresso=None):
+    """Gera o laudo e devolve o conteúdo do .docx em bytes.
+
+    A saída é reprodutível: as mesmas entradas geram exatamente os mesmos
+    bytes (propriedades do documento derivadas dos dados e datas fixas no zip).
+    ``progresso(etapa, atual, total)`` é chamado a cada etapa de
+    ``ETAPAS_GERACAO`` e a cada evento.
+    """
+    dados = normalizar_dados(dados)
+    doc = gerar_documento_completo(dados, eventos, incluir_rodape, incluir_numeracao, versao,
+                                   dpi_imagens, progresso)
+    
+    # Propriedades do documento a partir dos dados, e não do relógio
+    data_doc = dados.get('data_laudo')
+    data_doc = datetime(data_doc.year, data_doc.month, data_doc.day) if data_doc else _DATA_PADRAO
+    doc.core_properties.created = data_doc
+    doc.core_properties.modified = data_doc
+    doc.core_properties.revision = versao
+    
+    (progresso or _sem_progresso)('salvar')
+    with trecho('salvar'):
+        doc_buffer = io.BytesIO()
+        doc.save(doc_buffer)
+        return _zip_reprodutivel(doc_buffer.getvalue())
+
+
+def _zip_reprodutivel(conteudo):
+    """Regrava o pacote com data fixa em todos os membros; imagens sem recompressão"""
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as origem, \
+            zipfile.ZipFile(saida, 'w') as destino:
+        for info in origem.infolist():
+            membro = zipfile.ZipInfo(info.filename, date_time=_DATA_ZIP)
+            membro.compress_type = (zipfile.ZIP_STORED if info.filename.startswith('word/media/')
+                                    else zipfile.ZIP_DEFLATED)
+            destino.writestr(membro, origem.read(info))
+    return saida.getvalue()
+
+
+def salvar_laudo(dados, eventos, caminho, incluir_rodape=True, incluir_numeracao=True, versao=1,
+                 dpi_imagens=DPI_IMAGENS):
+    """Gera o laudo e grava em ``caminho`` (arquivo ou diretório); devolve o caminho final"""
+    if os.path.isdir(caminho):
+        caminho = os.path.join(caminho, nome_arquivo_laudo(dados, versao))
+    conteudo = gerar_bytes(dados, eventos, incluir_rodape, incluir_numeracao, versao, dpi_imagens)
+    with open(caminho, 'wb') as f:
+        f.write(conteudo)
+    return caminho
@@ -0,0 +1,171 @@
+"""Geração de laudos em lote pela linha de comando.
+
+Lê um diretório de arquivos .json ou um arquivo JSON-lines, cada registro com
+``dados_laudo`` e ``eventos`` (e opcionalmente ``versao``), e gera os .docx em
+paralelo num pool de processos. ``eventos`` pode ser também o caminho de uma
+exportação de campo (CSV, XLSX ou JSON-lines, relativo à origem), validada
+por ``importacao_eventos``. Com ``--pdf``, cada .docx pronto já entra na
+fila de conversão pelo LibreOffice (``pdf.py``), enquanto os demais
+ainda estão sendo gerados.
+
+Uso:
+    python gerar_lote.py portfolio.jsonl -o saida/
+    python gerar_lote.py registros/ -o saida/ -j 8
+    python gerar_lote.py portfolio.jsonl -o saida/ --pdf
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import os
+import sys
+import time
+
+from gerador import nome_arquivo_laudo, salvar_laudo
+from importacao_eventos import importar_eventos
+
+
+class RegistroInvalido(ValueError):
+    """Registro que não pôde ser lido; ``onde`` é o arquivo (e a linha)"""
+
+    def __init__(self, onde, erro):
+        super().__init__(f"{onde}: {erro}")
+        self.onde = onde
+        self.erro = erro
+
+
+def ler_registros(origem):
+    """Lê os registros de um diretório de .json ou de um arquivo JSON-lines.
+
+    Um arquivo ou linha com JSON inválido (ou que não seja um objeto) sai como
+    ``RegistroInvalido`` no lugar do registro, para o lote seguir com os demais.
+    """
+    if os.path.isdir(origem):
+        for nome in sorted(os.listdir(origem)):
+            caminho = os.path.join(origem, nome)
+            if nome.endswith('.jsonl'):
+                yield from ler_registros(caminho)
+            elif nome.endswith('.json'):
+                with open(caminho, 'rb') as f:
+                    yield _registro(f.read(), nome)
+    else:
+        # Em bytes: uma linha com codificação inválida não interrompe a leitura
+        with open(origem, 'rb') as f:
+            for numero, linha in enumerate(f, start=1):
+                if linha.strip():
+                    yield _registro(linha, f"{os.path.basename(origem)}, linha {numero}")
+
+
+def _registro(conteudo, onde):
+    try:
+        registro = json.loads(conteudo)
+    except ValueError as e:
+        return RegistroInvalido(onde, f"JSON inválido ({e})")
+    if not isinstance(registro, dict):
+        return RegistroInvalido(onde, "o registro não é um objeto JSON")
+    return registro
+
+
+def _dados_registro(registro):
+    return registro.get('dados_laudo', registro.get('dados', {}))
+
+
+def _gerar_registro(registro, caminho):
+    """Executado no processo filho: gera um laudo e devolve (arquivo, segundos)"""
+    inicio = time.perf_counter()
+    salvar_laudo(_dados_registro(registro), registro.get('eventos', []), caminho,
+                 versao=registro.get('versao', 1))
+    return caminho, time.perf_counter() - inicio
+
+
+def gerar_lote(origem, destino, processos=None, pdf=False):
+    """Gera todos os laudos de ``origem`` em ``destino``; devolve o número de falhas"""
+    os.makedirs(destino, exist_ok=True)
+    inicio = time.perf_counter()
+    gerados = falhas = 0
+    conversoes = {}
+    if pdf:
+        from pdf import encontrar_soffice, pool_padrao
+
+        encontrar_soffice()  # sem LibreOffice, falha antes de gerar os laudos
+
+    # Exportações de campo referenciadas pelos registros ficam junto da origem
+    diretorio_origem = origem if os.path.isdir(origem) else os.path.dirname(origem)
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = {}
+        usados = set()
+        for i, registro in enumerate(ler_registros(origem), start=1):
+            if isinstance(registro, RegistroInvalido):
+                falhas += 1
+                print(f"❌ Registro {i} ({registro.onde}): {registro.erro}", file=sys.stderr)
+                continue
+            if isinstance(registro.get('eventos'), str):
+                try:
+                    eventos, erros = importar_eventos(os.path.join(diretorio_origem, registro['eventos']))
+                except (OSError, ValueError, RuntimeError) as e:
+                    erros = [('', '', str(e))]
+                if erros:
+                    falhas += 1
+                    for linha, coluna, mensagem in erros:
+                        onde = f", linha {linha}" + (f", {coluna}" if coluna else "") if linha else ""
+                        print(f"❌ Registro {i} ({registro['eventos']}{onde}): {mensagem}", file=sys.stderr)
+                    continue
+                registro = dict(registro, eventos=eventos)
+            try:
+                nome = nome_arquivo_laudo(_dados_registro(registro), registro.get('versao', 1))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                falhas += 1
+                print(f"❌ Registro {i}: dados incompletos ({e})", file=sys.stderr)
+                continue
+            # Mesmo contratante e data em vários imóveis: não sobrescrever
+            base, ext = os.path.splitext(nome)
+            n = 2
+            while nome in usados:
+                nome = f"{base}_{n}{ext}"
+                n += 1
+            usados.add(nome)
+            futuros[pool.submit(_gerar_registro, registro, os.path.join(destino, nome))] = i
+        for futuro in as_completed(futuros):
+            try:
+                caminho, segundos = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"❌ Registro {futuros[futuro]}: {e}", file=sys.stderr)
+            else:
+                gerados += 1
+                print(f"✅ {os.path.basename(caminho)} ({segundos:.2f} s)")
+                if pdf:
+                    with open(caminho, 'rb') as f:
+                        conversoes[caminho] = pool_padrao().enviar(f.read())
+
+    for caminho, futuro in conversoes.items():
+        caminho_pdf = os.path.splitext(caminho)[0] + '.pdf'
+        try:
+            conteudo = futuro.result()
+        except Exception as e:
+            falhas += 1
+            print(f"❌ {os.path.basename(caminho_pdf)}: {e}", file=sys.stderr)
+            continue
+        with open(caminho_pdf, 'wb') as f:
+            f.write(conteudo)
+        print(f"📄 {os.path.basename(caminho_pdf)}")
+
+    total = time.perf_counter() - inicio
+    taxa = gerados / total if total else 0.0
+    print(f"📊 {gerados} laudos em {total:.2f} s ({taxa:.1f} laudos/s), {falhas} falhas")
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera laudos de inspeção predial em lote")
+    parser.add_argument('origem', help="Diretório com arquivos .json ou arquivo JSON-lines")
+    parser.add_argument('-o', '--saida', default='laudos', help="Diretório de saída (padrão: laudos)")
+    parser.add_argument('-j', '--processos', type=int, default=None,
+                        help="Número de processos (padrão: número de núcleos)")
+    parser.add_argument('--pdf', action='store_true', help="Gerar também o PDF de cada laudo")
+    args = parser.parse_args(argv)
+    return 1 if gerar_lote(args.origem, args.saida, args.processos, args.pdf) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""Redação assistida por IA (Groq) do laudo técnico e das descrições dos eventos.
+
+As chamadas são feitas com o cliente assíncrono do ``groq``: as descrições de
+vários eventos saem em paralelo, limitadas a ``LIMITE_CONCORRENCIA``
+requisições simultâneas. Cada resposta fica em cache em disco pelo hash do
+prompt (modelo, mensagens e temperatura), então pedir de novo o mesmo texto
+não chama a API.
+
+Configuração por ambiente: ``GROQ_API_KEY``, ``LAUDOS_IA_MODELO`` e
+``GROQ_BASE_URL``. Para testes sem a API, suba o servidor de respostas fixas
+e aponte ``GROQ_BASE_URL`` para ele:
+
+    python ia.py --stub 8089
+    GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=teste streamlit run app.py
+"""
+from collections import Counter
+import hashlib
+import json
+import os
+import threading
+import time
+
+from armazem import ArmazemDisco
+from config import DIRETORIO_DADOS
+
+MODELO_IA = os.environ.get('LAUDOS_IA_MODELO', 'llama-3.3-70b-versatile')
+TEMPERATURA = 0.3
+LIMITE_CONCORRENCIA = 8
+TIMEOUT_IA = 60.0
+
+LIMITE_CACHE_IA_BYTES = 64 * 1024 * 1024
+
+# Eventos listados um a um no prompt da conclusão; o restante entra só nos totais
+MAX_EVENTOS_PROMPT = 40
+
+_SISTEMA = (
+    "Você é um engenheiro civil que redige laudos de inspeção predial conforme a "
+    "ABNT NBR 16747:2020. Escreva em português do Brasil, em linguagem técnica, "
+    "impessoal e objetiva, sem títulos, listas ou markdown."
+)
+
+
+def prompt_evento(evento):
+    """Mensagens para descrever um evento em um parágrafo"""
+    campos = [
+        f"Evento: {evento.get('nome', '')}",
+        f"Localização: {evento.get('localizacao', '')}",
+        f"Anomalias: {', '.join(evento.get('anomalias', []))}",
+        f"Provável causa: {evento.get('causa', '')}",
+        f"Consequências: {', '.join(evento.get('consequencias', []))}",
+        f"Patamar de urgência: {evento.get('prioridade', '')}",
+        f"Uso: {evento.get('uso', '')}",
+        f"Recomendações: {', '.join(evento.get('recomendacoes', []))}",
+    ]
+    return [
+        {'role': 'system', 'content': _SISTEMA},
+        {'role': 'user', 'content': "Descreva em um parágrafo curto a manifestação patológica "
+                                    "observada neste evento:\n" + '\n'.join(campos)},
+    ]
+
+
+def prompt_conclusao(dados, eventos):
+    """Mensagens para redigir o texto do LAUDO TÉCNICO (conclusão)"""
+    anomalias = Counter(a for e in eventos for a in e.get('anomalias', []))
+    prioridades = Counter(e.get('prioridade', '') for e in eventos)
+    linhas = [
+        f"Contratante: {dados.get('contratante', '')}",
+        f"Endereço: {dados.get('endereco', '')}",
+        f"Período de vistoria: {dados.get('dias_vistoria', '')}",
+        f"Tipo de empreendimento: {dados.get('tipo_empreendimento', '')}",
+        f"Documentações disponibilizadas: {', '.join(dados.get('docs_disponibilizadas', [])) or 'nenhuma'}",
+        f"Anamnese: {dados.get('anamnese', '')}",
+        f"Total de eventos: {len(eventos)}",
+        "Eventos por prioridade: " + ', '.join(f"{p}: {n}" for p, n in sorted(prioridades.items())),
+        "Anomalias mais frequentes: " + ', '.join(f"{a} ({n})" for a, n in anomalias.most_common(10)),
+    ]
+    for evento in eventos[:MAX_EVENTOS_PROMPT]:
+        linhas.append(f"- EVENTO {evento['numero']:02d}: {evento.get('nome', '')} "
+                      f"({', '.join(evento.get('anomalias', []))}; {evento.get('prioridade', '')})")
+    if len(eventos) > MAX_EVENTOS_PROMPT:
+        linhas.append(f"- ... e mais {len(eventos) - MAX_EVENTOS_PROMPT} eventos")
+    return [
+        {'role': 'system', 'content': _SISTEMA},
+        {'role': 'user', 'content': "Redija a conclusão do laudo técnico (4 a 5 parágrafos: "
+                                    "contexto da vistoria, quadro patológico, principais falhas, "
+                                    "fatores agravantes e recomendações) a partir destes dados:\n"
+                                    + '\n'.join(linhas)},
+    ]
+
+
+def chave_prompt(mensagens, modelo=MODELO_IA, temperatura=TEMPERATURA):
+    """Hash do prompt completo, usado como chave do cache"""
+    conteudo = json.dumps([modelo, temperatura, mensagens], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+_cache = None
+
+
+def cache_padrao():
+    """Cache das respostas em ``DIRETORIO_DADOS/ia``"""
+    global _cache
+    if _cache is None:
+        _cache = ArmazemDisco(os.path.join(DIRETORIO_DADOS, 'ia'), LIMITE_CACHE_IA_BYTES)
+    return _cache
+
+
+def _cliente(assincrono=True):
+    try:
+        from groq import AsyncGroq, Groq
+    except ImportError:
+        raise RuntimeError("Pacote groq não instalado (pip install groq)") from None
+    if not os.environ.get('GROQ_API_KEY'):
+        raise RuntimeError("Defina GROQ_API_KEY para usar a geração com IA")
+    return (AsyncGroq if assincrono else Groq)(timeout=TIMEOUT_IA)
+
+
+async def _completar(cliente, mensagens, semaforo, cache, modelo):
+    async with semaforo:
+        resposta = await cliente.chat.completions.create(
+            model=modelo, messages=mensagens, temperature=TEMPERATURA
+        )
+    texto = resposta.choices[0].message.content.strip()
+    cache.gravar(chave_prompt(mensagens, modelo), texto.encode('utf-8'))
+    return texto
+
+
+async def _completar_pendentes(lista_mensagens, limite, cache, modelo):
+    import asyncio
+
+    semaforo = asyncio.Semaphore(limite)
+    async with _cliente() as cliente:
+        return await asyncio.gather(
+            *(_completar(cliente, m, semaforo, cache, modelo) for m in lista_mensagens)
+        )
+
+
+def completar(lista_mensagens, limite=LIMITE_CONCORRENCIA, cache=None, modelo=MODELO_IA):
+    """Respostas para vários prompts, em paralelo e com cache; mesma ordem da entrada"""
+    import asyncio
+
+    cache = cache or cache_padrao()
+    textos = [cache.ler(chave_prompt(m, modelo)) for m in lista_mensagens]
+    textos = [t.decode('utf-8') if t is not None else None for t in textos]
+    pendentes = [i for i, texto in enumerate(textos) if texto is None]
+    # Só cria o cliente (e exige a chave da API) se algum prompt não estiver em cache
+    if pendentes:
+        respostas = asyncio.run(_completar_pendentes(
+            [lista_mensagens[i] for i in pendentes], limite, cache, modelo
+        ))
+        for i, texto in zip(pendentes, respostas):
+            textos[i] = texto
+    return textos
+
+
+def transmitir(mensagens, cache=None, modelo=MODELO_IA):
+    """Gera a resposta em pedaços, à medida que chegam da API.
+
+    Se o consumidor parar antes do fim (``close()`` do gerador), a conexão é
+    encerrada e a resposta incompleta não vai para o cache. Respostas já em
+    cache saem num único pedaço.
+    """
+    cache = cache or cache_padrao()
+    chave = chave_prompt(mensagens, modelo)
+    texto = cache.ler(chave)
+    if texto is not None:
+        yield texto.decode('utf-8')
+        return
+
+    partes = []
+    with _cliente(assincrono=False) as cliente, cliente.chat.completions.create(
+        model=modelo, messages=mensagens, temperature=TEMPERATURA, stream=True
+    ) as resposta:
+        for pedaco in resposta:
+            parte = pedaco.choices[0].delta.content if pedaco.choices else None
+            if parte:
+                partes.append(parte)
+                yield parte
+    cache.gravar(chave, ''.join(partes).strip().encode('utf-8'))
+
+
+def redigir_conclusao(dados, eventos, cache=None):
+    """Texto do LAUDO TÉCNICO redigido pela IA"""
+    return completar([prompt_conclusao(dados, eventos)], cache=cache)[0]
+
+
+def transmitir_conclusao(dados, eventos, cache=None):
+    """``redigir_conclusao`` em pedaços, para exibir o texto enquanto é gerado"""
+    return transmitir(prompt_conclusao(dados, eventos), cache)
+
+
+def redigir_eventos(eventos, limite=LIMITE_CONCORRENCIA, cache=None):
+    """Descrição de cada evento, na ordem de ``eventos``"""
+    return completar([prompt_evento(e) for e in eventos], limite, cache)
+
+
+# Servidor de respostas fixas, compatível com a rota de chat do Groq, para testes
+
+
+def servidor_stub(porta=0, endereco='127.0.0.1', latencia=0.0, latencia_pedaco=0.0):
+    """Sobe o servidor de testes numa thread; devolve ``(servidor, base_url)``.
+
+    ``latencia`` (s) simula o tempo até a primeira resposta de cada requisição
+    e ``latencia_pedaco`` o intervalo entre os pedaços de uma resposta em fluxo.
+    ``servidor.requisicoes`` conta as requisições recebidas e
+    ``servidor.maximo_simultaneas`` guarda quantas chegaram a estar em curso
+    ao mesmo tempo.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+    em_curso = 0
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/openai/v1/chat/completions':
+                self.send_error(404)
+                return
+            nonlocal em_curso
+            with lock:
+                em_curso += 1
+                servidor.requisicoes += 1
+                servidor.maximo_simultaneas = max(servidor.maximo_simultaneas, em_curso)
+            try:
+                self._responder(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            finally:
+                with lock:
+                    em_curso -= 1
+
+        def _responder(self, pedido):
+            prompt = pedido['messages'][-1]['content']
+            time.sleep(latencia)
+            texto = (f"Texto gerado para teste ({hashlib.sha256(prompt.encode()).hexdigest()[:8]}): "
+                     "a edificação apresenta anomalias compatíveis com o desgaste natural dos materiais.")
+            if pedido.get('stream'):
+                self._transmitir(pedido, texto)
+                return
+            corpo = json.dumps({
+                'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': pedido['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': texto}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def _transmitir(self, pedido, texto):
+            """Resposta em eventos SSE, uma palavra por pedaço"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for palavra in texto.split(' '):
+                pedaco = {
+                    'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0,
+                    'model': pedido['model'],
+                    'choices': [{'index': 0, 'finish_reason': None,
+                                 'delta': {'role': 'assistant', 'content': palavra + ' '}}],
+                }
+                try:
+                    self.wfile.write(f"data: {json.dumps(pedaco)}\n\n".encode('utf-8'))
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                time.sleep(latencia_pedaco)
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((endereco, porta), Manipulador)
+    servidor.requisicoes = servidor.maximo_simultaneas = 0
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='ia-stub').start()
+    return servidor, f"http://{endereco}:{servidor.server_address[1]}"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor de testes da redação com IA")
+    parser.add_argument('--stub', type=int, metavar='PORTA', required=True)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Atraso de cada resposta (s)")
+    parser.add_argument('--latencia-pedaco', type=float, default=0.0,
+                        help="Intervalo entre pedaços das respostas em fluxo (s)")
+    args = parser.parse_args()
+    servidor, url = servidor_stub(args.stub, latencia=args.latencia,
+                                  latencia_pedaco=args.latencia_pedaco)
+    print(f"Servidor de testes em {url} (GROQ_BASE_URL={url})")
+    threading.Event().wait()
@@ -0,0 +1,139 @@
+"""Preparação das fotos dos eventos para o laudo.
+
+Fotos de celular (8–12 MB) são orientadas pelo EXIF, reduzidas para a
+largura de impressão no DPI desejado e recomprimidas em JPEG. O trabalho é
+feito num pool de threads (o Pillow libera o GIL na decodificação e no
+redimensionamento) e o resultado fica em cache pelo hash do conteúdo, de
+modo que gerar o laudo de novo não reprocessa as mesmas fotos.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import os
+import threading
+
+# Resolução de impressão e qualidade JPEG das fotos no laudo
+DPI_IMAGENS = 200
+QUALIDADE_JPEG = 85
+
+# Largura útil da página (pol) repartida entre as fotos de um evento
+LARGURA_UTIL_POL = 5.8
+MAX_IMAGENS_EVENTO = 3
+
+# Limite do cache em memória das fotos já processadas
+LIMITE_CACHE_BYTES = 256 * 1024 * 1024
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def largura_imagem_pol(quantidade):
+    """Largura (pol) de cada foto quando ``quantidade`` fotos dividem a linha"""
+    return LARGURA_UTIL_POL / max(min(quantidade, MAX_IMAGENS_EVENTO), 2)
+
+
+def conteudo_imagem(imagem):
+    """Bytes de uma imagem vinda do depósito, do upload, de um caminho ou já em bytes"""
+    if isinstance(imagem, dict):
+        from deposito_imagens import deposito_padrao
+        return deposito_padrao().ler(imagem)
+    if isinstance(imagem, (bytes, bytearray)):
+        return bytes(imagem)
+    if isinstance(imagem, (str, os.PathLike)):
+        with open(imagem, 'rb') as f:
+            return f.read()
+    if hasattr(imagem, 'getvalue'):
+        return imagem.getvalue()
+    return imagem.read()
+
+
+def _ler_cache(chave):
+    with _cache_lock:
+        jpeg = _cache.get(chave)
+        if jpeg is not None:
+            _cache.move_to_end(chave)
+        return jpeg
+
+
+def _gravar_cache(chave, jpeg):
+    global _cache_bytes
+    with _cache_lock:
+        if chave in _cache:
+            return
+        _cache[chave] = jpeg
+        _cache_bytes += len(jpeg)
+        while _cache_bytes > LIMITE_CACHE_BYTES and len(_cache) > 1:
+            _, antigo = _cache.popitem(last=False)
+            _cache_bytes -= len(antigo)
+
+
+def limpar_cache():
+    """Esvazia o cache de fotos processadas"""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def preparar_imagem(conteudo, largura_pol, dpi=DPI_IMAGENS, qualidade=QUALIDADE_JPEG):
+    """Orienta, reduz e recomprime uma foto; devolve os bytes do JPEG"""
+    largura_px = round(largura_pol * dpi)
+    chave = (hashlib.sha256(conteudo).hexdigest(), largura_px, dpi, qualidade)
+    jpeg = _ler_cache(chave)
+    if jpeg is not None:
+        return jpeg
+
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(conteudo)) as img:
+        # Decodificação JPEG já em escala reduzida, antes de girar pelo EXIF
+        img.draft('RGB', (largura_px, largura_px))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            fundo = Image.new('RGB', img.size, (255, 255, 255))
+            fundo.paste(img, mask=img.getchannel('A'))
+            img = fundo
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.width > largura_px:
+            altura_px = max(1, round(img.height * largura_px / img.width))
+            img = img.resize((largura_px, altura_px), Image.LANCZOS)
+        saida = io.BytesIO()
+        img.save(saida, 'JPEG', quality=qualidade, optimize=True, dpi=(dpi, dpi))
+
+    jpeg = saida.getvalue()
+    _gravar_cache(chave, jpeg)
+    return jpeg
+
+
+def preparar_imagens_eventos(eventos, dpi=DPI_IMAGENS, max_threads=None, progresso=None):
+    """Processa as fotos de todos os eventos em paralelo.
+
+    Devolve uma lista paralela a ``eventos`` com, para cada evento, a lista de
+    ``(jpeg, largura_pol)`` das até ``MAX_IMAGENS_EVENTO`` fotos.
+    ``progresso(feitas, total)`` é chamado a cada foto concluída.
+    """
+    tarefas = []
+    for i, evento in enumerate(eventos):
+        imagens = (evento.get('imagens') or [])[:MAX_IMAGENS_EVENTO]
+        largura_pol = largura_imagem_pol(len(imagens))
+        for imagem in imagens:
+            tarefas.append((i, imagem, largura_pol))
+
+    resultado = [[] for _ in eventos]
+    if not tarefas:
+        return resultado
+
+    def processar(tarefa):
+        i, imagem, largura_pol = tarefa
+        return i, preparar_imagem(conteudo_imagem(imagem), largura_pol, dpi), largura_pol
+
+    with ThreadPoolExecutor(max_workers=max_threads) as pool:
+        for feitas, (i, jpeg, largura_pol) in enumerate(pool.map(processar, tarefas), start=1):
+            resultado[i].append((jpeg, largura_pol))
+            if progresso:
+                progresso(feitas, len(tarefas))
+    return resultado
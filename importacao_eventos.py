@@ -0,0 +1,255 @@
+"""Importação em lote de eventos a partir das exportações feitas em campo.
+
+Aceita CSV (separado por vírgula, ponto e vírgula ou tabulação), XLSX
+(primeira planilha, cabeçalho na primeira linha) e JSON-lines. As linhas são
+lidas em fluxo e cada coluna é associada a um campo do evento pelo nome do
+cabeçalho, sem diferenciar maiúsculas nem acentos ("Anomalia", "anomalias",
+"ANOMALIAS"...). Os valores são conferidos com ``OPCOES``, ``PRIORIDADES`` e
+``USOS`` numa única passada, e todos os problemas do arquivo voltam juntos,
+com a linha e a coluna de cada um.
+
+Nas listas (anomalias, consequências e recomendações) os itens podem vir
+separados por ``;``, ``|`` ou quebra de linha, ou por vírgula como no texto do
+laudo.
+
+Uso:
+    python importacao_eventos.py campo.xlsx
+"""
+import csv
+import codecs
+import io
+import json
+import os
+import re
+import sys
+import unicodedata
+
+from gerador import OPCOES, PRIORIDADES, USOS
+from importador import separar_lista
+
+# Nomes de coluna aceitos para cada campo (comparados já normalizados)
+_COLUNAS = {
+    'nome': ('nome', 'evento', 'nome do evento', 'titulo'),
+    'descricao': ('descricao',),
+    'localizacao': ('localizacao', 'local'),
+    'anomalias': ('anomalias', 'anomalia'),
+    'causa': ('causa', 'provavel causa'),
+    'consequencias': ('consequencias', 'consequencia', 'consequencia da anomalia'),
+    'prioridade': ('prioridade', 'patamar de urgencia', 'urgencia'),
+    'uso': ('uso',),
+    'recomendacoes': ('recomendacoes', 'recomendacao', 'recomendacao tecnica'),
+}
+
+_CAMPOS_TEXTO = ('nome', 'descricao', 'localizacao')
+_CAMPOS_LISTA = ('anomalias', 'consequencias', 'recomendacoes')
+
+# Valores de quem não preencheu a coluna: os mesmos do "➕ Adicionar Evento"
+VALORES_PADRAO = {
+    'localizacao': 'Generalidades',
+    'causa': 'Funcional',
+    'prioridade': 'Prioridade 2',
+    'uso': 'Regular',
+}
+
+_SEPARADORES_LISTA = re.compile(r'\s*[;|\n]\s*')
+
+EXTENSOES = ('.csv', '.xlsx', '.jsonl', '.json')
+
+
+def _normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples"""
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().replace('_', ' ').split())
+
+
+_CAMPO_DA_COLUNA = {nome: campo for campo, nomes in _COLUNAS.items() for nome in nomes}
+
+_valores_validos = {}
+
+
+def _valores(campo):
+    """Valor normalizado -> valor canônico aceito em ``campo``"""
+    if campo not in _valores_validos:
+        opcoes = {'causa': OPCOES['causas'], 'prioridade': PRIORIDADES, 'uso': USOS}.get(campo)
+        tabela = {_normalizar(opcao): opcao for opcao in opcoes or OPCOES[campo]}
+        if campo == 'prioridade':
+            # "1", "P1" e "Prioridade 1" são a mesma prioridade
+            for prioridade in PRIORIDADES:
+                numero = prioridade.split()[-1]
+                tabela[numero] = tabela[f"p{numero}"] = prioridade
+        _valores_validos[campo] = tabela
+    return _valores_validos[campo]
+
+
+# Leitores: cada um devolve ``(linha, registro)``, com a linha como o usuário a vê
+# no arquivo (a do cabeçalho é a 1 nas planilhas)
+
+
+def _codificacao(arquivo):
+    """UTF-8 se o começo do arquivo for UTF-8 válido; senão cp1252 (CSV do Excel no Windows)"""
+    inicio = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8-sig')().decode(inicio, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding=_codificacao(arquivo), newline='')
+    try:
+        amostra = texto.read(64 * 1024)
+        texto.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        yield from enumerate(csv.DictReader(texto, dialect=dialeto), start=2)
+    finally:
+        texto.detach()
+
+
+def _linhas_xlsx(arquivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Pacote openpyxl não instalado (pip install openpyxl)") from None
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = ['' if c is None else str(c) for c in next(linhas, ())]
+        for numero, valores in enumerate(linhas, start=2):
+            yield numero, dict(zip(cabecalho, valores))
+    finally:
+        livro.close()
+
+
+def _linhas_json(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig')
+    try:
+        inicio = texto.read(1024).lstrip()
+        texto.seek(0)
+        if inicio.startswith('['):
+            # Arquivo .json com uma lista de eventos: lido inteiro
+            yield from enumerate(json.load(texto), start=1)
+            return
+        for numero, linha in enumerate(texto, start=1):
+            if linha.strip():
+                try:
+                    yield numero, json.loads(linha)
+                except ValueError as e:
+                    yield numero, ValueError(f"JSON inválido ({e.msg})")
+    finally:
+        texto.detach()
+
+
+_LEITORES = {'.csv': _linhas_csv, '.xlsx': _linhas_xlsx, '.jsonl': _linhas_json, '.json': _linhas_json}
+
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _texto(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _opcao(campo, valor, coluna, linha, erros):
+    """Valor canônico de ``valor`` em ``campo``, ou ``None`` (com o erro anotado)"""
+    tabela = _valores(campo)
+    canonico = tabela.get(_normalizar(valor))
+    if canonico is None:
+        from difflib import get_close_matches
+
+        mensagem = f"'{valor}' não é uma opção válida"
+        parecidas = get_close_matches(_normalizar(valor), tabela, n=1)
+        if parecidas:
+            mensagem += f" (seria '{tabela[parecidas[0]]}'?)"
+        erros.append((linha, coluna, mensagem))
+    return canonico
+
+
+def _evento(registro, linha, erros):
+    """Evento validado de um registro, ou ``None`` se houver erros na linha"""
+    evento = dict(VALORES_PADRAO, nome='', anomalias=[], consequencias=[], recomendacoes=[],
+                  imagens=[])
+    erros_antes = len(erros)
+    for coluna, valor in registro.items():
+        campo = _CAMPO_DA_COLUNA.get(_normalizar(coluna or ''))
+        if campo is None or _vazio(valor):
+            continue
+        if campo in _CAMPOS_TEXTO:
+            evento[campo] = _texto(valor)
+        elif campo in _CAMPOS_LISTA:
+            if isinstance(valor, list):
+                itens = [_texto(item) for item in valor if not _vazio(item)]
+            elif _SEPARADORES_LISTA.search(_texto(valor)):
+                itens = [item for item in _SEPARADORES_LISTA.split(_texto(valor)) if item]
+            else:
+                itens = separar_lista(_texto(valor), campo)
+            opcoes = [_opcao(campo, item, coluna, linha, erros) for item in itens]
+            evento[campo] = list(dict.fromkeys(o for o in opcoes if o is not None))
+        else:
+            evento[campo] = _opcao(campo, _texto(valor), coluna, linha, erros)
+    if not evento['nome']:
+        erros.append((linha, 'nome', "nome do evento vazio"))
+    return evento if len(erros) == erros_antes else None
+
+
+def importar_eventos(arquivo, nome_arquivo=None):
+    """Lê e valida os eventos de ``arquivo`` (caminho ou arquivo binário aberto).
+
+    Devolve ``(eventos, erros)``, com os eventos válidos numerados a partir de 1
+    e ``erros`` como ``[(linha, coluna, mensagem)]`` de todo o arquivo.
+    """
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            return importar_eventos(f, nome_arquivo or os.fspath(arquivo))
+
+    extensao = os.path.splitext(nome_arquivo or getattr(arquivo, 'name', ''))[1].lower()
+    if extensao not in _LEITORES:
+        raise ValueError(f"Formato não suportado: use {', '.join(EXTENSOES)}")
+
+    eventos = []
+    erros = []
+    colunas_conferidas = False
+    for linha, registro in _LEITORES[extensao](arquivo):
+        if isinstance(registro, ValueError):
+            erros.append((linha, '', str(registro)))
+            continue
+        if not isinstance(registro, dict):
+            erros.append((linha, '', "esperado um objeto com os campos do evento"))
+            continue
+        if all(_vazio(valor) for valor in registro.values()):
+            continue
+        if not colunas_conferidas:
+            colunas_conferidas = True
+            if 'nome' not in {_CAMPO_DA_COLUNA.get(_normalizar(c or '')) for c in registro}:
+                erros.append((linha, '', "nenhuma coluna com o nome do evento; colunas encontradas: "
+                                         + ', '.join(str(c) for c in registro)))
+                break
+        evento = _evento(registro, linha, erros)
+        if evento is not None:
+            evento['numero'] = len(eventos) + 1
+            eventos.append(evento)
+    return eventos, erros
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Uso: python importacao_eventos.py ARQUIVO", file=sys.stderr)
+        return 2
+    eventos, erros = importar_eventos(argv[0])
+    for linha, coluna, mensagem in erros:
+        print(f"❌ Linha {linha}" + (f", {coluna}" if coluna else "") + f": {mensagem}", file=sys.stderr)
+    print(f"{len(eventos)} eventos válidos, {len(erros)} erros")
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Importação de laudos .docx gerados por este sistema, para edição.
+
+Lê só o ``word/document.xml`` do pacote, em fluxo (``xml.etree.ElementTree.iterparse``),
+descartando cada parágrafo depois de lido: as fotos em ``word/media`` nunca
+são abertas e a memória não cresce com o tamanho do laudo. O texto é
+interpretado seção a seção, na ordem em que ``gerador`` as escreve, e devolve
+``dados_laudo`` (capa, objetivo, breve relato, descrição, documentações,
+anamnese e laudo técnico) e os eventos ("EVENTO NN: ...") sem as fotos.
+
+Campos que o documento não registra (cidade-estado, por exemplo) ficam de fora.
+
+Uso:
+    python importador.py laudo.docx                # JSON na saída padrão
+    python importador.py arquivo/ --salvar          # grava os laudos no banco
+"""
+from datetime import datetime
+import argparse
+import os
+import re
+import sys
+import time
+import zipfile
+
+from gerador import OPCOES, TEXTO_LAUDO_PADRAO
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Títulos (estilos Heading) de cada seção do laudo
+_SECOES = {
+    'Sumário': 'sumario',
+    'RESSALVAS INICIAIS': 'ressalvas',
+    'OBJETIVO': 'objetivo',
+    'BREVE RELATO': 'relato',
+    'DESCRIÇÃO DO OBJETO INSPECIONADO': 'descricao',
+    'DOCUMENTAÇÕES SOLICITADAS E DOCUMENTAÇÕES DISPONIBILIZADAS:': 'documentacoes',
+    'ANAMNESE': 'anamnese',
+    'Resumo de Eventos por Prioridade': 'resumo',
+    'LAUDO TÉCNICO': 'laudo_tecnico',
+    'DATA DO RELATÓRIO TÉCNICO': 'data',
+}
+
+_CAPA = {"Contratante: ": 'contratante', "CNPJ: ": 'cnpj', "Data: ": 'data_laudo'}
+
+# Rótulo do parágrafo -> (campo do evento, opções da lista, ou None para texto)
+_CAMPOS_EVENTO = {
+    "Descrição: ": ('descricao', None),
+    "Localização: ": ('localizacao', None),
+    "Anomalia: ": ('anomalias', 'anomalias'),
+    "Provável causa: ": ('causa', None),
+    "Consequência da anomalia: ": ('consequencias', 'consequencias'),
+    "Patamar de urgência: ": ('prioridade', None),
+    "Uso: ": ('uso', None),
+    "Recomendação técnica: ": ('recomendacoes', 'recomendacoes'),
+}
+
+_TITULO_EVENTO = re.compile(r'EVENTO (\d+): (.*)', re.DOTALL)
+_TEXTO_PADRAO = re.compile('(.*)'.join(map(re.escape, TEXTO_LAUDO_PADRAO.split('{}'))), re.DOTALL)
+
+_PREFIXO_ART = ", com registro da ART nº"
+_SUFIXO_ART = " do presente documento."
+_PREFIXO_RELATO = "Entre os dias "
+_SUFIXO_RELATO = " foram realizadas vistorias pela empresa "
+_PREFIXO_TIPO = "Trata-se de um empreendimento do tipo "
+
+
+_opcoes_listas = {}
+
+
+def separar_lista(texto, campo):
+    """Desfaz o ``", ".join`` de uma lista de ``OPCOES[campo]``, sem partir opções que têm vírgula"""
+    if campo not in _opcoes_listas:
+        _opcoes_listas[campo] = (sorted(OPCOES[campo], key=len, reverse=True), set(OPCOES[campo]))
+    opcoes, conhecidas = _opcoes_listas[campo]
+    itens = texto.split(', ') if texto else []
+    if all(item in conhecidas for item in itens):
+        return itens
+    itens = []
+    inicio = 0
+    while inicio < len(texto):
+        for opcao in opcoes:
+            fim = inicio + len(opcao)
+            if texto.startswith(opcao, inicio) and (fim == len(texto) or texto.startswith(', ', fim)):
+                break
+        else:
+            fim = texto.find(', ', inicio)
+            if fim < 0:
+                fim = len(texto)
+        itens.append(texto[inicio:fim])
+        inicio = fim + 2
+    return itens
+
+
+class _Leitor:
+    """Interpreta os parágrafos do corpo, em ordem, seção a seção"""
+
+    def __init__(self):
+        self.dados = {}
+        self.eventos = []
+        self.secao = 'capa'
+        self.indice = 0  # parágrafo dentro da seção atual
+        self.endereco_capa = False
+        self.relato = []
+
+    def paragrafo(self, estilo, runs):
+        texto = ''.join(t for t, _ in runs)
+        if estilo.startswith('Heading') and texto in _SECOES:
+            self.secao = _SECOES[texto]
+            self.indice = 0
+            return
+        getattr(self, f'_{self.secao}', self._ignorar)(estilo, runs, texto)
+        self.indice += 1
+
+    def _ignorar(self, estilo, runs, texto):
+        pass
+
+    def _capa(self, estilo, runs, texto):
+        if self.endereco_capa:
+            self.dados['endereco'] = texto
+            self.endereco_capa = False
+        elif texto == "Imóvel motivo:":
+            self.endereco_capa = True
+        elif runs and runs[0][0] in _CAPA:
+            campo = _CAPA[runs[0][0]]
+            valor = texto[len(runs[0][0]):]
+            if campo != 'data_laudo':
+                self.dados[campo] = valor
+            elif valor:
+                self.dados[campo] = datetime.strptime(valor, '%d/%m/%Y').date()
+
+    def _objetivo(self, estilo, runs, texto):
+        if self.indice == 0 and runs:
+            ultimo = runs[-1][0]
+            if ultimo.startswith(_PREFIXO_ART) and ultimo.endswith(_SUFIXO_ART):
+                self.dados['art_numero'] = ultimo[len(_PREFIXO_ART):-len(_SUFIXO_ART)]
+
+    def _relato(self, estilo, runs, texto):
+        if self.indice == 0 and len(runs) == 7:
+            # Entre os dias {dias} ... empresa {contratada} a pedido do {contratante}
+            # no imóvel localizado {endereco}, no qual afirma:
+            dias = runs[0][0]
+            if dias.startswith(_PREFIXO_RELATO) and dias.endswith(_SUFIXO_RELATO):
+                self.dados['dias_vistoria'] = dias[len(_PREFIXO_RELATO):-len(_SUFIXO_RELATO)]
+            self.dados['contratada'] = runs[1][0]
+        elif estilo == 'ListNumber':
+            self.relato.append(texto)
+            self.dados['breve_relato'] = '\n'.join(self.relato)
+
+    def _descricao(self, estilo, runs, texto):
+        if self.indice == 0 and len(runs) == 3 and runs[0][0].startswith(_PREFIXO_TIPO):
+            self.dados['tipo_empreendimento'] = runs[0][0][len(_PREFIXO_TIPO):].removesuffix(', ')
+            self.dados['info_localizacao'] = runs[1][0]
+            self.dados['ocupado'] = 'Não' if 'desocupado' in runs[2][0] else 'Sim'
+
+    def _documentacoes(self, estilo, runs, texto):
+        disponibilizadas = self.dados.setdefault('docs_disponibilizadas', [])
+        if len(runs) == 2 and runs[1][1] and runs[0][0].endswith(' - '):
+            if runs[1][0] == 'DISPONIBILIZADA':
+                disponibilizadas.append(runs[0][0][:-3])
+        elif runs and runs[0] == ("Obs: ", True):
+            self.dados['obs_docs'] = texto[len("Obs: "):]
+
+    def _anamnese(self, estilo, runs, texto):
+        if self.indice == 0:
+            self.dados['anamnese'] = texto
+            return
+        titulo = _TITULO_EVENTO.fullmatch(texto) if runs and runs[0][1] else None
+        if titulo:
+            self.eventos.append({
+                'numero': int(titulo.group(1)),
+                'nome': titulo.group(2),
+                'imagens': [],
+            })
+        elif self.eventos and runs and runs[0][1] and runs[0][0] in _CAMPOS_EVENTO:
+            campo, opcoes = _CAMPOS_EVENTO[runs[0][0]]
+            valor = texto[len(runs[0][0]):]
+            self.eventos[-1][campo] = separar_lista(valor, opcoes) if opcoes else valor
+
+    def _laudo_tecnico(self, estilo, runs, texto):
+        if self.indice != 0:
+            return
+        padrao = _TEXTO_PADRAO.fullmatch(texto)
+        if padrao:
+            # Texto padrão: o laudo não tinha texto próprio. Sem breve relato, é o único
+            # lugar do documento com os dias de vistoria
+            self.dados['texto_laudo'] = ''
+            self.dados.setdefault('dias_vistoria', padrao.group(1))
+        else:
+            self.dados['texto_laudo'] = texto
+
+
+def importar_laudo(arquivo):
+    """Lê um laudo .docx (caminho ou arquivo aberto); devolve ``(dados, eventos)``"""
+    from xml.etree.ElementTree import iterparse
+
+    p, r, t, tab, br, b, estilo_p = (f'{_W}{tag}' for tag in ('p', 'r', 't', 'tab', 'br', 'b', 'pStyle'))
+    val, tipo = f'{_W}val', f'{_W}type'
+
+    leitor = _Leitor()
+    profundidade = 0
+    corpo = None
+    # Parágrafo do corpo em leitura (os das células da tabela de resumo são ignorados)
+    estilo = runs = partes = None
+    negrito = False
+    with zipfile.ZipFile(arquivo) as pacote, pacote.open('word/document.xml') as xml:
+        for evento, elemento in iterparse(xml, events=('start', 'end')):
+            tag = elemento.tag
+            if evento == 'start':
+                profundidade += 1
+                if profundidade == 2:
+                    corpo = elemento
+                elif profundidade == 3 and tag == p:
+                    estilo, runs = '', []
+                elif runs is not None and tag == r:
+                    partes, negrito = [], False
+                continue
+            profundidade -= 1
+            if runs is None:
+                pass
+            elif tag == t:
+                partes.append(elemento.text or '')
+            elif tag == tab:
+                partes.append('\t')
+            elif tag == br:
+                if elemento.get(tipo) is None:
+                    partes.append('\n')
+            elif tag == b:
+                negrito = True
+            elif tag == r:
+                runs.append((''.join(partes), negrito))
+            elif tag == estilo_p:
+                estilo = elemento.get(val, '')
+            if profundidade == 2:
+                # Fim de um filho do corpo: processa e descarta
+                if tag == p:
+                    leitor.paragrafo(estilo, runs)
+                estilo = runs = None
+                corpo.clear()
+
+    campos = ('localizacao', 'causa', 'prioridade', 'uso')
+    for evento in leitor.eventos:
+        for campo in campos:
+            evento.setdefault(campo, '')
+        for campo in ('anomalias', 'consequencias', 'recomendacoes'):
+            evento.setdefault(campo, [])
+    return leitor.dados, leitor.eventos
+
+
+def _arquivos(caminhos):
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, nomes in os.walk(caminho):
+                yield from (os.path.join(raiz, n) for n in sorted(nomes)
+                            if n.endswith('.docx') and not n.startswith('~$'))
+        else:
+            yield caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa laudos .docx gerados pelo sistema")
+    parser.add_argument('caminhos', nargs='+', help="Arquivos .docx ou diretórios")
+    parser.add_argument('--salvar', action='store_true',
+                        help="Gravar no banco de laudos (nome = nome do arquivo)")
+    args = parser.parse_args(argv)
+
+    from banco import banco_padrao, para_json
+
+    falhas = 0
+    for caminho in _arquivos(args.caminhos):
+        inicio = time.perf_counter()
+        try:
+            dados, eventos = importar_laudo(caminho)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            falhas += 1
+            print(f"❌ {caminho}: {e}", file=sys.stderr)
+            continue
+        segundos = time.perf_counter() - inicio
+        if args.salvar:
+            nome = os.path.splitext(os.path.basename(caminho))[0]
+            banco_padrao().salvar(nome, dados, eventos)
+            print(f"✅ {nome}: {len(eventos)} eventos ({segundos * 1000:.0f} ms)")
+        else:
+            print(para_json({'dados_laudo': dados, 'eventos': eventos}))
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
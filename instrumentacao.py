@@ -0,0 +1,83 @@
+"""Medição do tempo gasto em cada seção da geração do laudo.
+
+O gerador marca trechos com ``trecho(nome)``; eles só são cronometrados
+quando há uma ``medicao()`` ativa na thread atual. Sem medição, ``trecho``
+devolve um contexto nulo compartilhado e o custo é o de uma consulta a um
+atributo de thread.
+
+    with medicao('laudo') as m:
+        gerar_bytes(dados, eventos)
+    m.resumo()  # {'capa': 0.01, 'imagens': 1.2, ..., 'salvar': 0.3}
+
+Ao final de cada medição é emitido um log estruturado (JSON) no logger
+``instrumentacao``.
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_NULO = nullcontext()
+
+
+class Medicao:
+    """Trechos cronometrados de uma geração, na ordem em que terminaram"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.trechos = []
+        self.total = 0.0
+
+    def resumo(self):
+        """Segundos por trecho (trechos repetidos são somados)"""
+        tempos = {}
+        for nome, segundos in self.trechos:
+            tempos[nome] = tempos.get(nome, 0.0) + segundos
+        return tempos
+
+
+class _Trecho:
+    __slots__ = ('medicao', 'nome', 'inicio')
+
+    def __init__(self, medicao, nome):
+        self.medicao = medicao
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.medicao.trechos.append((self.nome, time.perf_counter() - self.inicio))
+
+
+def trecho(nome):
+    """Cronometra o bloco ``with`` se houver medição ativa nesta thread"""
+    medicao_atual = getattr(_local, 'medicao', None)
+    if medicao_atual is None:
+        return _NULO
+    return _Trecho(medicao_atual, nome)
+
+
+@contextmanager
+def medicao(nome='laudo', registrar=True):
+    """Ativa a medição dos trechos executados nesta thread dentro do bloco"""
+    anterior = getattr(_local, 'medicao', None)
+    atual = _local.medicao = Medicao(nome)
+    inicio = time.perf_counter()
+    try:
+        yield atual
+    finally:
+        atual.total = time.perf_counter() - inicio
+        _local.medicao = anterior
+        if registrar and atual.trechos:
+            registro = {
+                'evento': 'medicao',
+                'nome': atual.nome,
+                'total_s': round(atual.total, 4),
+                'trechos_s': {k: round(v, 4) for k, v in atual.resumo().items()},
+            }
+            logger.info(json.dumps(registro, ensure_ascii=False), extra={'medicao': registro})
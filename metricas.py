@@ -0,0 +1,230 @@
+"""Métricas de operação do gerador de laudos.
+
+Cada réplica do app mantém em memória histogramas de latência da geração,
+tamanho dos .docx e eventos por laudo, além do uso de fotos por sessão, do
+número de sessões ativas e do tamanho do banco de laudos salvos. A exportação
+é configurada por variáveis de ambiente:
+
+- ``LAUDOS_METRICAS_PORTA``: servidor HTTP local com ``/metrics`` (formato
+  texto do Prometheus) e ``/metrics.json``. Use uma porta por réplica.
+- ``LAUDOS_METRICAS_JSON``: diretório onde cada processo grava
+  ``<host>-<pid>.json`` a cada ``INTERVALO_GRAVACAO`` segundos.
+"""
+from bisect import bisect_left
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Limites superiores dos buckets de cada histograma
+BUCKETS_SEGUNDOS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+BUCKETS_BYTES = tuple(2 ** n * 1024 for n in range(5, 17))  # 32 kB a 64 MB
+BUCKETS_EVENTOS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Sessão sem atividade há mais que isso deixa de contar como ativa
+TEMPO_SESSAO_ATIVA = 30 * 60
+
+INTERVALO_GRAVACAO = 15.0
+
+
+class Histograma:
+    """Histograma cumulativo no modelo do Prometheus"""
+
+    def __init__(self, nome, ajuda, buckets):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(buckets)
+        self.contagens = [0] * (len(self.buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas_prometheus(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        acumulado = 0
+        for limite, contagem in zip(self.buckets, self.contagens):
+            acumulado += contagem
+            linhas.append(f'{self.nome}_bucket{{le="{limite}"}} {acumulado}')
+        linhas.append(f'{self.nome}_bucket{{le="+Inf"}} {self.total}')
+        linhas.append(f"{self.nome}_sum {self.soma:g}")
+        linhas.append(f"{self.nome}_count {self.total}")
+        return linhas
+
+    def para_dict(self):
+        return {
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.contagens)),
+            'soma': self.soma,
+            'total': self.total,
+        }
+
+
+class Metricas:
+    """Registro das métricas de um processo (seguro entre threads)"""
+
+    def __init__(self, banco=None):
+        self.banco = banco
+        self._lock = threading.Lock()
+        self.geracao = Histograma('laudos_geracao_segundos',
+                                  "Tempo de geração de um laudo", BUCKETS_SEGUNDOS)
+        self.tamanho = Histograma('laudos_docx_bytes', "Tamanho do .docx gerado", BUCKETS_BYTES)
+        self.eventos = Histograma('laudos_eventos', "Eventos por laudo gerado", BUCKETS_EVENTOS)
+        self.acertos_cache = 0
+        self.falhas = 0
+        # sessão -> (último acesso, bytes de fotos nos eventos)
+        self._sessoes = {}
+
+    def registrar_geracao(self, segundos, tamanho_bytes, eventos, do_cache=False):
+        """Registra um laudo gerado (ou servido do cache de .docx)"""
+        with self._lock:
+            self.geracao.observar(segundos)
+            self.tamanho.observar(tamanho_bytes)
+            self.eventos.observar(eventos)
+            self.acertos_cache += bool(do_cache)
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+
+    def registrar_sessao(self, sessao, imagens_bytes):
+        """Marca a sessão como ativa com o total de bytes de fotos nos seus eventos"""
+        agora = time.time()
+        with self._lock:
+            self._sessoes[sessao] = (agora, imagens_bytes)
+            for chave, (visto, _) in list(self._sessoes.items()):
+                if agora - visto > TEMPO_SESSAO_ATIVA:
+                    del self._sessoes[chave]
+
+    def _sessoes_ativas(self):
+        limite = time.time() - TEMPO_SESSAO_ATIVA
+        return [imagens for visto, imagens in self._sessoes.values() if visto >= limite]
+
+    def _banco(self):
+        """(laudos salvos, bytes do arquivo do banco), ou ``(None, None)`` sem banco"""
+        if self.banco is None:
+            return None, None
+        try:
+            return self.banco.contar(), os.path.getsize(self.banco.caminho)
+        except (OSError, sqlite3.Error):
+            return None, None
+
+    def para_dict(self):
+        laudos, banco_bytes = self._banco()
+        with self._lock:
+            imagens = self._sessoes_ativas()
+            return {
+                'geracao_segundos': self.geracao.para_dict(),
+                'docx_bytes': self.tamanho.para_dict(),
+                'eventos_por_laudo': self.eventos.para_dict(),
+                'cache_docx_acertos': self.acertos_cache,
+                'falhas_geracao': self.falhas,
+                'sessoes_ativas': len(imagens),
+                'imagens_bytes_sessoes': sum(imagens),
+                'imagens_bytes_sessao_max': max(imagens, default=0),
+                'laudos_salvos': laudos,
+                'banco_bytes': banco_bytes,
+            }
+
+    def texto_prometheus(self):
+        laudos, banco_bytes = self._banco()
+        with self._lock:
+            imagens = self._sessoes_ativas()
+            linhas = []
+            for histograma in (self.geracao, self.tamanho, self.eventos):
+                linhas += histograma.linhas_prometheus()
+            valores = [
+                ('laudos_cache_docx_acertos_total', 'counter',
+                 "Laudos servidos do cache de .docx", self.acertos_cache),
+                ('laudos_falhas_geracao_total', 'counter', "Gerações que falharam", self.falhas),
+                ('laudos_sessoes_ativas', 'gauge', "Sessões com atividade recente", len(imagens)),
+                ('laudos_imagens_sessoes_bytes', 'gauge',
+                 "Bytes de fotos nos eventos das sessões ativas", sum(imagens)),
+                ('laudos_imagens_sessao_max_bytes', 'gauge',
+                 "Maior total de fotos de uma sessão ativa", max(imagens, default=0)),
+                ('laudos_salvos', 'gauge', "Laudos no banco", laudos),
+                ('laudos_banco_bytes', 'gauge', "Tamanho do arquivo do banco", banco_bytes),
+            ]
+        for nome, tipo, ajuda, valor in valores:
+            if valor is not None:
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}", f"{nome} {valor}"]
+        return '\n'.join(linhas) + '\n'
+
+
+def imagens_bytes(eventos):
+    """Bytes das fotos (referências do depósito) de uma lista de eventos"""
+    return sum(imagem.get('tamanho', 0)
+               for evento in eventos
+               for imagem in evento.get('imagens') or []
+               if isinstance(imagem, dict))
+
+
+def iniciar_servidor(metricas, porta, endereco='127.0.0.1'):
+    """Serve ``/metrics`` e ``/metrics.json`` numa thread de fundo"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                corpo, tipo = metricas.texto_prometheus(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                corpo, tipo = json.dumps(metricas.para_dict()), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            corpo = corpo.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((endereco, porta), Manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name='metricas-http').start()
+    return servidor
+
+
+def iniciar_gravacao_json(metricas, diretorio, intervalo=INTERVALO_GRAVACAO):
+    """Grava periodicamente as métricas em ``diretorio/<host>-<pid>.json``"""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{socket.gethostname()}-{os.getpid()}.json")
+
+    def gravar():
+        while True:
+            fd, temporario = tempfile.mkstemp(dir=diretorio, prefix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(dict(metricas.para_dict(), atualizado_em=time.time()), f)
+            os.replace(temporario, caminho)
+            time.sleep(intervalo)
+
+    threading.Thread(target=gravar, daemon=True, name='metricas-json').start()
+    return caminho
+
+
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+def metricas_padrao():
+    """Métricas do processo, exportadas conforme as variáveis de ambiente"""
+    global _metricas
+    with _metricas_lock:
+        if _metricas is None:
+            from banco import banco_padrao
+
+            _metricas = Metricas(banco_padrao())
+            porta = os.environ.get('LAUDOS_METRICAS_PORTA')
+            if porta:
+                iniciar_servidor(_metricas, int(porta))
+            diretorio = os.environ.get('LAUDOS_METRICAS_JSON')
+            if diretorio:
+                iniciar_gravacao_json(_metricas, diretorio)
+    return _metricas
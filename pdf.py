@@ -0,0 +1,250 @@
+"""Conversão dos laudos .docx em PDF pelo LibreOffice, em segundo plano.
+
+As conversões entram numa fila em memória e são feitas por ``PROCESSOS_PDF``
+trabalhadores em paralelo. Cada conversão roda um ``soffice --headless
+--convert-to pdf``: não há um LibreOffice mantido aberto entre conversões,
+então cada uma paga a inicialização do programa (segundos). O que o pool
+evita é o resto: cada trabalhador tem um perfil próprio em
+``DIRETORIO_DADOS/pdf-perfis`` (um por máquina, processo e trabalhador: dois
+LibreOffice no mesmo perfil repassam as chamadas um para o outro ou nem
+sobem), criado na primeira conversão e reaproveitado nas seguintes, e
+apagado quando o pool é encerrado. Uma conversão que passa de
+``TIMEOUT_PDF`` segundos mata o processo; uma em que o LibreOffice morre é
+tentada mais uma vez.
+
+Os PDFs ficam em cache em disco pelo hash do .docx. Configuração por ambiente:
+``LAUDOS_SOFFICE`` (executável) e ``LAUDOS_PROCESSOS_PDF`` (tamanho do pool).
+"""
+from concurrent.futures import Future
+from pathlib import Path
+import atexit
+import hashlib
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+
+from armazem import ArmazemDisco
+from config import DIRETORIO_DADOS
+
+PROCESSOS_PDF = int(os.environ.get('LAUDOS_PROCESSOS_PDF', 2))
+
+# Limite de uma conversão (s)
+TIMEOUT_PDF = 120.0
+
+LIMITE_CACHE_PDF_BYTES = 512 * 1024 * 1024
+
+_CAMINHOS_SOFFICE = (
+    '/usr/bin/soffice',
+    '/usr/lib/libreoffice/program/soffice',
+    '/opt/libreoffice/program/soffice',
+    '/Applications/LibreOffice.app/Contents/MacOS/soffice',
+    r'C:\Program Files\LibreOffice\program\soffice.exe',
+)
+
+# Estados de uma conversão (ver ``PoolPDF.estado``)
+PRONTO, CONVERTENDO, ERRO = 'pronto', 'convertendo', 'erro'
+
+
+def chave_pdf(docx):
+    """Hash do .docx, usado como chave do cache de PDFs"""
+    return hashlib.sha256(docx).hexdigest()
+
+
+def encontrar_soffice():
+    """Caminho do executável do LibreOffice; ``RuntimeError`` se não houver"""
+    candidatos = [os.environ.get('LAUDOS_SOFFICE'), shutil.which('soffice'),
+                  shutil.which('libreoffice'), *_CAMINHOS_SOFFICE]
+    for caminho in candidatos:
+        if caminho and os.path.isfile(caminho):
+            return caminho
+    raise RuntimeError("LibreOffice não encontrado: instale-o ou defina LAUDOS_SOFFICE")
+
+
+class _ProcessoCaiu(RuntimeError):
+    """O LibreOffice morreu no meio da conversão (vale tentar de novo)"""
+
+
+class _Conversor:
+    """Chamadas ao LibreOffice com o perfil de um trabalhador"""
+
+    def __init__(self, soffice, perfil):
+        self.soffice = soffice
+        self.perfil = perfil
+
+    def converter(self, entrada, saida, timeout):
+        """Converte o arquivo ``entrada`` (.docx) em ``saida`` (.pdf)"""
+        diretorio = os.path.dirname(saida)
+        try:
+            subprocess.run(
+                [self.soffice, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+                 '--nolockcheck', f"-env:UserInstallation={Path(self.perfil).as_uri()}",
+                 '--convert-to', 'pdf', '--outdir', diretorio, entrada],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout, check=True
+            )
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"Conversão para PDF passou de {timeout:.0f} s") from None
+        except subprocess.CalledProcessError as e:
+            if e.returncode < 0:
+                raise _ProcessoCaiu(f"LibreOffice morto pelo sinal {-e.returncode}") from None
+            raise RuntimeError(f"LibreOffice encerrou com código {e.returncode}") from None
+        gerado = os.path.join(diretorio, Path(entrada).stem + '.pdf')
+        if not os.path.exists(gerado):
+            raise RuntimeError("LibreOffice não gerou o PDF")
+        os.replace(gerado, saida)
+
+
+def _prefixo_perfis():
+    """Prefixo dos perfis deste processo: ``<máquina>-<pid>-``"""
+    return f"{socket.gethostname()}-{os.getpid()}-"
+
+
+def _remover_perfis_abandonados(diretorio):
+    """Apaga os perfis de processos desta máquina que não estão mais rodando"""
+    maquina = socket.gethostname()
+    try:
+        nomes = os.listdir(diretorio)
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        dono, _, pid = nome.rpartition('-')[0].rpartition('-')
+        if dono != maquina or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(diretorio, nome), ignore_errors=True)
+        except PermissionError:
+            # Existe, de outro usuário
+            pass
+
+
+class PoolPDF:
+    """Trabalhadores de conversão pelo LibreOffice alimentados por uma fila"""
+
+    def __init__(self, diretorio, processos=PROCESSOS_PDF, timeout=TIMEOUT_PDF, cache=None,
+                 soffice=None):
+        self.diretorio = diretorio
+        self.processos = max(1, processos)
+        self.timeout = timeout
+        self.cache = cache or ArmazemDisco(os.path.join(diretorio, 'pdf'), LIMITE_CACHE_PDF_BYTES)
+        self.soffice = soffice
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        # chave -> Future das conversões em andamento (e das que falharam, para exibir o erro)
+        self._conversoes = {}
+        self._trabalhadores = []
+
+    def _iniciar_trabalhadores(self):
+        """Sobe os trabalhadores na primeira conversão (chamado com o lock)"""
+        if self._trabalhadores:
+            return
+        soffice = self.soffice or encontrar_soffice()
+        perfis = os.path.join(self.diretorio, 'pdf-perfis')
+        _remover_perfis_abandonados(perfis)
+        for i in range(self.processos):
+            conversor = _Conversor(soffice, os.path.join(perfis, f"{_prefixo_perfis()}{i}"))
+            thread = threading.Thread(target=self._trabalhar, args=(conversor,), daemon=True,
+                                      name=f"pdf-{i}")
+            thread.start()
+            self._trabalhadores.append((thread, conversor))
+        atexit.register(self.encerrar)
+
+    def enviar(self, docx):
+        """Põe o .docx na fila; devolve um ``Future`` com os bytes do PDF.
+
+        O mesmo .docx enviado de novo reaproveita a conversão em andamento ou o
+        PDF em cache.
+        """
+        chave = chave_pdf(docx)
+        with self._lock:
+            futuro = self._conversoes.get(chave)
+            if futuro is not None and not (futuro.done() and futuro.exception()):
+                return futuro
+            futuro = Future()
+            pdf = self.cache.ler(chave)
+            if pdf is not None:
+                futuro.set_result(pdf)
+                return futuro
+            self._iniciar_trabalhadores()
+            self._conversoes[chave] = futuro
+        self._fila.put((chave, docx, futuro))
+        return futuro
+
+    def converter(self, docx):
+        """Bytes do PDF do .docx, esperando a conversão"""
+        return self.enviar(docx).result()
+
+    def estado(self, chave):
+        """``(PRONTO, pdf)``, ``(CONVERTENDO, None)``, ``(ERRO, mensagem)`` ou ``(None, None)``"""
+        pdf = self.cache.ler(chave)
+        if pdf is not None:
+            return PRONTO, pdf
+        with self._lock:
+            futuro = self._conversoes.get(chave)
+        if futuro is None:
+            return None, None
+        if not futuro.done():
+            return CONVERTENDO, None
+        if futuro.exception() is not None:
+            return ERRO, str(futuro.exception())
+        return PRONTO, futuro.result()
+
+    def _trabalhar(self, conversor):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            chave, docx, futuro = item
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                pdf = self._converter(conversor, docx)
+            except Exception as e:
+                futuro.set_exception(e)
+                continue
+            self.cache.gravar(chave, pdf)
+            with self._lock:
+                self._conversoes.pop(chave, None)
+            futuro.set_result(pdf)
+        shutil.rmtree(conversor.perfil, ignore_errors=True)
+
+    def _converter(self, conversor, docx):
+        with tempfile.TemporaryDirectory(dir=self.diretorio, prefix='.pdf-') as temporario:
+            entrada = os.path.join(temporario, 'laudo.docx')
+            saida = os.path.join(temporario, 'laudo.pdf')
+            with open(entrada, 'wb') as f:
+                f.write(docx)
+            try:
+                conversor.converter(entrada, saida, self.timeout)
+            except _ProcessoCaiu:
+                # Uma nova tentativa; erros do próprio .docx não se repetem
+                conversor.converter(entrada, saida, self.timeout)
+            with open(saida, 'rb') as f:
+                return f.read()
+
+    def encerrar(self):
+        """Encerra os trabalhadores e apaga os perfis deles"""
+        with self._lock:
+            trabalhadores, self._trabalhadores = self._trabalhadores, []
+        for _ in trabalhadores:
+            self._fila.put(None)
+        for thread, _ in trabalhadores:
+            thread.join(timeout=10)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_padrao():
+    """Pool do processo, com perfis e cache em ``DIRETORIO_DADOS``"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+            _pool = PoolPDF(DIRETORIO_DADOS)
+    return _pool
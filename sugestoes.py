@@ -0,0 +1,252 @@
+"""Sugestões de causa, consequências e recomendações a partir das anomalias.
+
+Matrizes de coocorrência contadas sobre os eventos da versão atual de todos
+os laudos salvos: para cada anomalia de ``OPCOES['anomalias']`` (linha),
+quantos eventos com ela tiveram cada causa, consequência e recomendação
+(colunas, na ordem de ``OPCOES``). As contagens são feitas com NumPy, como
+produto de matrizes binárias evento x opção.
+
+A atualização é incremental: os eventos são blobs endereçados por hash
+(ver ``banco``), então basta comparar os hashes de cada laudo que mudou de
+revisão (``BancoLaudos.revisao``) com os já contados e somar ou subtrair só
+os eventos que entraram ou saíram. As probabilidades por anomalia ficam prontas após cada atualização,
+e uma consulta lê apenas as linhas das anomalias do evento.
+
+A primeira carga lê todos os eventos salvos e, num acervo grande, leva
+segundos; por isso ``sugerir`` não espera: dispara as atualizações numa
+thread e responde com o último estado pronto (sem sugestões até a primeira
+carga terminar). ``preencher``, pedido explicitamente pelo usuário, espera.
+"""
+import threading
+import time
+
+from gerador import OPCOES
+
+# Campo do evento -> opções em ``OPCOES``
+CAMPOS = {'causa': 'causas', 'consequencias': 'consequencias', 'recomendacoes': 'recomendacoes'}
+
+# Anomalias vistas em menos eventos que isso não geram sugestões
+MINIMO_EVENTOS = 3
+
+# Nas listas, são pré-preenchidas as opções presentes em pelo menos esta fração dos
+# eventos anteriores com as mesmas anomalias (no máximo ``MAXIMO_PREENCHIDAS``)
+LIMIAR_PREENCHIMENTO = 0.5
+MAXIMO_PREENCHIDAS = 3
+
+# Intervalo mínimo entre consultas ao banco por laudos alterados (s)
+INTERVALO_ATUALIZACAO = 30.0
+
+
+# Opção -> índice, para cada lista de ``OPCOES`` usada aqui
+_POSICOES = {nome: {opcao: i for i, opcao in enumerate(OPCOES[nome])}
+             for nome in ('anomalias', *CAMPOS.values())}
+
+
+def _indices(valores, nome):
+    posicao = _POSICOES[nome]
+    if isinstance(valores, str):
+        valores = [valores]
+    return [posicao[v] for v in valores or () if v in posicao]
+
+
+def codificar(evento):
+    """Índices em ``OPCOES`` das anomalias e de cada campo do evento"""
+    return (_indices(evento.get('anomalias'), 'anomalias'),
+            *(_indices(evento.get(campo), opcoes) for campo, opcoes in CAMPOS.items()))
+
+
+def _binaria(listas, colunas):
+    """Matriz ``len(listas) x colunas`` com 1 nos índices de cada lista"""
+    import numpy as np
+
+    matriz = np.zeros((len(listas), colunas), dtype=np.int32)
+    tamanhos = [len(lista) for lista in listas]
+    linhas = np.repeat(np.arange(len(listas)), tamanhos)
+    matriz[linhas, np.fromiter((i for lista in listas for i in lista), dtype=np.intp, count=sum(tamanhos))] = 1
+    return matriz
+
+
+def ordenar(opcoes, sugeridas):
+    """``opcoes`` com as sugeridas primeiro, da mais provável para a menos"""
+    primeiras = [opcao for opcao, _ in sugeridas]
+    vistas = set(primeiras)
+    return primeiras + [opcao for opcao in opcoes if opcao not in vistas]
+
+
+class IndiceSugestoes:
+    """Coocorrências anomalia -> causa/consequência/recomendação dos laudos salvos"""
+
+    def __init__(self, banco, intervalo=INTERVALO_ATUALIZACAO):
+        self.banco = banco
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._lock_thread = threading.Lock()
+        self._thread = None
+        self._atualizado_em = None
+        # laudo_id -> (revisão, hashes dos eventos contados); o id sozinho pode ser
+        # reaproveitado por outro laudo, o par com a revisão não (ver ``banco``)
+        self._laudos = {}
+        # Contador de revisões do banco na última atualização
+        self._revisao = None
+        # hash -> (evento codificado, quantas vezes é contado)
+        self._eventos = {}
+        # Contagens, criadas na primeira atualização (o NumPy só é importado nela)
+        self.total_anomalias = None
+        self.contagens = None
+        # (total por anomalia, probabilidades) da última atualização; ``None`` até a primeira
+        self._estado = None
+
+    @property
+    def pronto(self):
+        """Se a primeira carga já terminou"""
+        return self._estado is not None
+
+    def _somar(self, codificados, sinal):
+        if not codificados:
+            return
+        anomalias = _binaria([c[0] for c in codificados], len(OPCOES['anomalias']))
+        self.total_anomalias += sinal * anomalias.sum(axis=0)
+        for i, (campo, opcoes) in enumerate(CAMPOS.items(), start=1):
+            valores = _binaria([c[i] for c in codificados], len(OPCOES[opcoes]))
+            self.contagens[campo] += sinal * (anomalias.T @ valores)
+
+    def atualizar(self, forcar=False):
+        """Conta os eventos dos laudos salvos, criados ou removidos desde a última vez"""
+        with self._lock:
+            agora = time.monotonic()
+            if not forcar and self._atualizado_em is not None and agora - self._atualizado_em < self.intervalo:
+                return
+            self._atualizado_em = agora
+
+            import numpy as np
+
+            if self.contagens is None:
+                n = len(OPCOES['anomalias'])
+                self.total_anomalias = np.zeros(n, dtype=np.int64)
+                self.contagens = {campo: np.zeros((n, len(OPCOES[opcoes])), dtype=np.int64)
+                                  for campo, opcoes in CAMPOS.items()}
+
+            revisao = self.banco.revisao()
+            if revisao == self._revisao:
+                return
+            revisoes = self.banco.revisoes_atuais()
+            self._revisao = revisao
+            entraram, sairam = [], []
+            for laudo_id in [i for i in self._laudos if i not in revisoes]:
+                sairam += self._laudos.pop(laudo_id)[1]
+            for laudo_id, revisao_laudo in revisoes.items():
+                revisao_contada, hashes = self._laudos.get(laudo_id, (None, []))
+                if revisao_laudo == revisao_contada:
+                    continue
+                try:
+                    novos = self.banco.hashes_eventos(laudo_id)
+                except KeyError:
+                    # Removido agora há pouco; sai na próxima atualização
+                    continue
+                self._laudos[laudo_id] = (revisao_laudo, novos)
+                sairam += hashes
+                entraram += novos
+            if not entraram and not sairam and self._estado is not None:
+                return
+
+            # Um evento que só mudou de laudo ou de versão entra e sai: não é recontado
+            saldo = {}
+            for h in entraram:
+                saldo[h] = saldo.get(h, 0) + 1
+            for h in sairam:
+                saldo[h] = saldo.get(h, 0) - 1
+            desconhecidos = [h for h, n in saldo.items() if n > 0 and h not in self._eventos]
+            for h, evento in self.banco.partes_por_hash(desconhecidos).items():
+                self._eventos[h] = (codificar(evento), 0)
+
+            somar, subtrair = [], []
+            for h, n in saldo.items():
+                if n == 0 or h not in self._eventos:
+                    continue
+                codificado, usos = self._eventos[h]
+                (somar if n > 0 else subtrair).extend([codificado] * abs(n))
+                if usos + n > 0:
+                    self._eventos[h] = (codificado, usos + n)
+                else:
+                    del self._eventos[h]
+            self._somar(somar, 1)
+            self._somar(subtrair, -1)
+
+            # Probabilidade de cada opção dado a anomalia; zero para anomalias com pouco histórico
+            base = np.where(self.total_anomalias >= MINIMO_EVENTOS, self.total_anomalias, 0)
+            probabilidades = {campo: np.divide(contagem, base[:, None], where=base[:, None] > 0,
+                                               out=np.zeros(contagem.shape))
+                              for campo, contagem in self.contagens.items()}
+            # Trocado de uma vez: as consultas não veem uma atualização pela metade
+            self._estado = (self.total_anomalias.copy(), probabilidades)
+
+    def atualizar_em_segundo_plano(self):
+        """Roda ``atualizar`` numa thread, se o intervalo passou e nenhuma estiver rodando"""
+        with self._lock_thread:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._atualizado_em is not None and time.monotonic() - self._atualizado_em < self.intervalo:
+                return
+            self._thread = threading.Thread(target=self.atualizar, daemon=True, name='sugestoes')
+            self._thread.start()
+
+    def sugerir(self, anomalias, esperar=False):
+        """``{campo: [(opção, probabilidade), ...]}`` das opções já usadas com essas anomalias.
+
+        A probabilidade é a média, entre as anomalias com histórico, da fração
+        dos eventos com a anomalia que tiveram a opção. Sem ``esperar``, a
+        atualização roda em segundo plano e, antes da primeira carga, não há
+        sugestões.
+        """
+        if esperar:
+            self.atualizar()
+        else:
+            self.atualizar_em_segundo_plano()
+        estado = self._estado
+        linhas = _indices(anomalias, 'anomalias')
+        if estado is not None:
+            total_anomalias, probabilidades = estado
+            linhas = [i for i in linhas if total_anomalias[i] >= MINIMO_EVENTOS]
+        if estado is None or not linhas:
+            return {campo: [] for campo in CAMPOS}
+
+        import numpy as np
+
+        sugestoes = {}
+        for campo, opcoes in CAMPOS.items():
+            media = probabilidades[campo][linhas].mean(axis=0)
+            sugestoes[campo] = [(OPCOES[opcoes][i], float(media[i]))
+                                for i in np.argsort(-media, kind='stable') if media[i] > 0]
+        return sugestoes
+
+    def preencher(self, evento):
+        """Preenche no evento a causa mais provável e as consequências e recomendações
+        frequentes com as anomalias dele (as listas só se estiverem vazias); devolve os
+        campos alterados. Espera a carga do índice, se ainda não terminou.
+        """
+        sugestoes = self.sugerir(evento.get('anomalias'), esperar=True)
+        alterados = []
+        if sugestoes['causa'] and evento.get('causa') != sugestoes['causa'][0][0]:
+            evento['causa'] = sugestoes['causa'][0][0]
+            alterados.append('causa')
+        for campo in ('consequencias', 'recomendacoes'):
+            frequentes = [opcao for opcao, p in sugestoes[campo] if p >= LIMIAR_PREENCHIMENTO]
+            if frequentes and not evento.get(campo):
+                evento[campo] = frequentes[:MAXIMO_PREENCHIDAS]
+                alterados.append(campo)
+        return alterados
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def sugestoes_padrao():
+    """Índice do processo, sobre ``banco_padrao()``"""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            from banco import banco_padrao
+
+            _indice = IndiceSugestoes(banco_padrao())
+    return _indice
@@ -0,0 +1,126 @@
+"""Orçamento de tempo de importação do app.
+
+Mede, num interpretador novo e com o streamlit já carregado, quanto custa
+importar os módulos do projeto de que o ``app.py`` depende (lidos dos imports
+do próprio ``app.py``, então módulos novos entram na conta automaticamente)
+e, em seguida, a preparação que o ``app.py`` faz na primeira execução de uma
+sessão: abrir o banco (que pode reindexar a busca), o salvamento automático,
+as métricas, a fila e o índice de sugestões do editor de eventos. Usa o
+``DIRETORIO_DADOS`` configurado (``LAUDOS_DADOS``).
+
+Falha se o melhor de ``REPETICOES`` medições passar de ``ORCAMENTO_MS`` na
+importação ou de ``ORCAMENTO_SESSAO_MS`` na primeira sessão, ou se algum
+módulo pesado for carregado na importação: python-docx, Pillow, groq e
+afins devem ser importados só nos caminhos que os usam. O teste
+``tests/test_tempo_importacao.py`` roda esta verificação.
+
+Uso:
+    python tempo_importacao.py
+    python tempo_importacao.py --orcamento 80 --orcamento-sessao 150
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ORCAMENTO_MS = 100.0
+ORCAMENTO_SESSAO_MS = 250.0
+REPETICOES = 5
+
+# Dependências que não podem ser carregadas só por abrir o app
+MODULOS_PESADOS = ('docx', 'lxml', 'PIL', 'groq', 'httpx', 'numpy', 'requests', 'dateutil')
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+_MEDIR = """
+import json, sys, time
+import streamlit
+antes = set(sys.modules)
+inicio = time.perf_counter()
+for nome in sys.argv[1:]:
+    __import__(nome)
+decorrido = time.perf_counter() - inicio
+modulos = sorted(set(sys.modules) - antes)
+
+# O que o app.py faz na primeira execução de uma sessão nova
+from autosave import AutoSalvamento
+from banco import banco_padrao
+from fila import fila_padrao
+from metricas import metricas_padrao
+from sugestoes import sugestoes_padrao
+inicio = time.perf_counter()
+banco = banco_padrao()
+AutoSalvamento(banco, 'tempo-importacao')
+banco.carregar_autosave('tempo-importacao')
+metricas_padrao().registrar_sessao('tempo-importacao', 0)
+fila_padrao().trabalhos('tempo-importacao')
+sugestoes_padrao().sugerir([])
+sessao = time.perf_counter() - inicio
+print(json.dumps({'ms': decorrido * 1000, 'sessao_ms': sessao * 1000, 'modulos': modulos}))
+"""
+
+
+def modulos_app(caminho=os.path.join(DIRETORIO, 'app.py')):
+    """Módulos do projeto importados no nível de módulo do ``app.py``"""
+    with open(caminho, encoding='utf-8') as f:
+        arvore = ast.parse(f.read())
+    nomes = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            nomes += [alias.name.split('.')[0] for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            nomes.append(no.module.split('.')[0])
+    return [n for n in dict.fromkeys(nomes) if os.path.exists(os.path.join(DIRETORIO, f"{n}.py"))]
+
+
+def medir(modulos, repeticoes=REPETICOES):
+    """Melhores tempos (ms) de importação dos ``modulos`` e da primeira sessão, e os
+    módulos carregados na importação"""
+    melhor = None
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', _MEDIR, *modulos], cwd=DIRETORIO,
+                               capture_output=True, text=True, check=True).stdout
+        resultado = json.loads(saida.strip().splitlines()[-1])
+        if melhor is None:
+            melhor = resultado
+        elif resultado['ms'] < melhor['ms']:
+            melhor = dict(resultado, sessao_ms=min(resultado['sessao_ms'], melhor['sessao_ms']))
+        else:
+            melhor['sessao_ms'] = min(resultado['sessao_ms'], melhor['sessao_ms'])
+    return melhor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica o orçamento de importação do app")
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_MS, help="Limite da importação em ms")
+    parser.add_argument('--orcamento-sessao', type=float, default=ORCAMENTO_SESSAO_MS,
+                        help="Limite da preparação da primeira sessão em ms")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    args = parser.parse_args(argv)
+
+    modulos = modulos_app()
+    resultado = medir(modulos, args.repeticoes)
+    pesados = sorted({m.split('.')[0] for m in resultado['modulos']} & set(MODULOS_PESADOS))
+
+    print(f"Módulos do app: {', '.join(modulos)}")
+    print(f"Importação: {resultado['ms']:.1f} ms (orçamento {args.orcamento:.0f} ms)")
+    print(f"Primeira sessão: {resultado['sessao_ms']:.1f} ms (orçamento {args.orcamento_sessao:.0f} ms)")
+    falhou = False
+    if resultado['ms'] > args.orcamento:
+        print("❌ Tempo de importação acima do orçamento")
+        falhou = True
+    if resultado['sessao_ms'] > args.orcamento_sessao:
+        print("❌ Preparação da primeira sessão acima do orçamento")
+        falhou = True
+    if pesados:
+        print(f"❌ Módulos pesados carregados na partida: {', '.join(pesados)}")
+        falhou = True
+    if not falhou:
+        print("✅ Dentro do orçamento")
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""``ia.completar`` contra o servidor de respostas fixas (``ia.servidor_stub``)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('groq')
+
+import ia
+from armazem import ArmazemDisco
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    servidor, url = ia.servidor_stub(latencia=0.1)
+    monkeypatch.setenv('GROQ_BASE_URL', url)
+    monkeypatch.setenv('GROQ_API_KEY', 'teste')
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArmazemDisco(str(tmp_path / 'ia'), ia.LIMITE_CACHE_IA_BYTES)
+
+
+def _prompts(n, inicio=0):
+    return [ia.prompt_evento({'nome': f'Evento {i}', 'anomalias': ['Fissuras']})
+            for i in range(inicio, inicio + n)]
+
+
+def test_respostas_na_ordem_dos_prompts_e_no_limite_de_concorrencia(stub, cache):
+    prompts = _prompts(12)
+    textos = ia.completar(prompts, limite=3, cache=cache)
+
+    assert len(textos) == 12 and len(set(textos)) == 12
+    for prompt, texto in zip(prompts, textos):
+        assert texto.startswith("Texto gerado para teste")
+        assert cache.ler(ia.chave_prompt(prompt)).decode('utf-8') == texto
+    assert stub.requisicoes == 12
+    # Em paralelo, mas nunca acima do limite
+    assert 1 < stub.maximo_simultaneas <= 3
+
+
+def test_respostas_em_cache_nao_chamam_a_api(stub, cache, monkeypatch):
+    prompts = _prompts(4)
+    primeiras = ia.completar(prompts, cache=cache)
+    assert stub.requisicoes == 4
+
+    # Só os prompts novos vão ao servidor
+    textos = ia.completar(prompts + _prompts(2, inicio=4), cache=cache)
+    assert textos[:4] == primeiras
+    assert stub.requisicoes == 6
+
+    # Tudo em cache: nem a chave da API é exigida
+    monkeypatch.delenv('GROQ_API_KEY')
+    assert ia.completar(prompts, cache=cache) == primeiras
+    assert stub.requisicoes == 6
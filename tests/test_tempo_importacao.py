@@ -0,0 +1,38 @@
+"""Orçamento de importação do app e da primeira sessão (ver ``tempo_importacao``)."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+DIRETORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Acervo salvo antes da medição: 300 laudos com 10 eventos cada
+_POPULAR = """
+import sys
+from banco import banco_padrao
+from gerador import OPCOES
+banco = banco_padrao()
+for i in range(300):
+    eventos = [{'id': f'e{j}', 'numero': j + 1, 'nome': f'Evento {j}', 'localizacao': 'Generalidades',
+                'anomalias': [OPCOES['anomalias'][(i + j) % 20]], 'causa': OPCOES['causas'][j % 5],
+                'consequencias': [OPCOES['consequencias'][i % 10]], 'prioridade': 'Prioridade 1',
+                'uso': 'Regular', 'recomendacoes': [OPCOES['recomendacoes'][j % 12]], 'imagens': []}
+               for j in range(10)]
+    banco.salvar(f'Laudo {i}', {'contratante': f'Cliente {i % 7}', 'data_laudo': '2025-03-01'}, eventos)
+"""
+
+
+def _rodar(argumentos, diretorio_dados):
+    ambiente = dict(os.environ, LAUDOS_DADOS=str(diretorio_dados), LAUDOS_PROCESSOS_FILA='0')
+    return subprocess.run([sys.executable, *argumentos], cwd=DIRETORIO, env=ambiente,
+                          capture_output=True, text=True, timeout=600)
+
+
+@pytest.mark.parametrize('acervo', [False, True], ids=['vazio', 'com-laudos'])
+def test_importacao_e_primeira_sessao_dentro_do_orcamento(tmp_path, acervo):
+    if acervo:
+        populado = _rodar(['-c', _POPULAR], tmp_path)
+        assert populado.returncode == 0, populado.stderr
+    resultado = _rodar(['tempo_importacao.py'], tmp_path)
+    assert resultado.returncode == 0, resultado.stdout + resultado.stderr